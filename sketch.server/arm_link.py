@@ -0,0 +1,149 @@
+import threading
+import time
+
+import numpy as np
+
+from estimator import trapezoid_time
+
+# 阻塞到轨迹执行完才返回的运动指令，截止时间按预计运动时间放宽
+MOTION_OPS = {'moveL', 'moveJ_P'}
+
+
+class ArmLink:
+    """
+    RoboticArm 的连接管理，接口与 RoboticArm 一致
+
+    - 每次调用都有截止时间：查询用 call_timeout，运动指令按运动时间模型估算的用时放宽，
+      连接挂起时几秒内就会失败，而不是等满 60 秒的 socket 超时
+    - 所有调用经过同一把锁，心跳不会和任务中的指令交错使用同一个 socket
+    - 调用超过截止时间仍未成功时断开连接：迟到的回复留在 socket 里会被当成下一条指令的
+      回复，之后每条回复都错位一条，只能丢弃这个连接，由 heartbeat()/reconnect() 重连
+    - heartbeat() 用 get_current_arm_state 检查连接；reconnect() 按有上限的指数退避重连，
+      同一时间只有一个线程在重连
+    """
+
+    def __init__(self, arm, ip_address, calibration, call_timeout=2.0, connect_timeout=3.0,
+                 heartbeat_interval=5.0, backoff=(0.5, 8.0), max_outage=60.0):
+        """
+        Args:
+            arm (RoboticArm): 被管理的机械臂对象（可以是 TracedArm 等包装）
+            ip_address (str): 控制器地址
+            calibration (dict): 服务器文件中的 MOTION_MODEL，用来估算运动指令的截止时间
+            call_timeout (float): 查询指令的截止时间（秒）
+            connect_timeout (float): 单次连接尝试的超时（秒）
+            heartbeat_interval (float): 空闲时心跳的间隔（秒）
+            backoff (tuple): 重连间隔的初始值和上限（秒）
+            max_outage (float): 超过该时间仍未重连成功则放弃（秒）
+        """
+        self._arm = arm
+        self.ip_address = ip_address
+        self.max_speed = calibration['max_speed']
+        self.max_accel = calibration['max_accel']
+        self.command_overhead = calibration['command_overhead']
+        self.call_timeout = call_timeout
+        self.connect_timeout = connect_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.backoff = backoff
+        self.max_outage = max_outage
+        # 最后一次发出的运动目标位姿，用来估算下一条运动指令的距离
+        self.pose = None
+        self._lock = threading.Lock()
+        self._reconnecting = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._arm, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                result = self._call(name, attr, self._deadline(name, args, kwargs), *args, **kwargs)
+            if name in MOTION_OPS:
+                self.pose = list(args[0]) if args else kwargs.get('pose')
+            return result
+        return call
+
+    def _call(self, name, func, deadline, *args, **kwargs):
+        """在持有锁时以 deadline 为超时调用 func，错过截止时间则断开连接"""
+        self._arm.set_timeout(deadline)
+        start = time.monotonic()
+        result = func(*args, **kwargs)
+        if not result and time.monotonic() - start >= deadline:
+            # RoboticArm 吞掉了 socket.timeout，只能按用时判断是否错过了截止时间
+            print(f"{name} missed its {deadline:.1f} s deadline, dropping arm link")
+            self._arm.disconnect()
+        return result
+
+    def _deadline(self, name, args, kwargs):
+        """运动指令的截止时间：预计用时的两倍再加上 call_timeout"""
+        if name not in MOTION_OPS:
+            return self.call_timeout
+        pose = args[0] if args else kwargs['pose']
+        velocity = args[1] if len(args) > 1 else kwargs.get('velocity', 50)
+        if self.pose is None:
+            distance = 500.0
+        else:
+            distance = float(np.linalg.norm(np.subtract(pose[:3], self.pose[:3])))
+        speed = self.max_speed * max(float(velocity), 1.0) / 100.0
+        expected = self.command_overhead + float(trapezoid_time(distance, speed, self.max_accel))
+        return self.call_timeout + 2 * expected
+
+    def connect(self):
+        """连接控制器，之后的调用使用短的截止时间"""
+        with self._lock:
+            if not self._arm.connect(self.ip_address, self.connect_timeout):
+                return False
+            self._arm.set_timeout(self.call_timeout)
+            return True
+
+    def heartbeat(self, blocking=True):
+        """
+        检查连接
+
+        Args:
+            blocking (bool): 为False时如果有其他调用正在进行就直接返回 True（连接正在使用）
+
+        Returns:
+            dict|bool|None: 机械臂状态；连接不可用时返回None
+        """
+        if not self._lock.acquire(blocking=blocking):
+            return True
+        try:
+            if not self._arm.is_connected():
+                return None
+            return self._call('get_current_arm_state', self._arm.get_current_arm_state, self.call_timeout)
+        finally:
+            self._lock.release()
+
+    def reconnect(self, should_stop=None):
+        """
+        断开并重新连接，直到连接可用、超过 max_outage 或 should_stop() 返回True
+
+        已经有线程在重连时等它结束，连接恢复则直接返回。
+
+        Returns:
+            dict|None: 重连后读到的机械臂状态，失败时返回None
+        """
+        with self._reconnecting:
+            state = self.heartbeat()
+            if state is not None:
+                return state
+            start = time.time()
+            delay = self.backoff[0]
+            attempt = 0
+            while time.time() - start < self.max_outage:
+                if should_stop and should_stop():
+                    return None
+                attempt += 1
+                with self._lock:
+                    self._arm.disconnect()
+                if self.connect():
+                    state = self.heartbeat()
+                    if state is not None:
+                        print(f"Reconnected to arm after {time.time() - start:.1f} s ({attempt} attempts)")
+                        return state
+                print(f"Reconnect attempt {attempt} failed, retrying in {delay:.1f} s")
+                time.sleep(min(delay, max(self.max_outage - (time.time() - start), 0)))
+                delay = min(delay * 2, self.backoff[1])
+            print(f"Could not reconnect to arm within {self.max_outage:.0f} s")
+            return None
@@ -0,0 +1,324 @@
+import argparse
+import struct
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+MAGIC = b'SKTR'
+VERSION = 1
+RESP_NONE = 255
+
+# 操作码，新增操作只能追加在末尾，保证旧的 trace 文件仍能读取
+OPS = [
+    'send_coords', 'send_angles', 'get_coords', 'set_fresh_mode', 'get_fresh_mode', 'stop',
+    'connect', 'disconnect', 'is_connected', 'moveL', 'moveJ', 'moveJ_P', 'get_current_arm_state'
+]
+OP_CODES = {name: code for code, name in enumerate(OPS)}
+MOTION_OPS = {'send_coords', 'send_angles', 'moveL', 'moveJ', 'moveJ_P'}
+
+# 记录头：开始时间（相对 trace 开始）、耗时、操作码、参数个数、响应个数
+RECORD = struct.Struct('<dfBBB')
+
+
+def _flatten(values):
+    """把参数/响应展开成浮点数列表，字符串等非数值参数（如 IP 地址）不记录"""
+    flat = []
+    for value in values:
+        if isinstance(value, dict):
+            # RoboticArm 的状态字典：位置、姿态和错误码
+            pose = value.get('pose', {})
+            flat.extend(pose.get('position', []))
+            flat.extend(pose.get('orientation', []))
+            flat.extend([value.get('arm_err', 0), value.get('sys_err', 0)])
+        elif isinstance(value, (list, tuple, np.ndarray)):
+            flat.extend(float(v) for v in value)
+        elif isinstance(value, (bool, int, float, np.number)):
+            flat.append(float(value))
+    return flat
+
+
+class TraceWriter:
+    """
+    紧凑的二进制指令 trace
+
+    文件头是 MAGIC、版本号和后端名称，之后每条记录是 RECORD 加上 float32 的参数
+    和响应，每条指令 20~60 字节。写入由锁保护，事件循环和 asyncio.to_thread
+    中的调用可以同时记录。
+    """
+
+    def __init__(self, path, backend):
+        self.path = path
+        self.start = time.time()
+        self._lock = threading.Lock()
+        self._file = open(path, 'wb')
+        name = backend.encode('utf-8')
+        self._file.write(MAGIC + struct.pack('<BB', VERSION, len(name)) + name)
+        self._file.flush()
+
+    def write(self, op, t0, duration, args, response):
+        """
+        Args:
+            op (str): 方法名，必须在 OPS 中
+            t0 (float): 调用开始的时间戳
+            duration (float): 调用耗时（秒）
+            args (tuple): 调用参数
+            response: 返回值，None 单独标记
+        """
+        flat_args = _flatten(args)
+        flat_resp = [] if response is None else _flatten([response])
+        n_resp = RESP_NONE if response is None else len(flat_resp)
+        data = RECORD.pack(t0 - self.start, duration, OP_CODES[op], len(flat_args), n_resp)
+        data += np.asarray(flat_args + flat_resp, dtype='<f4').tobytes()
+        with self._lock:
+            self._file.write(data)
+            # 和任务日志一样每条都 flush，进程被杀时 trace 也是完整的
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class TracedArm:
+    """
+    包装 MyCobot/RoboticArm，记录每次调用的参数、时间和响应
+
+    只有 OPS 中的方法会被记录，其余属性直接转发给被包装的对象
+    """
+
+    def __init__(self, arm, writer):
+        self._arm = arm
+        self._writer = writer
+
+    def __getattr__(self, name):
+        attr = getattr(self._arm, name)
+        if name not in OP_CODES or not callable(attr):
+            return attr
+
+        def traced(*args, **kwargs):
+            t0 = time.time()
+            response = attr(*args, **kwargs)
+            self._writer.write(name, t0, time.time() - t0, args + tuple(kwargs.values()), response)
+            return response
+        return traced
+
+
+def read_trace(path):
+    """
+    读取 trace 文件
+
+    Returns:
+        tuple: (后端名称, 记录列表)，每条记录为
+               {'op', 't', 'duration', 'args': ndarray, 'response': ndarray|None}
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not a command trace")
+    version, name_len = struct.unpack_from('<BB', data, 4)
+    if version != VERSION:
+        raise ValueError(f"Unsupported trace version {version}")
+    backend = data[6:6 + name_len].decode('utf-8')
+    offset = 6 + name_len
+
+    records = []
+    while offset + RECORD.size <= len(data):
+        t, duration, code, n_args, n_resp = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        count = n_args + (0 if n_resp == RESP_NONE else n_resp)
+        if offset + 4 * count > len(data):
+            # 进程被杀时最后一条记录可能不完整
+            break
+        values = np.frombuffer(data, dtype='<f4', count=count, offset=offset).astype(float)
+        offset += 4 * count
+        records.append({
+            'op': OPS[code],
+            't': t,
+            'duration': duration,
+            'args': values[:n_args],
+            'response': None if n_resp == RESP_NONE else values[n_args:]
+        })
+    return backend, records
+
+
+def summarize(records, gap_threshold=0.5):
+    """
+    统计 trace：指令数、总时间、阻塞在机械臂调用上的时间和空闲间隔
+
+    Args:
+        records (list): read_trace 返回的记录
+        gap_threshold (float): 超过该值（秒）的调用间隔计为一次空闲
+
+    Returns:
+        dict: 统计结果
+    """
+    if not records:
+        return {'commands': 0, 'motion_commands': 0, 'total_time': 0.0, 'busy_time': 0.0,
+                'idle_time': 0.0, 'idle_gaps': 0, 'max_gap': 0.0, 'failed': 0, 'ops': {}}
+    t = np.array([r['t'] for r in records])
+    duration = np.array([r['duration'] for r in records])
+    gaps = np.maximum(t[1:] - (t[:-1] + duration[:-1]), 0.0)
+    motion_t = t[[r['op'] in MOTION_OPS for r in records]]
+    return {
+        'commands': len(records),
+        'motion_commands': len(motion_t),
+        'total_time': float(t[-1] + duration[-1] - t[0]),
+        'busy_time': float(duration.sum()),
+        'idle_time': float(gaps[gaps > gap_threshold].sum()),
+        'idle_gaps': int(np.count_nonzero(gaps > gap_threshold)),
+        'max_gap': float(gaps.max()) if len(gaps) else 0.0,
+        'mean_motion_interval': float(np.mean(np.diff(motion_t))) if len(motion_t) > 1 else 0.0,
+        # 运动指令返回 False/0 计为失败
+        'failed': sum(1 for r in records if r['op'] in MOTION_OPS and r['response'] is not None
+                      and len(r['response']) == 1 and r['response'][0] == 0),
+        'ops': dict(Counter(r['op'] for r in records))
+    }
+
+
+def first_divergence(a, b, tolerance=0.01):
+    """
+    找出两个 trace 的运动指令序列第一次不同的位置
+
+    Returns:
+        int|None: 第几条运动指令不同，完全相同时返回None
+    """
+    ma = [r for r in a if r['op'] in MOTION_OPS]
+    mb = [r for r in b if r['op'] in MOTION_OPS]
+    for i, (ra, rb) in enumerate(zip(ma, mb)):
+        if (ra['op'] != rb['op'] or len(ra['args']) != len(rb['args'])
+                or not np.allclose(ra['args'], rb['args'], atol=tolerance)):
+            return i
+    return None if len(ma) == len(mb) else min(len(ma), len(mb))
+
+
+# 每个运动指令的参数结构，用于回放时把展开的参数还原
+ARG_LAYOUT = {
+    'send_coords': (6, 1, 1),
+    'send_angles': (6, 1),
+    'moveL': (6, 1, 1),
+    'moveJ': (6, 1, 1),
+    'moveJ_P': (6, 1, 1),
+    'set_fresh_mode': (1,)
+}
+
+
+def _unflatten(op, values):
+    args, i = [], 0
+    for size in ARG_LAYOUT.get(op, ()):
+        if i >= len(values):
+            # 调用时省略的默认参数
+            break
+        chunk = values[i:i + size]
+        i += size
+        if size == 1:
+            v = float(chunk[0])
+            args.append(int(v) if v.is_integer() else v)
+        else:
+            args.append([float(v) for v in chunk])
+    return args
+
+
+def replay(records, arm, timing='original', speedup=1.0):
+    """
+    把 trace 中的指令依次发给机械臂（通常是模拟器）
+
+    Args:
+        records (list): read_trace 返回的记录
+        arm: 目标机械臂，可以用 TracedArm 包装以记录回放的 trace
+        timing (str): original 按原来的调用时间发送（调用阻塞更久时顺延），asap 不等待
+        speedup (float): original 模式下的时间缩放
+    """
+    start = time.time()
+    for record in records:
+        if record['op'] in ('connect', 'disconnect', 'is_connected'):
+            continue
+        if timing == 'original':
+            delay = start + record['t'] / speedup - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        getattr(arm, record['op'])(*_unflatten(record['op'], record['args']))
+
+
+def print_summary(summary, name=''):
+    print(f"Trace {name}".rstrip() + ":")
+    print(f"  Commands: {summary['commands']} ({summary['motion_commands']} motion, {summary['failed']} failed)")
+    print(f"  Total time: {summary['total_time']:.2f} s, blocked on arm: {summary['busy_time']:.2f} s")
+    print(f"  Idle: {summary['idle_gaps']} gaps, {summary['idle_time']:.2f} s, longest {summary['max_gap']:.2f} s")
+    print(f"  Mean motion interval: {summary.get('mean_motion_interval', 0.0):.3f} s")
+    for op, count in sorted(summary['ops'].items()):
+        print(f"    {op}: {count}")
+
+
+def print_diff(a, b):
+    """并排打印两个 trace 的统计和差值"""
+    keys = ['commands', 'motion_commands', 'failed', 'total_time', 'busy_time',
+            'idle_time', 'idle_gaps', 'max_gap', 'mean_motion_interval']
+    print(f"{'':<22}{'A':>12}{'B':>12}{'delta':>12}{'%':>8}")
+    for key in keys:
+        va, vb = a.get(key, 0), b.get(key, 0)
+        pct = f"{(vb - va) / va * 100:+.1f}" if va else '-'
+        print(f"{key:<22}{va:>12.3f}{vb:>12.3f}{vb - va:>+12.3f}{pct:>8}")
+    for op in sorted(set(a['ops']) | set(b['ops'])):
+        va, vb = a['ops'].get(op, 0), b['ops'].get(op, 0)
+        print(f"  {op:<20}{va:>12}{vb:>12}{vb - va:>+12}")
+
+
+def _make_sim(backend):
+    """按 trace 的后端创建模拟器，标定值取自对应的服务器文件"""
+    from sim_arm import SimMyCobot, SimRoboticArm
+    if backend == 'mycobot':
+        from server import MOTION_MODEL
+        return SimMyCobot(MOTION_MODEL)
+    from rm_server import MOTION_MODEL
+    arm = SimRoboticArm(MOTION_MODEL)
+    arm.connect(None)
+    return arm
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize, diff and replay arm command traces')
+    sub = parser.add_subparsers(dest='command', required=True)
+    show = sub.add_parser('summary', help='Print statistics of a trace')
+    show.add_argument('trace')
+    show.add_argument('--gap', type=float, default=0.5, help='Idle gap threshold (s)')
+    diff = sub.add_parser('diff', help='Compare two traces')
+    diff.add_argument('a')
+    diff.add_argument('b')
+    diff.add_argument('--gap', type=float, default=0.5, help='Idle gap threshold (s)')
+    rep = sub.add_parser('replay', help='Feed a trace to the simulator')
+    rep.add_argument('trace')
+    rep.add_argument('--timing', choices=['original', 'asap'], default='original')
+    rep.add_argument('--speedup', type=float, default=1.0)
+    rep.add_argument('--output', default=None, help='Record the replay into a new trace')
+    args = parser.parse_args()
+
+    if args.command == 'summary':
+        backend, records = read_trace(args.trace)
+        print_summary(summarize(records, args.gap), f"{args.trace} ({backend})")
+    elif args.command == 'diff':
+        _, a = read_trace(args.a)
+        _, b = read_trace(args.b)
+        print_diff(summarize(a, args.gap), summarize(b, args.gap))
+        index = first_divergence(a, b)
+        if index is None:
+            print("Motion commands are identical")
+        else:
+            print(f"Motion commands diverge at command {index + 1}")
+    elif args.command == 'replay':
+        backend, records = read_trace(args.trace)
+        arm = _make_sim(backend)
+        writer = None
+        if args.output:
+            writer = TraceWriter(args.output, backend)
+            arm = TracedArm(arm, writer)
+        replay(records, arm, args.timing, args.speedup)
+        if writer:
+            writer.close()
+            _, replayed = read_trace(args.output)
+            print_diff(summarize(records), summarize(replayed))
+
+
+if __name__ == "__main__":
+    main()
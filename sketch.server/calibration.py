@@ -0,0 +1,224 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from telemetry_store import query_positions
+
+# 误差超过该值（毫米）的记录视为读数异常，不参与拟合
+MAX_RECORD_ERROR = 20.0
+# 每个多项式系数至少需要的记录数
+POINTS_PER_COEFF = 5
+
+
+def _design(points, center, scale, degree):
+    """
+    多项式基函数矩阵，坐标先归一化到 [-1, 1] 附近以保证数值稳定
+
+    Returns:
+        ndarray: (N, K) 依次为 u^i * v^j (i + j <= degree)
+    """
+    u = (points[:, 0] - center[0]) / scale[0]
+    v = (points[:, 1] - center[1]) / scale[1]
+    columns = [u ** i * v ** (d - i) for d in range(degree + 1) for i in range(d + 1)]
+    return np.stack(columns, axis=1)
+
+
+def _num_coeffs(degree):
+    return (degree + 1) * (degree + 2) // 2
+
+
+class ErrorCompensation:
+    """
+    从遥测记录学习的位置误差补偿
+
+    误差场 e(q) = 实际位置 - 指令位置 用低阶二维多项式表示。要让笔落在目标点 p，
+    指令位置 q 需要满足 q + e(q) = p，用不动点迭代 q = p - e(q) 求解。误差场只在
+    记录覆盖的范围内可信，范围外按边界值外推，单点修正量限制在 max_correction 内。
+    """
+
+    def __init__(self, degree, coeffs, center, scale, bounds, max_correction=5.0, stats=None):
+        """
+        Args:
+            degree (int): 多项式阶数
+            coeffs (array): (K, 2) x/y 误差的多项式系数
+            center, scale (array): 坐标归一化参数
+            bounds (array): 记录覆盖的范围 [x_min, y_min, x_max, y_max]
+            max_correction (float): 单点最大修正量（毫米）
+            stats (dict): 拟合统计
+        """
+        self.degree = int(degree)
+        self.coeffs = np.asarray(coeffs, dtype=float).reshape(-1, 2)
+        self.center = np.asarray(center, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.max_correction = max_correction
+        self.stats = stats or {}
+
+    @classmethod
+    def fit(cls, commands, actuals, degree=None, max_correction=5.0):
+        """
+        用最小二乘拟合误差场
+
+        Args:
+            commands (array): (N, 2) 指令位置
+            actuals (array): (N, 2) 实际位置
+            degree (int|None): 多项式阶数，None 时用 5 折交叉验证在 1~3 阶中选择
+            max_correction (float): 单点最大修正量（毫米）
+
+        Returns:
+            ErrorCompensation|None: 记录太少时返回None
+        """
+        commands = np.asarray(commands, dtype=float).reshape(-1, 2)
+        errors = np.asarray(actuals, dtype=float).reshape(-1, 2) - commands
+        if len(commands) < POINTS_PER_COEFF * _num_coeffs(1):
+            return None
+
+        center = (commands.min(axis=0) + commands.max(axis=0)) / 2
+        scale = np.maximum((commands.max(axis=0) - commands.min(axis=0)) / 2, 1.0)
+        candidates = [degree] if degree is not None else [
+            d for d in (1, 2, 3) if len(commands) >= POINTS_PER_COEFF * _num_coeffs(d)]
+        if not candidates or len(commands) < POINTS_PER_COEFF * _num_coeffs(candidates[0]):
+            return None
+
+        if len(candidates) > 1:
+            # 交叉验证：按记录顺序交错分折，避免同一条线上的相邻点都落在同一折
+            folds = np.arange(len(commands)) % 5
+            cv_errors = []
+            for d in candidates:
+                residuals = np.empty_like(errors)
+                for k in range(5):
+                    train, test = folds != k, folds == k
+                    A = _design(commands[train], center, scale, d)
+                    coeffs = np.linalg.lstsq(A, errors[train], rcond=None)[0]
+                    residuals[test] = errors[test] - _design(commands[test], center, scale, d) @ coeffs
+                cv_errors.append(np.sqrt(np.mean(np.sum(residuals ** 2, axis=1))))
+            degree = candidates[int(np.argmin(cv_errors))]
+        else:
+            degree = candidates[0]
+
+        A = _design(commands, center, scale, degree)
+        coeffs = np.linalg.lstsq(A, errors, rcond=None)[0]
+        residuals = errors - A @ coeffs
+        stats = {
+            'points': len(commands),
+            'degree': degree,
+            'rms_before': float(np.sqrt(np.mean(np.sum(errors ** 2, axis=1)))),
+            'rms_after': float(np.sqrt(np.mean(np.sum(residuals ** 2, axis=1)))),
+            'max_before': float(np.max(np.hypot(errors[:, 0], errors[:, 1]))),
+            'max_after': float(np.max(np.hypot(residuals[:, 0], residuals[:, 1])))
+        }
+        bounds = np.concatenate([commands.min(axis=0), commands.max(axis=0)])
+        return cls(degree, coeffs, center, scale, bounds, max_correction, stats)
+
+    def error(self, points):
+        """返回 (N, 2) 的预测误差，范围外的点按最近的边界点计算"""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        clamped = np.clip(points, self.bounds[:2], self.bounds[2:])
+        return _design(clamped, self.center, self.scale, self.degree) @ self.coeffs
+
+    def compensate(self, points, iterations=3):
+        """
+        计算让笔落在 points 上需要发送的指令位置
+
+        Args:
+            points (array): (N, 2) 目标位置
+            iterations (int): 不动点迭代次数，误差场平滑时 2~3 次即可收敛
+
+        Returns:
+            ndarray: (N, 2) 指令位置
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        commands = points.copy()
+        for _ in range(iterations):
+            correction = -self.error(commands)
+            norm = np.hypot(correction[:, 0], correction[:, 1])
+            limit = np.minimum(1.0, self.max_correction / np.maximum(norm, 1e-12))
+            commands = points + correction * limit[:, None]
+        return commands
+
+    def to_dict(self):
+        return {
+            'degree': self.degree,
+            'coeffs': self.coeffs.tolist(),
+            'center': self.center.tolist(),
+            'scale': self.scale.tolist(),
+            'bounds': self.bounds.tolist(),
+            'max_correction': self.max_correction,
+            'stats': self.stats
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['degree'], data['coeffs'], data['center'], data['scale'],
+                   data['bounds'], data.get('max_correction', 5.0), data.get('stats'))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """读取标定文件，文件不存在时返回None"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r') as f:
+                return cls.from_dict(json.load(f))
+        except Exception as e:
+            print(f"Error loading calibration: {e}")
+            return None
+
+
+def load_records(db_path, since_days=None):
+    """
+    从遥测数据库读取所有会话的采样点
+
+    Returns:
+        tuple: ((N, 2) 指令位置, (N, 2) 实际位置)
+    """
+    rows = np.array(query_positions(db_path, since_days), dtype=float).reshape(-1, 4)
+    commands, actuals = rows[:, :2], rows[:, 2:]
+    # 读数异常的记录不参与拟合
+    valid = np.hypot(*(actuals - commands).T) <= MAX_RECORD_ERROR
+    return commands[valid], actuals[valid]
+
+
+def calibrate(db_path, degree=None, max_correction=5.0, since_days=None):
+    """从遥测数据库拟合误差补偿，记录不足时返回None"""
+    commands, actuals = load_records(db_path, since_days)
+    return ErrorCompensation.fit(commands, actuals, degree, max_correction)
+
+
+def print_calibration(compensation):
+    """打印拟合统计"""
+    stats = compensation.stats
+    print("Error compensation:")
+    print(f"  Records: {stats.get('points', 0)}, degree: {compensation.degree}")
+    print(f"  RMS error: {stats.get('rms_before', 0):.2f} -> {stats.get('rms_after', 0):.2f} mm")
+    print(f"  Max error: {stats.get('max_before', 0):.2f} -> {stats.get('max_after', 0):.2f} mm")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit position-error compensation from recorded telemetry')
+    parser.add_argument('--db', default='position_records/telemetry.db', help='Telemetry database')
+    parser.add_argument('--since', type=float, default=None, help='Only use records from the last N days')
+    parser.add_argument('--degree', type=int, default=None, help='Polynomial degree (default: chosen by cross-validation)')
+    parser.add_argument('--max-correction', type=float, default=5.0, help='Largest correction applied to a point (mm)')
+    parser.add_argument('--output', default=None, help='Calibration file (default: calibration.json next to the database)')
+    args = parser.parse_args()
+
+    compensation = calibrate(args.db, args.degree, args.max_correction, args.since)
+    if compensation is None:
+        print("Not enough position records to fit a correction")
+        return
+    print_calibration(compensation)
+    output = Path(args.output) if args.output else Path(args.db).parent / "calibration.json"
+    compensation.save(output)
+    print(f"Saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import argparse
+import importlib
+import json
+import math
+import time
+
+import numpy as np
+
+from planner import count_pen_changes, plan_job
+from streaming import Trajectory
+from workspace import Workspace
+
+
+def trapezoid_time(distance, speed, accel):
+    """
+    梯形速度曲线下走完一段距离的时间
+
+    Args:
+        distance (float|ndarray): 运动距离（毫米）
+        speed (float|ndarray): 最高速度（毫米/秒）
+        accel (float): 加速度（毫米/秒^2）
+
+    Returns:
+        float|ndarray: 运动时间（秒）
+    """
+    distance = np.asarray(distance, dtype=float)
+    v = np.asarray(speed, dtype=float)
+    # 距离不足以加速到 v 时是三角形速度曲线
+    short = distance < v * v / accel
+    return np.where(short, 2 * np.sqrt(distance / accel), distance / v + v / accel)
+
+
+class MotionTimeModel:
+    """
+    机械臂运动时间模型
+
+    把绘图循环中的每条指令折算成时间：直线运动按梯形速度曲线（最大速度、
+    加速度）计算，再加上每条指令的通讯开销和循环中的固定等待。
+    blocking 表示运动指令是否等到运动完成才返回（RoboticArm 的 moveL）；
+    非阻塞的后端（MyCobot 的 send_coords）运动与等待重叠，取两者较大值。
+    """
+
+    def __init__(self, params):
+        """
+        Args:
+            params (dict): 模型参数：服务器文件中的 MOTION_MODEL 标定值加上速度/质量配置
+        """
+        self.params = dict(params)
+        self.blocking = params['blocking']
+        self.max_speed = params['max_speed']
+        self.max_accel = params['max_accel']
+        self.command_overhead = params['command_overhead']
+        # 每个点之后读取实际位置的时间；MyCobot 的读取包含在 point_interval 内
+        self.query_time = params.get('query_time', 0.0)
+        self.approach_speed = params['approach_speed']
+        self.draw_speed = params['draw_speed']
+        self.lift_speed = params['lift_speed']
+        self.approach_settle = params['approach_settle']
+        self.point_interval = params['point_interval']
+        self.lift_settle = params['lift_settle']
+        self.z_diff = params['z_diff']
+        self.home = params['home']
+        # 插值流式发送的控制频率，0 表示逐点发送
+        self.stream_rate = params.get('stream_rate', 0)
+        # 多笔任务每次换笔的时间：回到原位、等待操作员换笔、回到画面
+        self.pen_change_time = params.get('pen_change_time', 0.0)
+
+    def move_time(self, distance, velocity):
+        """
+        按梯形速度曲线计算直线运动时间
+
+        Args:
+            distance (float|ndarray): 运动距离（毫米）
+            velocity (float|ndarray): 速度百分比 (0-100)
+
+        Returns:
+            float|ndarray: 运动时间（秒）
+        """
+        return trapezoid_time(distance, self.max_speed * np.asarray(velocity, dtype=float) / 100.0,
+                              self.max_accel)
+
+    def step_time(self, motion, settle):
+        """一条运动指令加上其后的等待所占用的时间"""
+        if self.blocking:
+            return self.command_overhead + motion + settle
+        return np.maximum(self.command_overhead + motion, settle)
+
+    def stroke_times(self, strokes, speeds=None, start=None):
+        """
+        逐条估算线条的落笔时间、抬笔时间和指令数量
+
+        Args:
+            strokes (list): 机械臂坐标线条列表（规划结果）
+            speeds (list|None): 每个点的速度百分比（规划结果），为None时使用固定的 draw_speed
+            start (array|None): 笔的起始位置，为None时从 home 出发
+
+        Returns:
+            list: 每条线条一个字典 {'pen_down', 'pen_up', 'commands', 'draw_length', 'travel_length'}
+        """
+        times = []
+        position = np.asarray(self.home if start is None else start, dtype=float)
+
+        for index, stroke in enumerate(strokes):
+            stroke = np.asarray(stroke, dtype=float)
+
+            # 抬笔移动到线条起点
+            travel = float(np.hypot(*(stroke[0] - position)))
+            pen_up = float(self.step_time(self.move_time(travel, self.approach_speed), self.approach_settle))
+
+            # 第一个点是竖直落笔，后面每个点是一段直线
+            seg = np.hypot(*np.diff(stroke, axis=0).T) if len(stroke) > 1 else np.empty(0)
+            distances = np.concatenate([[self.z_diff], seg])
+            velocity = speeds[index] if speeds is not None else self.draw_speed
+            if self.stream_rate:
+                # 流式发送：竖直落笔之后按时间参数化的轨迹连续运动
+                lower = np.atleast_1d(velocity)[0]
+                trajectory = Trajectory(stroke, self.max_speed * self.params['max_velocity'] / 100.0,
+                                        self.max_accel, self.params['accuracy'])
+                pen_down = float(self.step_time(self.move_time(self.z_diff, lower), self.point_interval))
+                pen_down += trajectory.duration
+                commands = 1 + math.ceil(trajectory.duration * self.stream_rate) + 1
+            else:
+                motion = self.move_time(distances, velocity)
+                pen_down = float(np.sum(self.step_time(motion, self.point_interval)))
+                pen_down += self.query_time * len(distances)
+                commands = len(distances)
+
+            # 抬笔
+            pen_up += self.lift_settle + float(self.step_time(self.move_time(self.z_diff, self.lift_speed), self.lift_settle))
+
+            times.append({
+                'pen_down': pen_down,
+                'pen_up': pen_up,
+                'commands': commands + 2,
+                'draw_length': float(seg.sum()),
+                'travel_length': travel
+            })
+            position = stroke[-1]
+        return times
+
+    def estimate(self, strokes, speeds=None):
+        """
+        估算绘制一组线条所需的时间
+
+        Args:
+            strokes (list): 机械臂坐标线条列表（规划结果）
+            speeds (list|None): 每个点的速度百分比（规划结果）
+
+        Returns:
+            dict: 落笔时间、抬笔时间、抬笔次数、指令数量、总时间等
+        """
+        times = self.stroke_times(strokes, speeds)
+        pen_down = sum(t['pen_down'] for t in times)
+        pen_up = sum(t['pen_up'] for t in times)
+        return {
+            'strokes': len(strokes),
+            'lifts': len(strokes),
+            'commands': sum(t['commands'] for t in times),
+            'pen_down_time': pen_down,
+            'pen_up_time': pen_up,
+            'total_time': pen_down + pen_up,
+            'draw_length': sum(t['draw_length'] for t in times),
+            'travel_length': sum(t['travel_length'] for t in times)
+        }
+
+
+class EtaTracker:
+    """
+    根据逐条估算时间和已实际用时计算剩余时间
+
+    已完成部分的实际用时与估算用时之比用来修正剩余部分的估算。
+    """
+
+    def __init__(self, stroke_times, start_index=0):
+        """
+        Args:
+            stroke_times (list): MotionTimeModel.stroke_times 的结果
+            start_index (int): 从第几条线开始绘制（断点续画）
+        """
+        self.durations = [t['pen_down'] + t['pen_up'] for t in stroke_times]
+        self.start_index = start_index
+        self.start_time = time.time()
+
+    def eta(self, done):
+        """
+        Args:
+            done (int): 已完成的线条数量（含断点之前跳过的）
+
+        Returns:
+            float: 预计剩余时间（秒）
+        """
+        estimated_done = sum(self.durations[self.start_index:done])
+        remaining = sum(self.durations[done:])
+        elapsed = time.time() - self.start_time
+        if estimated_done > 0 and elapsed > 0:
+            remaining *= elapsed / estimated_done
+        return remaining
+
+    def update(self, stroke_times):
+        """任务在绘制中重新规划（并入新到达的线条）后更新逐条估算时间，已画完的线条不变"""
+        self.durations = [t['pen_down'] + t['pen_up'] for t in stroke_times]
+
+
+def estimate_job(lines, width, height, workspace, profile, max_duration=None, pen=None):
+    """
+    不运动机械臂，跑完整个规划流程并估算用时
+
+    Args:
+        lines (list): LINES 消息中的线条（屏幕坐标）
+        width (float): 画布宽度
+        height (float): 画布高度
+        workspace (Workspace): 机械臂工作空间
+        profile (JobProfile): 速度/质量配置，包含运动时间模型
+        max_duration (float|None): 可用时间段长度（秒），超出时 fits 为False
+        pen: 当前装着的笔，决定多笔任务的换笔次数
+
+    Returns:
+        dict: 估算结果，包含预检报告
+    """
+    plan = plan_job(lines, width, height, workspace, profile, verbose=False, pen=pen)
+    result = profile.model.estimate(plan['strokes'], plan['speeds'])
+    # 换笔时任务暂停等待操作员，按次数计入总时间
+    result['pen_changes'] = count_pen_changes(plan['pens'], pen)
+    result['pen_change_time'] = result['pen_changes'] * profile.model.pen_change_time
+    result['total_time'] += result['pen_change_time']
+    result['profile'] = profile.name
+    result['report'] = plan['report']
+    if max_duration is not None:
+        result['max_duration'] = max_duration
+        result['fits'] = result['total_time'] <= max_duration
+    return result
+
+
+def print_estimate(result):
+    """打印估算结果"""
+    print(f"Estimate ({result['profile']} profile):")
+    print(f"  Strokes / lifts: {result['strokes']} / {result['lifts']}")
+    print(f"  Commands: {result['commands']}")
+    print(f"  Draw length: {result['draw_length']:.1f} mm, travel length: {result['travel_length']:.1f} mm")
+    print(f"  Pen-down time: {result['pen_down_time']:.1f} s")
+    print(f"  Pen-up time: {result['pen_up_time']:.1f} s")
+    print(f"  Pen changes: {result.get('pen_changes', 0)} ({result.get('pen_change_time', 0.0):.1f} s)")
+    minutes, seconds = divmod(result['total_time'], 60)
+    print(f"  Total: {result['total_time']:.1f} s ({int(minutes)}m{math.floor(seconds):02d}s)")
+    if 'fits' in result:
+        print(f"  Fits in {result['max_duration']:.0f} s slot: {result['fits']}")
+
+
+# 后端名称 -> 服务器模块
+BACKENDS = {
+    'mycobot': 'server',
+    'rm': 'rm_server'
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Estimate drawing time without moving the arm')
+    parser.add_argument('payload', help='JSON file with a LINES message or a list of lines')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='mycobot', help='Arm backend')
+    parser.add_argument('--width', type=float, default=800, help='Canvas width')
+    parser.add_argument('--height', type=float, default=600, help='Canvas height')
+    parser.add_argument('--config', default='robot_config.json', help='Config file with profile and motion_model overrides')
+    parser.add_argument('--profile', default='standard', help='Speed/quality profile')
+    parser.add_argument('--max-duration', type=float, default=None, help='Time slot in seconds')
+    parser.add_argument('--pen', type=int, default=None, help='Pen loaded at the start of a multi-pen job')
+    args = parser.parse_args()
+
+    with open(args.payload, 'r') as f:
+        payload = json.load(f)
+    lines = payload['data'] if isinstance(payload, dict) else payload
+
+    # 工作空间和运动模型的标定值定义在各自的服务器文件里
+    backend = importlib.import_module(BACKENDS[args.backend])
+    workspace = Workspace(backend.ARM_X_MIN, backend.ARM_X_MAX, backend.ARM_Y_MIN, backend.ARM_Y_MAX,
+                          backend.ARM_REACH_MIN, backend.ARM_REACH_MAX)
+    # profiles 依赖本模块，在这里导入避免循环导入
+    from profiles import load_profiles
+    profiles = load_profiles(backend.PROFILES, backend.MOTION_MODEL, args.config)
+
+    result = estimate_job(lines, args.width, args.height, workspace, profiles[args.profile], args.max_duration,
+                          args.pen)
+    print_estimate(result)
@@ -0,0 +1,171 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+# 计算移动路径上纸面最高点时的采样间隔（毫米）
+PATH_STEP = 5.0
+
+
+class HeightMap:
+    """
+    纸面高度图
+
+    在规则网格的节点上探测笔刚好接触纸面的高度，保存相对参考落笔高度
+    （探测时的 arm_z_up - ARM_Z_DIFF）的偏差。任意点的偏差用双线性插值得到，
+    网格外按边界值外推。ADJUST_HEIGHT 调整 arm_z_up 时整张高度图随之平移。
+    """
+
+    def __init__(self, xs, ys, offsets, stats=None):
+        """
+        Args:
+            xs (array): (C,) 网格列的 x 坐标，递增
+            ys (array): (R,) 网格行的 y 坐标，递增
+            offsets (array): (R, C) 各节点的高度偏差（毫米），正值表示纸面比参考高度高
+            stats (dict): 探测统计
+        """
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=float).reshape(len(self.ys), len(self.xs))
+        self.stats = stats or {}
+
+    @classmethod
+    def fit(cls, points, offsets):
+        """
+        由网格节点上的探测结果生成高度图
+
+        Args:
+            points (array): (N, 2) 探测点，位于规则网格的节点上（不可达的节点可以缺失）
+            offsets (array): (N,) 探测到的高度偏差
+
+        Returns:
+            HeightMap: 缺失的节点使用最近的探测值
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        offsets = np.asarray(offsets, dtype=float).reshape(-1)
+        xs = np.unique(np.round(points[:, 0], 3))
+        ys = np.unique(np.round(points[:, 1], 3))
+        gx, gy = np.meshgrid(xs, ys)
+        nodes = np.stack([gx.ravel(), gy.ravel()], axis=1)
+        nearest = np.argmin(np.sum((nodes[:, None, :] - points[None, :, :]) ** 2, axis=2), axis=1)
+        stats = {
+            'probes': len(points),
+            'rows': len(ys),
+            'cols': len(xs),
+            'min': float(offsets.min()),
+            'max': float(offsets.max()),
+            'range': float(offsets.max() - offsets.min())
+        }
+        return cls(xs, ys, offsets[nearest], stats)
+
+    @staticmethod
+    def _cells(grid, values):
+        """每个值所在的网格区间和区间内的插值系数，网格外截断到边界"""
+        if len(grid) == 1:
+            return np.zeros(len(values), dtype=int), np.zeros(len(values))
+        values = np.clip(values, grid[0], grid[-1])
+        index = np.clip(np.searchsorted(grid, values, side='right') - 1, 0, len(grid) - 2)
+        return index, (values - grid[index]) / (grid[index + 1] - grid[index])
+
+    def offset(self, points):
+        """返回 (N,) 的高度偏差"""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        col, u = self._cells(self.xs, points[:, 0])
+        row, v = self._cells(self.ys, points[:, 1])
+        col1 = np.minimum(col + 1, len(self.xs) - 1)
+        row1 = np.minimum(row + 1, len(self.ys) - 1)
+        z = self.offsets
+        return ((1 - v) * ((1 - u) * z[row, col] + u * z[row, col1])
+                + v * ((1 - u) * z[row1, col] + u * z[row1, col1]))
+
+    def max_offset(self, start, end=None):
+        """从 start 直线移动到 end 的路径上纸面的最大高度偏差"""
+        start = np.asarray(start, dtype=float)
+        end = start if end is None else np.asarray(end, dtype=float)
+        count = int(np.ceil(np.hypot(*(end - start)) / PATH_STEP)) + 1
+        t = np.linspace(0.0, 1.0, count)[:, None]
+        return float(np.max(self.offset(start + (end - start) * t)))
+
+    def to_dict(self):
+        return {
+            'xs': self.xs.tolist(),
+            'ys': self.ys.tolist(),
+            'offsets': self.offsets.tolist(),
+            'stats': self.stats
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['xs'], data['ys'], data['offsets'], data.get('stats'))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """读取高度图文件，文件不存在时返回None"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r') as f:
+                return cls.from_dict(json.load(f))
+        except Exception as e:
+            print(f"Error loading height map: {e}")
+            return None
+
+
+def probe_grid(workspace, rows, cols, margin=10.0):
+    """
+    在工作空间的矩形区域内生成探测网格，只保留可达的节点
+
+    Args:
+        workspace (Workspace): 绘图工作空间
+        rows, cols (int): 网格的行数和列数
+        margin (float): 网格离矩形边界的距离（毫米）
+
+    Returns:
+        ndarray: (N, 2) 探测点，按蛇形顺序排列以减少移动
+    """
+    xs = np.linspace(workspace.x_min + margin, workspace.x_max - margin, max(cols, 1))
+    ys = np.linspace(workspace.y_min + margin, workspace.y_max - margin, max(rows, 1))
+    points = [(x, y) for i, y in enumerate(ys) for x in (xs if i % 2 == 0 else xs[::-1])]
+    points = np.array(points, dtype=float)
+    return points[workspace.in_reach(points)]
+
+
+def print_height_map(height_map):
+    """打印探测统计"""
+    stats = height_map.stats
+    print("Height map:")
+    print(f"  Grid: {len(height_map.ys)} x {len(height_map.xs)}, probes: {stats.get('probes', 0)}")
+    print(f"  Surface: {stats.get('min', 0):+.2f} .. {stats.get('max', 0):+.2f} mm "
+          f"(range {stats.get('range', 0):.2f} mm)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or inspect a paper height map')
+    parser.add_argument('--probes', default=None,
+                        help='CSV file with one "x,y,offset" probe per line, measured on a regular grid')
+    parser.add_argument('--file', default='position_records/height_map.json', help='Height map file')
+    args = parser.parse_args()
+
+    if args.probes:
+        probes = np.loadtxt(args.probes, delimiter=',', ndmin=2)
+        height_map = HeightMap.fit(probes[:, :2], probes[:, 2])
+        height_map.save(args.file)
+        print(f"Saved to {args.file}")
+    else:
+        height_map = HeightMap.load(args.file)
+        if height_map is None:
+            print(f"No height map at {args.file}")
+            return
+    print_height_map(height_map)
+    for y, row in zip(height_map.ys, height_map.offsets):
+        print(f"  y={y:7.1f}: " + " ".join(f"{z:+6.2f}" for z in row))
+
+
+if __name__ == "__main__":
+    main()
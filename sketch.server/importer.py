@@ -0,0 +1,652 @@
+import argparse
+import asyncio
+import json
+import math
+import re
+import uuid
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+# 读取 G-code 时默认的画布（毫米），原点在左下角
+GCODE_BED = (300.0, 300.0)
+
+# SVG 中不直接绘制的容器，里面的图形跳过
+SVG_HIDDEN = {'defs', 'clipPath', 'mask', 'symbol', 'marker', 'pattern', 'metadata', 'title', 'desc', 'style'}
+
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+def _segments(extent, tolerance):
+    """
+    曲线的二阶导数上界为 extent 时，折线误差不超过 tolerance 需要的段数
+    （均匀分段的弦高误差不超过 extent * h^2 / 8）
+    """
+    return max(int(math.ceil(math.sqrt(extent / (8.0 * tolerance)))), 1)
+
+
+def flatten_quadratic(p0, p1, p2, tolerance):
+    """二次贝塞尔曲线转折线，不含起点"""
+    p0, p1, p2 = (np.asarray(p, dtype=float) for p in (p0, p1, p2))
+    n = _segments(2.0 * np.hypot(*(p0 - 2 * p1 + p2)), tolerance)
+    t = np.linspace(0.0, 1.0, n + 1)[1:, None]
+    return (1 - t) ** 2 * p0 + 2 * (1 - t) * t * p1 + t ** 2 * p2
+
+
+def flatten_cubic(p0, p1, p2, p3, tolerance):
+    """三次贝塞尔曲线转折线，不含起点"""
+    p0, p1, p2, p3 = (np.asarray(p, dtype=float) for p in (p0, p1, p2, p3))
+    extent = 6.0 * max(np.hypot(*(p0 - 2 * p1 + p2)), np.hypot(*(p1 - 2 * p2 + p3)))
+    n = _segments(extent, tolerance)
+    t = np.linspace(0.0, 1.0, n + 1)[1:, None]
+    return (1 - t) ** 3 * p0 + 3 * (1 - t) ** 2 * t * p1 + 3 * (1 - t) * t ** 2 * p2 + t ** 3 * p3
+
+
+def flatten_arc(center, rx, ry, phi, theta0, sweep, tolerance, transform=None):
+    """
+    椭圆弧转折线，不含起点
+
+    Args:
+        center (tuple): 圆心
+        rx, ry (float): 半轴长
+        phi (float): 椭圆 x 轴的旋转角（弧度）
+        theta0 (float): 起始参数角（弧度）
+        sweep (float): 扫过的角度（弧度），正值为参数角增大的方向
+        tolerance (float): 弦高误差
+        transform (ndarray|None): 3x3 仿射变换，用来按变换后的尺寸计算段数
+    """
+    scale = np.linalg.norm(transform[:2, :2], 2) if transform is not None else 1.0
+    radius = max(rx, ry) * scale
+    # 弦高误差 r * (1 - cos(dθ/2)) <= tolerance
+    if radius > tolerance:
+        step = 2.0 * math.acos(1.0 - tolerance / radius)
+    else:
+        step = math.pi / 2
+    n = max(int(math.ceil(abs(sweep) / step)), 1)
+    theta = theta0 + sweep * np.linspace(0.0, 1.0, n + 1)[1:]
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    x, y = rx * np.cos(theta), ry * np.sin(theta)
+    return np.stack([center[0] + cos_phi * x - sin_phi * y, center[1] + sin_phi * x + cos_phi * y], axis=1)
+
+
+def _svg_arc(p0, rx, ry, angle, large, sweep_flag, p1, tolerance, transform):
+    """SVG 端点参数的椭圆弧（A 命令）转成中心参数后展平，见 SVG 规范附录 B.2.4"""
+    if np.allclose(p0, p1):
+        return np.empty((0, 2))
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0:
+        return np.asarray([p1], dtype=float)
+    phi = math.radians(angle)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = (p0[0] - p1[0]) / 2, (p0[1] - p1[1]) / 2
+    x1 = cos_phi * dx + sin_phi * dy
+    y1 = -sin_phi * dx + cos_phi * dy
+    # 半径不够时等比放大
+    scale = x1 ** 2 / rx ** 2 + y1 ** 2 / ry ** 2
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    num = rx ** 2 * ry ** 2 - rx ** 2 * y1 ** 2 - ry ** 2 * x1 ** 2
+    den = rx ** 2 * y1 ** 2 + ry ** 2 * x1 ** 2
+    factor = math.sqrt(max(num / den, 0.0))
+    if large == sweep_flag:
+        factor = -factor
+    cx1, cy1 = factor * rx * y1 / ry, -factor * ry * x1 / rx
+    center = (cos_phi * cx1 - sin_phi * cy1 + (p0[0] + p1[0]) / 2,
+              sin_phi * cx1 + cos_phi * cy1 + (p0[1] + p1[1]) / 2)
+    theta0 = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    theta1 = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx)
+    sweep = theta1 - theta0
+    if sweep_flag and sweep < 0:
+        sweep += 2 * math.pi
+    elif not sweep_flag and sweep > 0:
+        sweep -= 2 * math.pi
+    points = flatten_arc(center, rx, ry, phi, theta0, sweep, tolerance, transform)
+    points[-1] = p1
+    return points
+
+
+class _PathScanner:
+    """SVG path 数据的扫描器；弧线标志位可以不带分隔符（如 "a1 1 0 00 1 1"）"""
+
+    def __init__(self, d):
+        self.d = d
+        self.pos = 0
+
+    def _skip(self):
+        while self.pos < len(self.d) and self.d[self.pos] in ' \t\r\n,':
+            self.pos += 1
+
+    def command(self):
+        self._skip()
+        if self.pos < len(self.d) and self.d[self.pos].isalpha():
+            self.pos += 1
+            return self.d[self.pos - 1]
+        return None
+
+    def has_number(self):
+        self._skip()
+        return bool(_NUMBER.match(self.d, self.pos))
+
+    def number(self):
+        self._skip()
+        match = _NUMBER.match(self.d, self.pos)
+        if not match:
+            raise ValueError(f"Expected a number at position {self.pos} of path data")
+        self.pos = match.end()
+        return float(match.group())
+
+    def flag(self):
+        self._skip()
+        if self.pos >= len(self.d) or self.d[self.pos] not in '01':
+            raise ValueError(f"Expected an arc flag at position {self.pos} of path data")
+        self.pos += 1
+        return self.d[self.pos - 1] == '1'
+
+
+def parse_path(d, tolerance, transform):
+    """
+    解析 SVG path 的 d 属性
+
+    贝塞尔曲线的控制点先做仿射变换再展平（仿射变换后仍是同阶贝塞尔曲线），
+    误差按变换后的坐标计算。
+
+    Yields:
+        ndarray: 每个子路径一条 (N, 2) 折线（已变换）
+    """
+    def apply(p):
+        return transform[:2, :2] @ np.asarray(p, dtype=float) + transform[:2, 2]
+
+    scanner = _PathScanner(d)
+    current = np.zeros(2)
+    start = np.zeros(2)
+    control = None
+    stroke = []
+    command = None
+    while True:
+        next_command = scanner.command()
+        if next_command is None:
+            if command is None or not scanner.has_number():
+                break
+            if command in 'Zz':
+                raise ValueError(f"Unexpected number after {command} in path data")
+            # 省略命令字母时重复上一个命令，M 之后重复的是 L
+            next_command = {'M': 'L', 'm': 'l'}.get(command, command)
+        command = next_command
+        relative = command.islower()
+        cmd = command.upper()
+        base = current if relative else np.zeros(2)
+
+        def point():
+            return base + (scanner.number(), scanner.number())
+
+        if cmd == 'M':
+            if len(stroke) > 1:
+                yield np.asarray(stroke)
+            current = start = point()
+            stroke = [apply(current)]
+            control = None
+        elif cmd == 'Z':
+            if stroke and not np.allclose(current, start):
+                stroke.append(apply(start))
+            if len(stroke) > 1:
+                yield np.asarray(stroke)
+            current = start
+            stroke = [apply(current)]
+            control = None
+        elif cmd in 'LHV':
+            if cmd == 'L':
+                current = point()
+            elif cmd == 'H':
+                current = np.array([scanner.number() + (current[0] if relative else 0), current[1]])
+            else:
+                current = np.array([current[0], scanner.number() + (current[1] if relative else 0)])
+            stroke.append(apply(current))
+            control = None
+        elif cmd in 'CS':
+            if cmd == 'C':
+                c1 = point()
+            else:
+                # S 的第一个控制点是上一条三次曲线第二个控制点的镜像
+                c1 = 2 * current - control[1] if control is not None and control[0] == 'C' else current
+            c2, end = point(), point()
+            stroke.extend(flatten_cubic(apply(current), apply(c1), apply(c2), apply(end), tolerance))
+            control = ('C', c2)
+            current = end
+        elif cmd in 'QT':
+            if cmd == 'Q':
+                c1 = point()
+            else:
+                c1 = 2 * current - control[1] if control is not None and control[0] == 'Q' else current
+            end = point()
+            stroke.extend(flatten_quadratic(apply(current), apply(c1), apply(end), tolerance))
+            control = ('Q', c1)
+            current = end
+        elif cmd == 'A':
+            rx, ry, angle = scanner.number(), scanner.number(), scanner.number()
+            large, sweep = scanner.flag(), scanner.flag()
+            end = point()
+            local = _svg_arc(current, rx, ry, angle, large, sweep, end, tolerance, transform)
+            stroke.extend(apply(p) for p in local)
+            control = None
+            current = end
+        else:
+            raise ValueError(f"Unknown path command {command}")
+    if len(stroke) > 1:
+        yield np.asarray(stroke)
+
+
+def parse_transform(text):
+    """解析 SVG transform 属性，返回 3x3 矩阵"""
+    matrix = np.eye(3)
+    for name, args in re.findall(r'(\w+)\s*\(([^)]*)\)', text or ''):
+        values = [float(v) for v in _NUMBER.findall(args)]
+        m = np.eye(3)
+        if name == 'matrix' and len(values) == 6:
+            a, b, c, d, e, f = values
+            m[:2] = [[a, c, e], [b, d, f]]
+        elif name == 'translate':
+            m[0, 2] = values[0]
+            m[1, 2] = values[1] if len(values) > 1 else 0.0
+        elif name == 'scale':
+            m[0, 0] = values[0]
+            m[1, 1] = values[1] if len(values) > 1 else values[0]
+        elif name == 'rotate':
+            a = math.radians(values[0])
+            cx, cy = (values[1], values[2]) if len(values) == 3 else (0.0, 0.0)
+            rotation = np.array([[math.cos(a), -math.sin(a), 0], [math.sin(a), math.cos(a), 0], [0, 0, 1]])
+            m = _translate(cx, cy) @ rotation @ _translate(-cx, -cy)
+        elif name == 'skewX':
+            m[0, 1] = math.tan(math.radians(values[0]))
+        elif name == 'skewY':
+            m[1, 0] = math.tan(math.radians(values[0]))
+        matrix = matrix @ m
+    return matrix
+
+
+def _translate(x, y):
+    m = np.eye(3)
+    m[:2, 2] = x, y
+    return m
+
+
+def _length(value):
+    """解析 SVG 长度属性（忽略单位）"""
+    match = _NUMBER.match(value or '')
+    return float(match.group()) if match else None
+
+
+def _points_attr(text):
+    values = [float(v) for v in _NUMBER.findall(text or '')]
+    return np.asarray(values[:len(values) // 2 * 2], dtype=float).reshape(-1, 2)
+
+
+def _shape_strokes(tag, attrib, tolerance, transform):
+    """基本图形转成折线（已变换）"""
+    def apply(points):
+        return points @ transform[:2, :2].T + transform[:2, 2]
+
+    def get(name):
+        return _length(attrib.get(name)) or 0.0
+
+    if tag == 'path':
+        yield from parse_path(attrib.get('d', ''), tolerance, transform)
+    elif tag == 'line':
+        yield apply(np.array([[get('x1'), get('y1')], [get('x2'), get('y2')]]))
+    elif tag in ('polyline', 'polygon'):
+        points = _points_attr(attrib.get('points'))
+        if tag == 'polygon' and len(points) > 2:
+            points = np.vstack([points, points[:1]])
+        if len(points) > 1:
+            yield apply(points)
+    elif tag == 'rect':
+        x, y, w, h = get('x'), get('y'), get('width'), get('height')
+        if w > 0 and h > 0:
+            yield apply(np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h], [x, y]]))
+    elif tag in ('circle', 'ellipse'):
+        rx = get('r') if tag == 'circle' else get('rx')
+        ry = get('r') if tag == 'circle' else get('ry')
+        if rx > 0 and ry > 0:
+            center = (get('cx'), get('cy'))
+            ring = flatten_arc(center, rx, ry, 0.0, 0.0, 2 * math.pi, tolerance, transform)
+            yield apply(np.vstack([ring[-1:], ring]))
+
+
+def read_svg(f, tolerance=0.1):
+    """
+    流式读取 SVG：按文档顺序逐个图形解析，解析过的元素立即释放
+
+    画布大小取自根元素的 viewBox（或 width/height），viewBox 的原点平移到 (0, 0)。
+
+    Args:
+        f: 二进制或文本文件对象
+        tolerance (float): 曲线展平的误差（画布单位）
+
+    Returns:
+        tuple: (width, height, 折线迭代器)
+    """
+    events = ET.iterparse(f, events=('start', 'end'))
+    _, root = next(events)
+    if _local(root.tag) != 'svg':
+        raise ValueError("Not an SVG document")
+    width, height = _length(root.get('width')), _length(root.get('height'))
+    base = np.eye(3)
+    view_box = [float(v) for v in _NUMBER.findall(root.get('viewBox') or '')]
+    if len(view_box) == 4:
+        min_x, min_y, vb_width, vb_height = view_box
+        base = _translate(-min_x, -min_y)
+        width, height = vb_width, vb_height
+    if not width or not height:
+        raise ValueError("SVG has no viewBox or width/height")
+    base = base @ parse_transform(root.get('transform'))
+
+    def strokes():
+        stack = [base]
+        hidden = 0
+        for event, elem in events:
+            tag = _local(elem.tag)
+            # display="none" 的元素连同子元素都不显示
+            invisible = tag in SVG_HIDDEN or elem.get('display') == 'none'
+            if event == 'start':
+                stack.append(stack[-1] @ parse_transform(elem.get('transform')))
+                if invisible:
+                    hidden += 1
+                elif not hidden:
+                    # 属性在 start 事件时已经完整，子元素还没有读入
+                    yield from _shape_strokes(tag, elem.attrib, tolerance, stack[-1])
+            else:
+                stack.pop()
+                if invisible:
+                    hidden -= 1
+                elem.clear()
+                if len(stack) == 1:
+                    # 顶层元素结束后从根元素上摘掉，内存只和单个顶层元素的大小有关
+                    root.clear()
+
+    return width, height, strokes()
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def read_gcode(f, tolerance=0.1, width=None, height=None, pen_z=0.0):
+    """
+    流式读取 G-code，逐行解析 G0/G1/G2/G3
+
+    落笔判断：出现过 Z 坐标时 Z <= pen_z 为落笔；出现过 M3/M4/M5 时按主轴（舵机/激光）
+    开关；两者都没有时 G0 为抬笔移动，G1/G2/G3 为绘制。支持 G20/G21、G90/G91，
+    圆弧按 XY 平面（G17）处理，I/J 为相对圆心，或用 R 指定半径。
+
+    Args:
+        f: 文本文件对象
+        tolerance (float): 圆弧展平的误差（毫米）
+        width, height (float|None): 画布（毫米），默认 GCODE_BED
+        pen_z (float): 落笔高度
+
+    Returns:
+        tuple: (width, height, 折线迭代器)，折线为屏幕坐标（y 向下）
+    """
+    width = width or GCODE_BED[0]
+    height = height or GCODE_BED[1]
+
+    def screen(points):
+        points = np.asarray(points, dtype=float)
+        return np.stack([points[:, 0], height - points[:, 1]], axis=1)
+
+    def strokes():
+        position = np.zeros(2)
+        z = None
+        units = 1.0
+        absolute = True
+        motion = None
+        spindle = None
+        stroke = []
+        for line in f:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', 'replace')
+            line = re.sub(r'\(.*?\)', '', line.split(';', 1)[0]).upper()
+            words = re.findall(r'([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))', line)
+            if not words:
+                continue
+            params = {}
+            for letter, value in words:
+                value = float(value)
+                if letter == 'G':
+                    code = int(round(value))
+                    if code in (0, 1, 2, 3):
+                        motion = code
+                    elif code == 20:
+                        units = 25.4
+                    elif code == 21:
+                        units = 1.0
+                    elif code == 90:
+                        absolute = True
+                    elif code == 91:
+                        absolute = False
+                elif letter == 'M':
+                    code = int(round(value))
+                    if code in (3, 4):
+                        spindle = True
+                    elif code == 5:
+                        spindle = False
+                        if len(stroke) > 1:
+                            yield screen(stroke)
+                        stroke = []
+                else:
+                    params[letter] = value
+
+            if 'Z' in params:
+                z = params['Z'] * units + (0.0 if absolute or z is None else z)
+            if motion is None or not ({'X', 'Y'} & params.keys()):
+                if z is not None and z > pen_z and len(stroke) > 1:
+                    yield screen(stroke)
+                    stroke = []
+                continue
+
+            target = position.copy()
+            for axis, letter in enumerate('XY'):
+                if letter in params:
+                    target[axis] = params[letter] * units + (0.0 if absolute else position[axis])
+
+            if z is not None:
+                down = z <= pen_z
+            elif spindle is not None:
+                down = spindle
+            else:
+                down = motion != 0
+            if not down:
+                if len(stroke) > 1:
+                    yield screen(stroke)
+                stroke = []
+                position = target
+                continue
+
+            if not stroke:
+                stroke = [position.copy()]
+            if motion in (2, 3):
+                stroke.extend(_gcode_arc(position, target, params, units, motion == 2, tolerance))
+            else:
+                stroke.append(target)
+            position = target
+        if len(stroke) > 1:
+            yield screen(stroke)
+
+    return width, height, strokes()
+
+
+def _gcode_arc(start, end, params, units, clockwise, tolerance):
+    """G2/G3 圆弧转折线，不含起点"""
+    if 'R' in params:
+        r = params['R'] * units
+        chord = end - start
+        d = np.hypot(*chord)
+        if d == 0:
+            return [end]
+        h = math.sqrt(max(r * r - d * d / 4, 0.0))
+        normal = np.array([-chord[1], chord[0]]) / d
+        # R 为负时取大于半圆的那段弧
+        side = 1.0 if clockwise == (r < 0) else -1.0
+        center = start + chord / 2 + side * h * normal
+        r = abs(r)
+    else:
+        center = start + np.array([params.get('I', 0.0), params.get('J', 0.0)]) * units
+        r = np.hypot(*(start - center))
+    a0 = math.atan2(start[1] - center[1], start[0] - center[0])
+    a1 = math.atan2(end[1] - center[1], end[0] - center[0])
+    sweep = a1 - a0
+    if clockwise and sweep >= 0:
+        sweep -= 2 * math.pi
+    elif not clockwise and sweep <= 0:
+        sweep += 2 * math.pi
+    points = flatten_arc(center, r, r, 0.0, a0, sweep, tolerance)
+    points[-1] = end
+    return list(points)
+
+
+def open_strokes(f, fmt, tolerance=0.1, width=None, height=None):
+    """
+    按格式打开 SVG 或 G-code 文件
+
+    Returns:
+        tuple: (画布宽, 画布高, 折线迭代器)
+    """
+    if fmt == 'svg':
+        return read_svg(f, tolerance)
+    if fmt == 'gcode':
+        return read_gcode(f, tolerance, width, height)
+    raise ValueError(f"Unknown import format {fmt}")
+
+
+def guess_format(name):
+    return 'svg' if name.lower().endswith('.svg') else 'gcode'
+
+
+def batches(strokes, max_points=5000):
+    """
+    把折线按点数分批，转成 LINES 消息的格式；超过 max_points 的长折线拆成首尾相接的几段
+
+    Args:
+        strokes (iterable): (N, 2) 折线
+        max_points (int): 每批的点数上限，至少为 2
+
+    Yields:
+        list: 一批线条（屏幕坐标点字典列表）
+    """
+    if max_points < 2:
+        raise ValueError("max_points must be at least 2")
+    batch, points = [], 0
+    for stroke in strokes:
+        for i in range(0, max(len(stroke) - 1, 1), max_points - 1):
+            piece = stroke[i:i + max_points]
+            if points + len(piece) > max_points and batch:
+                yield batch
+                batch, points = [], 0
+            batch.append([{'x': float(x), 'y': float(y)} for x, y in piece])
+            points += len(piece)
+    if batch:
+        yield batch
+
+
+async def send_file(host, port, path, fmt, tolerance, width, height, profile, max_points, window=1):
+    """
+    把文件按批发送给服务器
+
+    先用 RESET 设置画布大小，再逐批发送 LINES；已发送但未完成的批次不超过 window 个，
+    服务器端和本进程的内存占用都与文件大小无关。每条消息以换行结尾。
+
+    任务事件会广播给所有客户端：每批 LINES 带一个 id，服务器在 JOB_ACCEPTED 中回显，
+    只有这些任务（或带着本进程 id 的事件）的结束事件才计入未完成的批次。
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    prefix = uuid.uuid4().hex[:12]
+    requests = set()
+    jobs = set()
+    outstanding = 0
+    stopped = False
+
+    async def wait_events(limit):
+        nonlocal outstanding, stopped
+        while outstanding > limit and not stopped:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("Server closed the connection")
+            event = json.loads(line)
+            data = event.get('data') or {}
+            if event['type'] == 'JOB_ACCEPTED' and data.get('id') in requests:
+                jobs.add(data['job_id'])
+            ours = data.get('id') in requests or data.get('job_id') in jobs
+            # fatal 为 False 的 ERROR（如机械臂重连中）之后任务还会继续
+            if ours and event['type'] in ('JOB_COMPLETE', 'JOB_STOPPED', 'ERROR') and data.get('fatal') is not False:
+                outstanding -= 1
+                print(f"  {event['type']} {event['data'].get('job_id')}")
+                stopped = event['type'] != 'JOB_COMPLETE'
+
+    with open(path, 'rb') as f:
+        width, height, strokes = open_strokes(f, fmt, tolerance, width, height)
+        reset = {'width': width, 'height': height}
+        if profile:
+            reset['profile'] = profile
+        writer.write((json.dumps({'type': 'RESET', 'data': reset}) + "\n").encode())
+        await writer.drain()
+        for index, batch in enumerate(batches(strokes, max_points)):
+            # 发送前等到未完成的批次少于 window 个
+            await wait_events(window - 1)
+            if stopped:
+                print("Import stopped")
+                break
+            request_id = f"{prefix}-{index}"
+            requests.add(request_id)
+            writer.write((json.dumps({'type': 'LINES', 'data': batch, 'profile': profile,
+                                      'id': request_id}) + "\n").encode())
+            await writer.drain()
+            outstanding += 1
+            print(f"Sent batch {index + 1}: {len(batch)} strokes")
+        await wait_events(0)
+    writer.close()
+
+
+def summarize(path, fmt, tolerance, width, height, output=None):
+    """不连接服务器，统计文件中的线条；output 给出时写成 LINES 消息"""
+    with open(path, 'rb') as f:
+        width, height, strokes = open_strokes(f, fmt, tolerance, width, height)
+        count = points = 0
+        lo, hi = np.full(2, np.inf), np.full(2, -np.inf)
+        lines = [] if output else None
+        for stroke in strokes:
+            count += 1
+            points += len(stroke)
+            lo, hi = np.minimum(lo, stroke.min(axis=0)), np.maximum(hi, stroke.max(axis=0))
+            if lines is not None:
+                lines.append([{'x': float(x), 'y': float(y)} for x, y in stroke])
+    print(f"{path} ({fmt}): canvas {width:g} x {height:g}, {count} strokes, {points} points")
+    if count:
+        print(f"  Bounds: ({lo[0]:.1f}, {lo[1]:.1f}) - ({hi[0]:.1f}, {hi[1]:.1f})")
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'type': 'LINES', 'data': lines, 'width': width, 'height': height}, f)
+        print(f"Lines saved to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Import SVG or G-code files into the drawing pipeline')
+    parser.add_argument('file', help='SVG or G-code file')
+    parser.add_argument('--format', choices=['svg', 'gcode'], default=None, help='Default: from the file extension')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Curve flattening tolerance in canvas units')
+    parser.add_argument('--width', type=float, default=None, help='G-code canvas width (mm)')
+    parser.add_argument('--height', type=float, default=None, help='G-code canvas height (mm)')
+    parser.add_argument('--send', metavar='HOST:PORT', default=None, help='Stream the strokes to a running server')
+    parser.add_argument('--profile', default=None, help='Speed/quality profile for the jobs')
+    parser.add_argument('--batch-points', type=int, default=5000, help='Points per LINES batch (at least 2)')
+    parser.add_argument('--output', default=None, help='Write all strokes as one LINES message instead')
+    args = parser.parse_args()
+    if args.batch_points < 2:
+        # 长折线按 batch_points - 1 的步长拆分，首尾相接需要至少两个点
+        parser.error('--batch-points must be at least 2')
+
+    fmt = args.format or guess_format(args.file)
+    if args.send:
+        host, port = args.send.rsplit(':', 1)
+        asyncio.run(send_file(host, int(port), args.file, fmt, args.tolerance, args.width, args.height,
+                              args.profile, args.batch_points))
+    else:
+        summarize(args.file, fmt, args.tolerance, args.width, args.height, args.output)
@@ -0,0 +1,99 @@
+import asyncio
+import contextlib
+
+
+class JobStopped(Exception):
+    """操作员发送了 STOP，当前任务需要立即中止"""
+
+
+class JobControl:
+    """
+    绘图任务的暂停/继续/停止控制
+
+    绘图循环在每条指令之间调用 checkpoint()，在等待时调用 sleep()；
+    控制消息由读取消息的协程调用 pause()/resume()/stop()，绘图循环最多
+    在一条指令之后响应。
+    """
+
+    def __init__(self):
+        self._running = asyncio.Event()
+        self._running.set()
+        self._stopped = asyncio.Event()
+        # pause/stop 时置位，用于提前结束 sleep
+        self._interrupt = asyncio.Event()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def reset(self):
+        """清除上一个任务的控制状态"""
+        self._stopped.clear()
+        self._interrupt.clear()
+        self._running.set()
+
+    @contextlib.contextmanager
+    def job(self):
+        """
+        一个任务的控制范围：任务结束时清除控制状态
+
+        任务排队和规划期间收到的 STOP/PAUSE 保留到任务开始绘制，对这个任务有效。
+        """
+        try:
+            yield self
+        finally:
+            self.reset()
+
+    def pause(self):
+        self._running.clear()
+        self._interrupt.set()
+
+    def resume(self):
+        self._interrupt.clear()
+        self._running.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._interrupt.set()
+        self._running.set()
+
+    async def sleep(self, seconds):
+        """
+        等待指定时间，收到 PAUSE 或 STOP 时提前返回
+
+        Raises:
+            JobStopped: 等待期间收到 STOP
+        """
+        if seconds > 0 and not self._interrupt.is_set():
+            try:
+                await asyncio.wait_for(self._interrupt.wait(), seconds)
+            except asyncio.TimeoutError:
+                pass
+        if self.stopped:
+            raise JobStopped()
+
+    async def checkpoint(self, on_pause=None, on_resume=None):
+        """
+        在两条指令之间检查控制状态
+
+        Args:
+            on_pause (callable|None): 进入暂停时调用的协程函数（例如抬笔）
+            on_resume (callable|None): 继续时调用的协程函数（例如重新落笔）
+
+        Raises:
+            JobStopped: 收到 STOP
+        """
+        if self.stopped:
+            raise JobStopped()
+        if self.paused:
+            if on_pause:
+                await on_pause()
+            await self._running.wait()
+            if self.stopped:
+                raise JobStopped()
+            if on_resume:
+                await on_resume()
@@ -0,0 +1,190 @@
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+
+class JobJournal:
+    """
+    追加写入的绘图任务日志
+
+    每条记录是一行 JSON：
+        {"op": "job", "job_id": ..., "lines": [...], "width": ..., "height": ..., "profile": ...}
+        {"op": "checkpoint", "job_id": ..., "line": i, "point": j}
+        {"op": "extend", "job_id": ..., "lines": [...], "width": ..., "height": ..., "line": i}
+        {"op": "done", "job_id": ..., "cancelled": false}（旧日志中的任务结束记录）
+
+    日志只保存最后一个任务：任务完成或取消时清空文件，一个任务的 checkpoint
+    超过 compact_every 条时改写成任务记录加最后一个断点，文件大小有上限。
+
+    checkpoint 表示下一次应从第 i 条线的第 j 个点继续（第 j 个点已经画完，
+    从该点落笔可以无缝接上）。extend 表示绘制中新到达的线条在画完 i 条线后
+    并入了剩余部分，续画时按顺序重放即可得到相同的规划。每条记录写入后立即 flush 到操作系统，进程崩溃
+    不会丢数据；fsync 按条数/时间批量执行，避免拖慢绘图循环。
+    """
+
+    def __init__(self, path, sync_every=50, sync_interval=2.0, compact_every=10000):
+        """
+        Args:
+            path (str|Path): 日志文件路径
+            sync_every (int): 每写入多少条 checkpoint 执行一次 fsync
+            sync_interval (float): 距上次 fsync 超过多少秒时执行 fsync
+            compact_every (int): 一个任务写入多少条 checkpoint 后压缩日志
+        """
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self._pending = 0
+        self._last_sync = time.time()
+        # 当前任务的 job/extend 记录，压缩日志时保留
+        self._records = []
+        self._checkpoints = 0
+        self._compact()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _compact(self):
+        """启动时如果没有未完成的任务，清空日志文件，避免无限增长"""
+        if self.path.exists() and self.load_unfinished() is None:
+            self.path.unlink()
+
+    def _append(self, record, force_sync=False):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        self._pending += 1
+        now = time.time()
+        if (force_sync or self._pending >= self.sync_every
+                or now - self._last_sync >= self.sync_interval):
+            self.sync()
+
+    def sync(self):
+        """把已写入的记录刷到磁盘"""
+        if self._pending:
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_sync = time.time()
+
+    def _rewrite(self, records):
+        """用 records 替换日志内容：先写临时文件再原子替换，任何时刻崩溃都能读到完整的断点"""
+        self._file.close()
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._pending = 0
+        self._checkpoints = 0
+        self._last_sync = time.time()
+
+    def start_job(self, lines, width, height, profile=None, pen=None):
+        """
+        记录一个新接收的绘图任务
+
+        Args:
+            lines (list): LINES 消息中的线条数据（屏幕坐标）
+            width (float): 画布宽度
+            height (float): 画布高度
+            profile (str|None): 速度/质量配置名称，续画时按同样的配置重新规划
+            pen: 规划时装着的笔，多笔任务续画时按同样的换笔顺序重新规划
+
+        Returns:
+            str: 任务ID
+        """
+        job_id = uuid.uuid4().hex[:12]
+        record = {
+            'op': 'job',
+            'job_id': job_id,
+            'time': time.time(),
+            'lines': lines,
+            'width': width,
+            'height': height,
+            'profile': profile,
+            'pen': pen
+        }
+        self._records = [record]
+        self._checkpoints = 0
+        self._append(record, force_sync=True)
+        return job_id
+
+    def checkpoint(self, job_id, line_index, point_index):
+        """记录绘图进度：第 line_index 条线已画到第 point_index 个点"""
+        record = {'op': 'checkpoint', 'job_id': job_id, 'line': line_index, 'point': point_index}
+        self._checkpoints += 1
+        if self._records and self._checkpoints >= self.compact_every:
+            # 之前的 checkpoint 都被最后这一个覆盖
+            self._rewrite(self._records + [record])
+        else:
+            self._append(record)
+
+    def extend_job(self, job_id, lines, width, height, line_index):
+        """记录绘制中并入任务的线条：画完 line_index 条线后与剩下的线条一起重新排序"""
+        record = {'op': 'extend', 'job_id': job_id, 'lines': lines, 'width': width,
+                  'height': height, 'line': line_index}
+        self._records.append(record)
+        self._append(record, force_sync=True)
+
+    def finish_job(self):
+        """
+        任务完成或被 STOP 取消后清空日志
+
+        日志只保存最后一个任务，它结束后不再需要续画，之前的记录都可以丢弃
+        """
+        self._records = []
+        self._rewrite([])
+
+    def load_unfinished(self):
+        """
+        读取日志中最后一个未完成的任务
+
+        Returns:
+            dict|None: {'job_id', 'lines', 'width', 'height', 'profile', 'pen', 'extensions', 'line', 'point'}，
+                       extensions 为按顺序记录的 extend，没有未完成任务时返回None
+        """
+        if not self.path.exists():
+            return None
+
+        job = None
+        records = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for raw in f:
+                try:
+                    record = json.loads(raw)
+                except json.JSONDecodeError:
+                    # 崩溃时最后一行可能只写了一半
+                    continue
+                op = record.get('op')
+                if op == 'job':
+                    job = {
+                        'job_id': record['job_id'],
+                        'lines': record['lines'],
+                        'width': record['width'],
+                        'height': record['height'],
+                        'profile': record.get('profile'),
+                        'pen': record.get('pen'),
+                        'extensions': [],
+                        'line': 0,
+                        'point': 0
+                    }
+                    records = [record]
+                elif job is None or record.get('job_id') != job['job_id']:
+                    continue
+                elif op == 'checkpoint':
+                    job['line'] = record['line']
+                    job['point'] = record['point']
+                elif op == 'extend':
+                    records.append(record)
+                    job['extensions'].append({key: record[key] for key in ('lines', 'width', 'height', 'line')})
+                elif op == 'done':
+                    job = None
+        if job is not None:
+            # 续画的任务写入足够多的 checkpoint 后同样压缩日志
+            self._records = records
+        return job
+
+    def close(self):
+        self.sync()
+        self._file.close()
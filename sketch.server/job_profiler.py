@@ -0,0 +1,159 @@
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+
+# 报告中的说明：cProfile/tracemalloc 不能只跟踪一个协程
+SCOPE_NOTE = ("Note: profiling covers the whole process while the job runs, including other "
+              "coroutines on the event loop (client handlers, heartbeat, broadcasts) and worker threads.")
+
+
+class ArmIoTimer:
+    """
+    包装 MyCobot/RoboticArm，累计每个方法阻塞在机械臂通讯上的时间
+
+    只有公开的方法会被计时；asyncio.to_thread 中的调用也会计入当前任务
+    """
+
+    def __init__(self, arm, profiler):
+        self._arm = arm
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        attr = getattr(self._arm, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._profiler.add_io(name, time.perf_counter() - t0)
+        return timed
+
+
+class JobProfiler:
+    """
+    按任务的 CPU 和内存分析
+
+    每个被采样的任务在 cProfile 和 tracemalloc 下运行，结束后在 out_dir 中写出
+    <job_id>.prof（可用 snakeviz/pstats 查看）、<job_id>.txt（热点函数和内存分配
+    位置），并在 summary.jsonl 中追加一行汇总：墙钟时间、CPU 时间、阻塞在机械臂
+    通讯上的时间以及剩余的等待时间（sleep 和空闲）。
+
+    分析范围是整个进程而不是单个协程：cProfile 记录事件循环线程上运行的所有代码，
+    任务期间其他客户端的消息处理、心跳和广播也会计入；CPU 时间、内存分配和机械臂
+    通讯时间同样包括 asyncio.to_thread 中其他调用的部分。报告开头会注明这一点，
+    比较两个任务时应在没有其他客户端活动的情况下采样。
+    """
+
+    def __init__(self, out_dir, every=1, memory_frames=1, top=20):
+        """
+        Args:
+            out_dir (str|Path): 输出目录
+            every (int): 每隔多少个任务分析一次，降低长期运行时的开销
+            memory_frames (int): tracemalloc 记录的调用栈深度，0 表示不分析内存
+            top (int): 报告中列出的热点函数/分配位置数量
+        """
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.every = max(int(every), 1)
+        self.memory_frames = memory_frames
+        self.top = top
+        self._jobs = 0
+        self._lock = threading.Lock()
+        self._io = None
+
+    def wrap(self, arm):
+        """返回计时包装后的机械臂对象"""
+        return ArmIoTimer(arm, self)
+
+    def add_io(self, method, seconds):
+        with self._lock:
+            if self._io is not None:
+                calls, total = self._io.get(method, (0, 0.0))
+                self._io[method] = (calls + 1, total + seconds)
+
+    @contextlib.contextmanager
+    def job(self, job_id):
+        """分析一个任务；未被采样的任务直接执行"""
+        self._jobs += 1
+        if (self._jobs - 1) % self.every:
+            yield
+            return
+
+        with self._lock:
+            self._io = {}
+        if self.memory_frames:
+            tracemalloc.start(self.memory_frames)
+        profiler = cProfile.Profile()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+            snapshot = None
+            peak = 0
+            if self.memory_frames:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            with self._lock:
+                arm_io, self._io = self._io, None
+            self._report(job_id, profiler, snapshot, wall, cpu, peak, arm_io)
+
+    def _report(self, job_id, profiler, snapshot, wall, cpu, peak, arm_io):
+        io_time = sum(total for _, total in arm_io.values())
+        summary = {
+            'job_id': job_id,
+            'time': time.time(),
+            'wall_time': wall,
+            'cpu_time': cpu,
+            'arm_io_time': io_time,
+            # 既不占用 CPU 也不在等机械臂：绘图循环中的 sleep 和空闲
+            'other_wait': max(wall - cpu - io_time, 0.0),
+            'peak_memory': peak,
+            'arm_io': {method: {'calls': calls, 'time': total} for method, (calls, total) in arm_io.items()}
+        }
+
+        profiler.dump_stats(self.out_dir / f"{job_id}.prof")
+        report = SCOPE_NOTE + "\n\n" + _format_stats(profiler, self.top)
+        if snapshot is not None:
+            report += "\nTop allocations:\n"
+            for stat in snapshot.statistics('lineno')[:self.top]:
+                report += f"  {stat}\n"
+        with open(self.out_dir / f"{job_id}.txt", 'w') as f:
+            f.write(report)
+        with open(self.out_dir / "summary.jsonl", 'a') as f:
+            f.write(json.dumps(summary) + "\n")
+        print_summary(summary)
+
+
+def _format_stats(profiler, top):
+    """按累计时间和自身时间列出热点函数"""
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(top)
+    stats.sort_stats('tottime').print_stats(top)
+    return out.getvalue()
+
+
+def print_summary(summary):
+    """打印任务的时间分布"""
+    wall = summary['wall_time'] or 1e-9
+    print(f"Job {summary['job_id']} profile:")
+    for key, label in (('cpu_time', 'CPU'), ('arm_io_time', 'Arm I/O'), ('other_wait', 'Sleep/idle')):
+        print(f"  {label}: {summary[key]:.2f} s ({summary[key] / wall * 100:.0f}%)")
+    for method, io_stats in sorted(summary['arm_io'].items(), key=lambda item: -item[1]['time']):
+        print(f"    {method}: {io_stats['calls']} calls, {io_stats['time']:.2f} s")
+    print(f"  Peak traced memory: {summary['peak_memory'] / 1024:.0f} KiB")
+    print(f"  {SCOPE_NOTE}")
@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+SERVERS = {'mycobot': 'server.py', 'rm': 'rm_server.py'}
+
+
+def make_lines(strokes, points, rng):
+    """生成随机折线，屏幕坐标在 800 x 600 画布内"""
+    lines = []
+    for _ in range(strokes):
+        start = rng.uniform([0, 0], [800, 600])
+        steps = rng.normal(0, 8, (points, 2)).cumsum(axis=0)
+        xy = np.clip(start + steps, 0, [800, 600])
+        lines.append([{'x': float(x), 'y': float(y)} for x, y in xy])
+    return lines
+
+
+def rss_mb(pid):
+    """读取进程的常驻内存（MB），只支持 Linux"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class Stats:
+    """所有模拟客户端共享的计数和延迟样本"""
+
+    def __init__(self):
+        self.sent = {}
+        self.accept_latency = []
+        # ESTIMATE 的往返时间，包括在规划进程中规划的时间
+        self.estimate_rtt = []
+        self.estimates_pending = 0
+        self.estimates_dropped = 0
+        self.jobs_accepted = 0
+        self.jobs_complete = 0
+        self.errors = 0
+        self.disconnects = 0
+        self.rss = []
+
+    def count(self, message_type):
+        self.sent[message_type] = self.sent.get(message_type, 0) + 1
+
+    def snapshot(self, elapsed):
+        def pct(samples, q):
+            return float(np.percentile(samples, q)) * 1000 if samples else None
+        return {
+            'elapsed': elapsed,
+            'sent': dict(self.sent),
+            'accept_ms_p50': pct(self.accept_latency, 50),
+            'accept_ms_max': pct(self.accept_latency, 100),
+            'estimate_rtt_ms_p50': pct(self.estimate_rtt, 50),
+            'estimate_rtt_ms_p95': pct(self.estimate_rtt, 95),
+            'estimate_rtt_ms_max': pct(self.estimate_rtt, 100),
+            'estimates_dropped': self.estimates_dropped,
+            'lines_sent': self.sent.get('LINES', 0),
+            'jobs_accepted': self.jobs_accepted,
+            'jobs_complete': self.jobs_complete,
+            'errors': self.errors,
+            'disconnects': self.disconnects,
+            'rss_mb': self.rss[-1] if self.rss else None,
+            'rss_growth_mb': self.rss[-1] - self.rss[0] if len(self.rss) > 1 else None
+        }
+
+
+class SimClient:
+    """
+    模拟一个 iPad 客户端
+
+    按泊松过程以给定速率发送 RESET/LINES/ADJUST_HEIGHT/ESTIMATE。ESTIMATE 有直接
+    回复，记录它的往返时间；超时没有回复计为丢失。往返时间包括分派到规划进程和
+    整个规划过程，衡量的是规划往返延迟，不是消息解析的延迟。
+    """
+
+    def __init__(self, index, args, stats, rng):
+        self.index = index
+        self.args = args
+        self.stats = stats
+        self.rng = rng
+        self.writer = None
+        # ESTIMATE 请求 id -> 发送时间，回复按 id 配对，丢失或迟到的回复不会让后面的样本错位
+        self.estimate_sent = {}
+        self.next_id = 0
+
+    async def run(self, deadline, monitor=False):
+        t0 = time.perf_counter()
+        try:
+            reader, self.writer = await asyncio.open_connection(self.args.host, self.args.port)
+        except OSError as e:
+            print(f"Client {self.index} failed to connect: {e}")
+            self.stats.errors += 1
+            return
+        self.stats.accept_latency.append(time.perf_counter() - t0)
+
+        listener = asyncio.create_task(self.listen(reader, monitor))
+        try:
+            await self.send('RESET', {'width': 800, 'height': 600})
+            if self.args.large_mb:
+                # 超大消息，检查服务器的 MAX_MESSAGE_SIZE 处理
+                size = int(self.args.large_mb * 1024 * 1024)
+                lines = [[{'x': 1.0, 'y': 1.0}] * (size // 22)]
+                await self.send('LINES', lines)
+            while time.time() < deadline and not listener.done():
+                await asyncio.sleep(self.rng.exponential(1.0 / self.args.rate))
+                await self.send_random()
+        except (ConnectionError, OSError):
+            self.stats.disconnects += 1
+        finally:
+            await asyncio.sleep(self.args.timeout)
+            self.expire_estimates(force=True)
+            listener.cancel()
+            self.writer.close()
+
+    async def send(self, message_type, data, extra=None):
+        message = {'type': message_type, 'data': data, **(extra or {})}
+        if message_type == 'ESTIMATE':
+            self.next_id += 1
+            message['id'] = self.next_id
+            self.estimate_sent[self.next_id] = time.perf_counter()
+            self.stats.estimates_pending += 1
+        payload = json.dumps(message).encode()
+        if self.args.coalesce and self.rng.random() < self.args.coalesce:
+            # 两条消息在同一次写入中背靠背发送
+            self.stats.count('ADJUST_HEIGHT')
+            payload += json.dumps({'type': 'ADJUST_HEIGHT', 'data': {'increase': True}}).encode()
+        self.writer.write(payload)
+        await self.writer.drain()
+        self.stats.count(message_type)
+
+    async def send_random(self):
+        kinds = ['LINES', 'ESTIMATE', 'ADJUST_HEIGHT', 'RESET']
+        kind = self.rng.choice(kinds, p=self.args.mix)
+        if kind == 'LINES':
+            await self.send('LINES', make_lines(self.args.strokes, self.args.points, self.rng),
+                            {'profile': self.args.profile})
+        elif kind == 'ESTIMATE':
+            await self.send('ESTIMATE', make_lines(self.args.strokes, self.args.points, self.rng))
+        elif kind == 'ADJUST_HEIGHT':
+            await self.send('ADJUST_HEIGHT', {'increase': bool(self.rng.random() < 0.5)})
+        else:
+            await self.send('RESET', {'width': 800, 'height': 600})
+        self.expire_estimates()
+
+    def expire_estimates(self, force=False):
+        now = time.perf_counter()
+        for request_id, t0 in list(self.estimate_sent.items()):
+            if force or now - t0 > self.args.timeout:
+                del self.estimate_sent[request_id]
+                self.stats.estimates_pending -= 1
+                self.stats.estimates_dropped += 1
+
+    async def listen(self, reader, monitor):
+        while True:
+            line = await reader.readline()
+            if not line:
+                self.stats.disconnects += 1
+                return
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                self.stats.errors += 1
+                continue
+            if event['type'] == 'ESTIMATE':
+                # 已经按超时计为丢失的请求，迟到的回复直接忽略
+                t0 = self.estimate_sent.pop(event.get('id'), None)
+                if t0 is not None:
+                    self.stats.estimate_rtt.append(time.perf_counter() - t0)
+                    self.stats.estimates_pending -= 1
+            elif monitor and event['type'] == 'JOB_ACCEPTED':
+                # 事件会广播给所有客户端，只由监控客户端计数
+                self.stats.jobs_accepted += 1
+            elif monitor and event['type'] == 'JOB_COMPLETE':
+                self.stats.jobs_complete += 1
+            elif monitor and event['type'] == 'ERROR':
+                self.stats.errors += 1
+
+
+def spawn_server(args):
+    """在临时目录中用模拟机械臂启动服务器，避免污染真实的 position_records"""
+    workdir = tempfile.mkdtemp(prefix='sketch_load_')
+    script = Path(__file__).resolve().parent / SERVERS[args.spawn]
+    log = open(Path(workdir) / 'server.log', 'w')
+    proc = subprocess.Popen([sys.executable, str(script), '--sim', '--host', '127.0.0.1',
+                             '--port', str(args.port)], cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+    print(f"Spawned {args.spawn} server (pid {proc.pid}) in {workdir}")
+    return proc
+
+
+async def wait_for_server(host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return True
+        except OSError:
+            await asyncio.sleep(0.2)
+    return False
+
+
+def print_snapshot(s):
+    def fmt(value, spec='.1f'):
+        return format(value, spec) if value is not None else '-'
+    print(f"[{s['elapsed']:7.0f}s] sent {sum(s['sent'].values())} "
+          f"estimate rtt p50/p95/max {fmt(s['estimate_rtt_ms_p50'])}/{fmt(s['estimate_rtt_ms_p95'])}/"
+          f"{fmt(s['estimate_rtt_ms_max'])} ms "
+          f"dropped {s['estimates_dropped']} jobs {s['jobs_accepted']}/{s['lines_sent']} "
+          f"errors {s['errors']} disc {s['disconnects']} rss {fmt(s['rss_mb'])} MB")
+
+
+async def run(args):
+    proc = spawn_server(args) if args.spawn else None
+    pid = proc.pid if proc else args.pid
+    try:
+        if not await wait_for_server(args.host, args.port):
+            print("Server did not come up")
+            return None
+        stats = Stats()
+        start = time.time()
+        deadline = start + args.duration
+        rng = np.random.default_rng(args.seed)
+        clients = [SimClient(i, args, stats, np.random.default_rng(rng.integers(1 << 32)))
+                   for i in range(args.clients)]
+        tasks = []
+        for i, client in enumerate(clients):
+            tasks.append(asyncio.create_task(client.run(deadline, monitor=i == 0)))
+            # 错开连接时间
+            await asyncio.sleep(rng.uniform(0, args.ramp / max(args.clients, 1)))
+
+        history = []
+        while not all(task.done() for task in tasks):
+            await asyncio.sleep(min(args.report_interval, max(deadline - time.time(), 0) + args.timeout + 0.5))
+            if pid:
+                rss = rss_mb(pid)
+                if rss is not None:
+                    stats.rss.append(rss)
+            snapshot = stats.snapshot(time.time() - start)
+            history.append(snapshot)
+            print_snapshot(snapshot)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        result = {'config': {k: v for k, v in vars(args).items()}, 'final': stats.snapshot(time.time() - start),
+                  'history': history}
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(result, f, indent=2)
+            print(f"Results saved to {args.output}")
+        return result
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent-client load and soak test for the sketch server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6666)
+    parser.add_argument('--spawn', choices=sorted(SERVERS), default=None,
+                        help='Start a server with a simulated arm for the test')
+    parser.add_argument('--pid', type=int, default=None, help='PID of an already running server, for memory sampling')
+    parser.add_argument('--clients', type=int, default=5)
+    parser.add_argument('--rate', type=float, default=0.5, help='Messages per second per client')
+    parser.add_argument('--mix', type=float, nargs=4, default=[0.2, 0.4, 0.3, 0.1],
+                        metavar=('LINES', 'ESTIMATE', 'ADJUST', 'RESET'), help='Message type probabilities')
+    parser.add_argument('--strokes', type=int, default=5, help='Strokes per LINES/ESTIMATE payload')
+    parser.add_argument('--points', type=int, default=50, help='Points per stroke')
+    parser.add_argument('--profile', default='draft', help='Speed/quality profile for LINES jobs')
+    parser.add_argument('--coalesce', type=float, default=0.0,
+                        help='Probability of sending two messages back-to-back in one write')
+    parser.add_argument('--large-mb', type=float, default=0.0, help='Each client first sends one payload of this size')
+    parser.add_argument('--duration', type=float, default=60, help='Test duration (s); use hours for soak runs')
+    parser.add_argument('--ramp', type=float, default=5, help='Spread client connections over this many seconds')
+    parser.add_argument('--timeout', type=float, default=10, help='ESTIMATE replies later than this count as dropped')
+    parser.add_argument('--report-interval', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='Write the results as JSON')
+    args = parser.parse_args()
+    total = sum(args.mix)
+    args.mix = [p / total for p in args.mix]
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
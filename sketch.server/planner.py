@@ -0,0 +1,265 @@
+import numpy as np
+
+from workspace import print_report
+
+# 多笔任务层内排序时端点网格的边长（毫米）
+ORDER_CELL = 10.0
+
+
+def simplify_stroke(points, tolerance):
+    """
+    用 Douglas-Peucker 算法简化线条，去掉偏离不超过 tolerance 的中间点
+
+    Args:
+        points (ndarray): (N, 2) 机械臂坐标
+        tolerance (float): 简化容差（毫米），0 表示不简化
+
+    Returns:
+        ndarray: 简化后的点，首尾点保持不变
+    """
+    if tolerance <= 0 or len(points) < 3:
+        return points
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg = points[b] - points[a]
+        rel = points[a + 1:b] - points[a]
+        length = np.hypot(seg[0], seg[1])
+        if length > 0:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / length
+        else:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = a + 1 + i
+            keep[mid] = True
+            stack.append((a, mid))
+            stack.append((mid, b))
+    return points[keep]
+
+
+def _ring(cx, cy, r):
+    """与 (cx, cy) 的切比雪夫距离为 r 的网格"""
+    if r == 0:
+        return [(cx, cy)]
+    cells = [(cx + d, cy - r) for d in range(-r, r + 1)] + [(cx + d, cy + r) for d in range(-r, r + 1)]
+    return cells + [(cx - r, cy + d) for d in range(-r + 1, r)] + [(cx + r, cy + d) for d in range(-r + 1, r)]
+
+
+def nearest_order(strokes, cell=16, start=(0.0, 0.0)):
+    """
+    贪心地按最近邻确定线条的绘制顺序，必要时反向绘制，减少抬笔移动距离
+
+    线条端点放在边长为 cell 的网格中，由近到远逐圈查找最近的端点。
+
+    Args:
+        strokes (list): 线条，每条为 (N, 2) 数组
+        cell (float): 网格边长，与坐标同单位
+        start (tuple): 笔当前的位置，第一条线从离它最近的端点开始
+
+    Returns:
+        list: [(线条序号, 是否反向), ...]
+    """
+    grid = {}
+    for k, stroke in enumerate(strokes):
+        for end, (x, y) in ((0, stroke[0]), (1, stroke[-1])):
+            grid.setdefault((int(x // cell), int(y // cell)), []).append((k, end))
+    if not grid:
+        return []
+    keys = np.array(list(grid))
+    low, high = keys.min(axis=0), keys.max(axis=0)
+    used = np.zeros(len(strokes), dtype=bool)
+    order = []
+    x, y = start
+    for _ in strokes:
+        cx, cy = int(x // cell), int(y // cell)
+        # 超过这一圈就覆盖了所有网格
+        extent = max(cx - low[0], high[0] - cx, cy - low[1], high[1] - cy)
+        best, best_d = None, np.inf
+        r = 0
+        # 第 r 圈的端点距离至少 (r - 1) * cell，超过当前最近距离后停止
+        while r <= extent and (best is None or (r - 1) * cell < np.sqrt(best_d)):
+            for key in _ring(cx, cy, r):
+                bucket = grid.get(key)
+                if not bucket:
+                    continue
+                bucket[:] = [e for e in bucket if not used[e[0]]]
+                for k, end in bucket:
+                    px, py = strokes[k][0] if end == 0 else strokes[k][-1]
+                    d = (px - x) ** 2 + (py - y) ** 2
+                    if d < best_d:
+                        best, best_d = (k, end), d
+            r += 1
+        k, end = best
+        used[k] = True
+        order.append((k, end == 1))
+        x, y = strokes[k][0] if end == 1 else strokes[k][-1]
+    return order
+
+
+def order_strokes(strokes, cell=16, start=(0.0, 0.0)):
+    """按 nearest_order 的顺序排列线条，反向的线条倒序"""
+    return [strokes[k][::-1] if reverse else strokes[k] for k, reverse in nearest_order(strokes, cell, start)]
+
+
+def split_pens(lines):
+    """
+    按笔把线条分组
+
+    线条可以是点字典列表（不指定笔），也可以是 {"pen": 笔编号, "points": [点字典, ...]}。
+
+    Returns:
+        dict|None: 笔编号 -> 线条列表，按首次出现的顺序；没有线条指定笔时返回None
+    """
+    layers = {}
+    has_pens = False
+    for line in lines:
+        if isinstance(line, dict):
+            has_pens = True
+            layers.setdefault(line.get('pen'), []).append(line['points'])
+        else:
+            layers.setdefault(None, []).append(line)
+    return layers if has_pens else None
+
+
+def order_layers(pens, pen=None):
+    """
+    笔的绘制顺序：每支笔只画一次，换笔次数最少。不指定笔的线条和当前装着的笔
+    不需要换笔，排在最前面，其余按首次出现的顺序
+    """
+    return sorted(pens, key=lambda p: (p is not None, p != pen))
+
+
+def merge_reports(reports):
+    """合并各层的预检报告"""
+    merged = dict(reports[0])
+    for report in reports[1:]:
+        for key in ('input_strokes', 'output_strokes', 'points', 'points_outside_box', 'points_out_of_reach',
+                    'removed_length'):
+            merged[key] += report[key]
+        merged['unreachable_regions'] = merged['unreachable_regions'] + report['unreachable_regions']
+    return merged
+
+
+def count_pen_changes(pens, pen=None):
+    """按顺序绘制时需要换笔的次数，pen 为开始时装着的笔"""
+    changes = 0
+    for stroke_pen in pens or []:
+        if stroke_pen is not None and stroke_pen != pen:
+            changes += 1
+            pen = stroke_pen
+    return changes
+
+
+def plan_job(lines, width, height, workspace, profile=None, verbose=True, pen=None):
+    """
+    绘图任务的完整规划流程，不涉及任何机械臂运动
+
+    Args:
+        lines (list): LINES 消息中的线条（屏幕坐标点字典列表）
+        width (float): 画布宽度
+        height (float): 画布高度
+        workspace (Workspace): 机械臂工作空间
+        profile (JobProfile|None): 速度/质量配置，为None时不简化也不分配速度
+        verbose (bool): 是否打印预检报告
+        pen: 当前装着的笔，多笔任务先画这支笔
+
+    Returns:
+        dict: {'strokes': 机械臂坐标线条列表, 'speeds': 每个点的速度百分比列表或None,
+               'report': 预检报告, 'pens': 每条线使用的笔，线条都没有指定笔时为None}
+    """
+    # 线条按最近邻排序减少抬笔移动，和运动时间模型一样假设笔从 home 出发
+    start = profile.model.home if profile is not None else (0.0, 0.0)
+    layers = split_pens(lines)
+    if layers is None:
+        # 坐标转换、工作空间裁剪和可达性检查
+        strokes, report = workspace.validate(lines, width, height)
+        strokes = order_strokes(strokes, ORDER_CELL, start)
+        pens = None
+    else:
+        # 多笔任务：按笔分层，每层分别预检和排序，上一层的终点是下一层的起点
+        strokes, pens, reports = [], [], []
+        for layer_pen in order_layers(layers, pen):
+            layer, layer_report = workspace.validate(layers[layer_pen], width, height)
+            reports.append(layer_report)
+            if not layer:
+                continue
+            layer = order_strokes(layer, ORDER_CELL, strokes[-1][-1] if strokes else start)
+            strokes += layer
+            pens += [layer_pen] * len(layer)
+        report = merge_reports(reports)
+        report['pen_changes'] = count_pen_changes(pens, pen)
+    if verbose:
+        print_report(report)
+    if profile is None:
+        return {'strokes': strokes, 'speeds': None, 'report': report, 'pens': pens}
+
+    # 按配置的容差简化线条
+    points_before = sum(len(stroke) for stroke in strokes)
+    strokes = [simplify_stroke(stroke, profile['simplify_tolerance']) for stroke in strokes]
+    report['simplified_points'] = points_before - sum(len(stroke) for stroke in strokes)
+
+    # 按线段长度和转角分配速度
+    speeds = [profile.speed_planner.plan(stroke) for stroke in strokes]
+    return {'strokes': strokes, 'speeds': speeds, 'report': report, 'pens': pens}
+
+
+def prepare_job(lines, width, height, workspace, profile, pen=None):
+    """
+    在规划进程中准备一个任务：完整规划并估算每条线的用时
+
+    参数和返回值都会在进程间传递，必须可以 pickle；打印预检报告由调用方负责。
+
+    Args:
+        lines (list): LINES 消息中的线条（屏幕坐标点字典列表）
+        width (float): 画布宽度
+        height (float): 画布高度
+        workspace (Workspace): 机械臂工作空间
+        profile (JobProfile): 速度/质量配置
+        pen: 当前装着的笔，见 plan_job
+
+    Returns:
+        dict: plan_job 的结果，另加 'times'（MotionTimeModel.stroke_times 的结果）
+    """
+    plan = plan_job(lines, width, height, workspace, profile, verbose=False, pen=pen)
+    plan['times'] = profile.model.stroke_times(plan['strokes'], plan['speeds'])
+    return plan
+
+
+def extend_plan(remaining, start, lines, width, height, workspace, profile):
+    """
+    在规划进程中把绘制过程中新到达的线条并入还没画的线条，从笔的位置重新按最近邻排序
+
+    结果只取决于参数，续画时用同样的参数重放可以得到同样的顺序。
+
+    Args:
+        remaining (dict): 还没画的部分 {'strokes': [...], 'speeds': [...]}
+        start (array): 笔的位置（最后画完的线条的终点）
+        lines (list): 新到达的线条（屏幕坐标点字典列表）
+        width (float): 新线条的画布宽度
+        height (float): 新线条的画布高度
+        workspace (Workspace): 机械臂工作空间
+        profile (JobProfile): 速度/质量配置
+
+    Returns:
+        dict: 重新排序后的剩余部分 {'strokes', 'speeds', 'times'}，以及新线条的预检报告 'report'
+    """
+    extra = plan_job(lines, width, height, workspace, profile, verbose=False)
+    strokes = list(remaining['strokes']) + extra['strokes']
+    speeds = list(remaining['speeds']) + extra['speeds']
+    ordered_strokes, ordered_speeds = [], []
+    for k, reverse in nearest_order(strokes, ORDER_CELL, start):
+        # 反向绘制的线条重新分配速度（落笔速度在第一个点）
+        ordered_strokes.append(strokes[k][::-1] if reverse else strokes[k])
+        ordered_speeds.append(profile.speed_planner.plan(ordered_strokes[-1]) if reverse else speeds[k])
+    return {
+        'strokes': ordered_strokes,
+        'speeds': ordered_speeds,
+        'times': profile.model.stroke_times(ordered_strokes, ordered_speeds, start),
+        'report': extra['report']
+    }
@@ -0,0 +1,226 @@
+import argparse
+import importlib
+import io
+import json
+import time
+
+import numpy as np
+from PIL import Image
+
+from planner import plan_job
+from profiles import load_profiles
+from workspace import Workspace
+
+# 预览图的颜色（RGB）
+BACKGROUND = (255, 255, 255)
+PEN_COLOR = (20, 20, 20)
+TRAVEL_COLOR = (235, 90, 60)
+OUTLINE_COLOR = (200, 200, 200)
+
+# PREVIEW 消息中 size 和 line_width 的取值范围，超出时截断，避免客户端让规划进程分配超大图像
+SIZE_RANGE = (64, 4096)
+LINE_WIDTH_RANGE = (1, 32)
+
+
+def stroke_segments(strokes):
+    """
+    把线条拆成线段
+
+    Returns:
+        tuple: ((M, 2) 落笔线段起点, (M, 2) 终点, (K, 2) 抬笔移动起点, (K, 2) 终点)
+    """
+    strokes = [np.asarray(stroke, dtype=float).reshape(-1, 2) for stroke in strokes if len(stroke)]
+    if not strokes:
+        empty = np.empty((0, 2))
+        return empty, empty, empty, empty
+    starts = np.concatenate([stroke[:-1] for stroke in strokes])
+    ends = np.concatenate([stroke[1:] for stroke in strokes])
+    # 抬笔移动：上一条线的终点到下一条线的起点
+    travel_starts = np.array([stroke[-1] for stroke in strokes[:-1]]).reshape(-1, 2)
+    travel_ends = np.array([stroke[0] for stroke in strokes[1:]]).reshape(-1, 2)
+    return starts, ends, travel_starts, travel_ends
+
+
+def rasterize(starts, ends, shape, line_width=1):
+    """
+    用 NumPy 一次光栅化所有线段
+
+    每条线段按像素步长等距采样（采样数为两端点像素坐标差的最大分量），所有采样点
+    拼成一个数组后一次写入图像，不逐条循环。
+
+    Args:
+        starts, ends (array): (M, 2) 线段端点的像素坐标 (列, 行)
+        shape (tuple): 图像大小 (行数, 列数)
+        line_width (int): 线宽（像素）
+
+    Returns:
+        ndarray: 布尔图像，被线段经过的像素为True
+    """
+    mask = np.zeros(shape, dtype=bool)
+    if len(starts) == 0:
+        return mask
+    starts = np.asarray(starts, dtype=float)
+    delta = np.asarray(ends, dtype=float) - starts
+    steps = np.maximum(np.ceil(np.abs(delta).max(axis=1)), 1).astype(np.int64)
+    counts = steps + 1
+    segment = np.repeat(np.arange(len(starts)), counts)
+    # 每个采样点在所属线段中的序号
+    index = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    t = index / steps[segment]
+    points = np.rint(starts[segment] + delta[segment] * t[:, None]).astype(np.int64)
+    inside = ((points[:, 0] >= 0) & (points[:, 0] < shape[1])
+              & (points[:, 1] >= 0) & (points[:, 1] < shape[0]))
+    mask[points[inside, 1], points[inside, 0]] = True
+
+    # 加粗：把图像向各个方向平移后取并集
+    if line_width > 1:
+        thin = mask.copy()
+        low = -(line_width // 2)
+        for dy in range(low, low + line_width):
+            for dx in range(low, low + line_width):
+                mask[max(dy, 0):shape[0] + min(dy, 0), max(dx, 0):shape[1] + min(dx, 0)] |= \
+                    thin[max(-dy, 0):shape[0] + min(-dy, 0), max(-dx, 0):shape[1] + min(-dx, 0)]
+    return mask
+
+
+def render(strokes, workspace, size=1024, travel=False, line_width=1):
+    """
+    把机械臂坐标的线条渲染成预览图，方向与客户端屏幕一致
+
+    Args:
+        strokes (list): 规划好的线条，每条为 (N, 2) 机械臂坐标
+        workspace (Workspace): 工作空间，图像范围为它的矩形区域
+        size (int): 图像长边的像素数
+        travel (bool): 是否画出抬笔移动
+        line_width (int): 落笔线条的线宽（像素）
+
+    Returns:
+        tuple: ((H, W, 3) uint8 图像, 统计信息)
+    """
+    t0 = time.perf_counter()
+    width = workspace.x_max - workspace.x_min
+    height = workspace.y_max - workspace.y_min
+    scale = (size - 1) / max(width, height)
+    shape = (int(round(height * scale)) + 1, int(round(width * scale)) + 1)
+
+    def to_pixels(points):
+        # 屏幕 y 向下对应机械臂 y 减小，见 Workspace.convert
+        return np.stack([(points[:, 0] - workspace.x_min) * scale,
+                         (workspace.y_max - points[:, 1]) * scale], axis=1)
+
+    starts, ends, travel_starts, travel_ends = stroke_segments(strokes)
+    image = np.empty(shape + (3,), dtype=np.uint8)
+    image[:] = BACKGROUND
+    image[[0, -1], :] = OUTLINE_COLOR
+    image[:, [0, -1]] = OUTLINE_COLOR
+    if travel:
+        image[rasterize(to_pixels(travel_starts), to_pixels(travel_ends), shape)] = TRAVEL_COLOR
+    image[rasterize(to_pixels(starts), to_pixels(ends), shape, line_width)] = PEN_COLOR
+
+    stats = {
+        'width': shape[1],
+        'height': shape[0],
+        'strokes': len(strokes),
+        'segments': len(starts),
+        'draw_length': float(np.sum(np.hypot(*(ends - starts).T))),
+        'travel_length': float(np.sum(np.hypot(*(travel_ends - travel_starts).T))),
+        'render_time': time.perf_counter() - t0
+    }
+    return image, stats
+
+
+def encode_png(image):
+    """把图像编码成 PNG"""
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def preview_job(lines, width, height, workspace, profile, size=1024, travel=False, line_width=1):
+    """
+    规划任务并渲染预览图：坐标转换、裁剪、简化之后实际会画出的线条
+
+    在规划进程中运行，参数和返回值都可以 pickle。size 和 line_width 来自客户端，
+    截断到 SIZE_RANGE 和 LINE_WIDTH_RANGE 之内。
+
+    Returns:
+        dict: 统计信息，'png' 为 PNG 数据
+    """
+    size = int(np.clip(int(size), *SIZE_RANGE))
+    line_width = int(np.clip(int(line_width), *LINE_WIDTH_RANGE))
+    plan = plan_job(lines, width, height, workspace, profile, verbose=False)
+    image, stats = render(plan['strokes'], workspace, size, travel, line_width)
+    t0 = time.perf_counter()
+    stats['png'] = encode_png(image)
+    stats['encode_time'] = time.perf_counter() - t0
+    return stats
+
+
+def print_preview(result):
+    """打印预览统计"""
+    print("Preview:")
+    print(f"  Image: {result['width']} x {result['height']}")
+    print(f"  Strokes: {result['strokes']}, segments: {result['segments']}")
+    print(f"  Draw length: {result['draw_length']:.1f} mm, travel length: {result['travel_length']:.1f} mm")
+    print(f"  Render: {result['render_time'] * 1000:.1f} ms, encode: {result.get('encode_time', 0) * 1000:.1f} ms")
+
+
+def benchmark(workspace, segments, size, travel):
+    """渲染随机折线组成的计划，测量光栅化用时"""
+    rng = np.random.default_rng(0)
+    strokes = []
+    for _ in range(max(segments // 50, 1)):
+        start = rng.uniform([workspace.x_min, workspace.y_min], [workspace.x_max, workspace.y_max])
+        steps = rng.normal(0, 3, (50, 2))
+        strokes.append(np.clip(start + np.cumsum(steps, axis=0),
+                               [workspace.x_min, workspace.y_min], [workspace.x_max, workspace.y_max]))
+    image, stats = render(strokes, workspace, size, travel)
+    t0 = time.perf_counter()
+    encode_png(image)
+    stats['encode_time'] = time.perf_counter() - t0
+    return stats
+
+
+# 后端名称 -> 服务器模块
+BACKENDS = {
+    'mycobot': 'server',
+    'rm': 'rm_server'
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Render the planned pen paths of a drawing into a PNG')
+    parser.add_argument('payload', nargs='?', help='JSON file with a LINES message or a list of lines')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='mycobot', help='Arm backend')
+    parser.add_argument('--width', type=float, default=800, help='Canvas width')
+    parser.add_argument('--height', type=float, default=600, help='Canvas height')
+    parser.add_argument('--config', default='robot_config.json', help='Config file with profile and motion_model overrides')
+    parser.add_argument('--profile', default='standard', help='Speed/quality profile')
+    parser.add_argument('--size', type=int, default=1024, help='Length of the longer image side in pixels')
+    parser.add_argument('--travel', action='store_true', help='Also draw pen-up travel moves')
+    parser.add_argument('--line-width', type=int, default=1, help='Pen-down line width in pixels')
+    parser.add_argument('--output', default='preview.png', help='Output PNG file')
+    parser.add_argument('--benchmark', type=int, default=None, metavar='SEGMENTS',
+                        help='Render a random plan with this many segments instead of a payload')
+    args = parser.parse_args()
+
+    # 工作空间和配置定义在各自的服务器文件里
+    backend = importlib.import_module(BACKENDS[args.backend])
+    workspace = Workspace(backend.ARM_X_MIN, backend.ARM_X_MAX, backend.ARM_Y_MIN, backend.ARM_Y_MAX,
+                          backend.ARM_REACH_MIN, backend.ARM_REACH_MAX)
+
+    if args.benchmark:
+        print_preview(benchmark(workspace, args.benchmark, args.size, args.travel))
+    elif args.payload:
+        profiles = load_profiles(backend.PROFILES, backend.MOTION_MODEL, args.config)
+        with open(args.payload, 'r') as f:
+            payload = json.load(f)
+        lines = payload['data'] if isinstance(payload, dict) else payload
+        result = preview_job(lines, args.width, args.height, workspace, profiles[args.profile],
+                             args.size, args.travel, args.line_width)
+        with open(args.output, 'wb') as f:
+            f.write(result.pop('png'))
+        print_preview(result)
+        print(f"Saved to {args.output}")
+    else:
+        parser.error('a payload file or --benchmark is required')
@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+
+from estimator import MotionTimeModel
+from speed_planner import SpeedPlanner
+
+DEFAULT_PROFILE = 'standard'
+
+
+class JobProfile:
+    """
+    命名的速度/质量配置
+
+    settings 中的参数：
+        simplify_tolerance (float): 线条简化容差（毫米），0 表示不简化
+        accuracy (float): 拐角处允许的轨迹偏差（毫米）
+        min_velocity, max_velocity (float): 落笔线段的速度范围（百分比）
+        lower_velocity (float): 落笔速度（百分比）
+        approach_speed, lift_speed (float): 抬笔移动、抬笔的速度（百分比）
+        approach_settle, lift_settle (float): 移动到起点后、抬笔前后的等待（秒）
+        point_interval (float): 相邻两个点之间的最小间隔（秒）
+        blend_radius (float): 交融半径（毫米），只有 RoboticArm 支持
+        stream_rate (float): 插值流式发送的控制频率（Hz），0 表示逐点发送，只有 MyCobot 支持
+        telemetry_every (int): 每隔多少个点记录一次实际位置，0 表示不记录
+    """
+
+    def __init__(self, name, settings, calibration):
+        """
+        Args:
+            name (str): 配置名称
+            settings (dict): 配置参数
+            calibration (dict): 后端的运动时间模型标定值（MOTION_MODEL）
+        """
+        self.name = name
+        self.settings = dict(settings)
+        self.model = MotionTimeModel({**calibration, **self.settings,
+                                      'draw_speed': self.settings['max_velocity']})
+        self.speed_planner = SpeedPlanner(self.model.max_speed, self.model.max_accel,
+                                          self.settings['accuracy'],
+                                          self.settings['min_velocity'],
+                                          self.settings['max_velocity'],
+                                          self.settings['lower_velocity'])
+
+    def __getitem__(self, key):
+        return self.settings[key]
+
+
+def load_profiles(builtin, calibration, config_file):
+    """
+    读取配置，robot_config.json 中的 profiles 覆盖或新增配置
+
+    配置文件中的每个配置只需写出与 standard 不同的参数，例如：
+        {"profiles": {"draft": {"point_interval": 0.05}, "poster": {"max_velocity": 80}}}
+
+    Args:
+        builtin (dict): 服务器文件中的 PROFILES
+        calibration (dict): 运动时间模型标定值
+        config_file (Path): 配置文件路径
+
+    Returns:
+        dict: 配置名称 -> JobProfile
+    """
+    profiles = {name: dict(settings) for name, settings in builtin.items()}
+    calibration = dict(calibration)
+    config_file = Path(config_file)
+    if config_file.exists():
+        try:
+            with open(config_file, 'r') as f:
+                config = json.load(f)
+            for name, settings in config.get('profiles', {}).items():
+                base = profiles.get(name, profiles[DEFAULT_PROFILE])
+                profiles[name] = {**base, **settings}
+            # motion_model 中的标定值也可以在配置文件中覆盖
+            calibration.update(config.get('motion_model', {}))
+        except Exception as e:
+            print(f"Error loading profiles: {e}")
+
+    return {name: JobProfile(name, settings, calibration) for name, settings in profiles.items()}
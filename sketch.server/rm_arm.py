@@ -71,6 +71,16 @@ class RoboticArm:
             print(f"Error while disconnecting: {str(e)}")
             return False
     
+    def set_timeout(self, timeout):
+        """
+        设置之后每次收发的超时时间
+
+        Args:
+            timeout (float): 超时时间（秒）
+        """
+        if self.socket is not None:
+            self.socket.settimeout(timeout)
+    
     def is_connected(self):
         """
         检查是否已连接到服务器
@@ -490,6 +500,49 @@ class RoboticArm:
             print(f"Error during moveJ_P: {str(e)}")
             return False
 
+    def stop(self):
+        """
+        急停：立即停止当前运动并清除尚未执行的轨迹
+
+        Returns:
+            bool: 停止是否成功
+        """
+        if not self.is_connected():
+            print("Not connected to server")
+            return False
+
+        try:
+            # 构建命令
+            command = {
+                "command": "set_arm_stop"
+            }
+
+            # 发送命令，确保以\r\n结尾
+            command_str = json.dumps(command) + "\r\n"
+            self.socket.sendall(command_str.encode('utf-8'))
+            print(f"Sent command: {command_str.strip()}")
+
+            # 使用新的接收方法
+            response_data = self._recv_response()
+            if response_data is None:
+                return False
+
+            # 检查响应
+            if response_data.get("state") == "arm_stop":
+                arm_stop = response_data.get("arm_stop", False)
+                if arm_stop:
+                    print("Arm stopped")
+                else:
+                    print("Failed to stop arm")
+                return arm_stop
+            else:
+                print(f"Unexpected response format for stop: {response_data}")
+                return False
+
+        except Exception as e:
+            print(f"Error during stop: {str(e)}")
+            return False
+
 def main():
     # 测试代码
     arm = RoboticArm()
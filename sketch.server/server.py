@@ -1,33 +1,141 @@
 import asyncio
+import base64
 import json
 import time
 from pymycobot import MyCobot
 import argparse
+import contextlib
+import multiprocessing
+import functools
+import io
 import numpy as np
 import matplotlib.pyplot as plt
-import csv
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 import os
+import signal
 from pathlib import Path
+from job_journal import JobJournal
+from job_control import JobControl, JobStopped
+from workspace import Workspace, print_report
+from calibration import ErrorCompensation, calibrate, print_calibration
+from height_map import HeightMap, print_height_map, probe_grid
+from telemetry_store import TelemetryStore, import_csv
+from arm_trace import TraceWriter, TracedArm
+from job_profiler import JobProfiler
+from sim_arm import SimMyCobot
+from planner import extend_plan, prepare_job, split_pens
+from importer import batches, open_strokes
+from vectorize import OPTIONS as VECTORIZE_OPTIONS, print_vectorize, vectorize
+from profiles import DEFAULT_PROFILE, load_profiles
+from estimator import EtaTracker, estimate_job, print_estimate
+from preview import preview_job, print_preview
+from streaming import Trajectory, stream
 
 # 机械臂的工作范围
 ARM_X_MIN = 150
 ARM_X_MAX = 270
 ARM_Y_MIN = -100
 ARM_Y_MAX = 100
+# 距底座的可达半径范围
+ARM_REACH_MIN = 120
+ARM_REACH_MAX = 280
 ARM_Z_DIFF = 59
 ARM_Z_UP = 100
+# 有高度图时抬笔离纸面的高度
+PEN_LIFT = 5
+
+# 每个点为 get_coords 预留的时间（秒）
+POINT_QUERY_TIME = 0.03
+
+# 运动时间模型的标定值（ESTIMATE 和速度规划使用），
+# 可以在 robot_config.json 的 motion_model 中覆盖
+MOTION_MODEL = {
+    'blocking': False,          # send_coords 发出后立即返回
+    'max_speed': 150,           # 速度 100 时的直线速度（毫米/秒）
+    'max_accel': 500,           # 毫米/秒^2
+    'command_overhead': 0.005,  # 串口发送一条指令的时间
+    'z_diff': ARM_Z_DIFF,
+    'home': [210, 0],
+    'pen_change_time': 30.0     # 换笔：回到原位、等待操作员换笔、回到画面（秒）
+}
+
+# 速度/质量配置，LINES/RESET 消息中用 profile 选择，
+# 可以在 robot_config.json 的 profiles 中覆盖或新增
+PROFILES = {
+    'draft': {
+        'simplify_tolerance': 0.8,
+        'accuracy': 2.0,
+        'min_velocity': 50,
+        'max_velocity': 100,
+        'lower_velocity': 100,
+        'approach_speed': 100,
+        'lift_speed': 100,
+        'approach_settle': 0.8,
+        'lift_settle': 0.3,
+        'point_interval': 0.08,
+        'blend_radius': 0,
+        'stream_rate': 20,          # 插值流式发送的控制频率（Hz），0 表示逐点发送
+        'telemetry_every': 0
+    },
+    'standard': {
+        'simplify_tolerance': 0,
+        'accuracy': 0.5,
+        'min_velocity': 30,
+        'max_velocity': 100,
+        'lower_velocity': 100,
+        'approach_speed': 100,
+        'lift_speed': 60,
+        'approach_settle': 2,
+        'lift_settle': 1,
+        'point_interval': 0.15,
+        'blend_radius': 0,
+        'stream_rate': 0,
+        'telemetry_every': 1
+    },
+    'fine': {
+        'simplify_tolerance': 0.1,
+        'accuracy': 0.2,
+        'min_velocity': 20,
+        'max_velocity': 60,
+        'lower_velocity': 50,
+        'approach_speed': 80,
+        'lift_speed': 50,
+        'approach_settle': 2.5,
+        'lift_settle': 1,
+        'point_interval': 0.25,
+        'blend_radius': 0,
+        'stream_rate': 0,
+        'telemetry_every': 1
+    }
+}
 
 class SketchServer:
-    def __init__(self, host, port):
+    def __init__(self, host, port, sim=False, trace=None, profile_jobs=False, profile_every=1, planners=2):
+        """
+        Args:
+            host (str): 监听地址
+            port (int): 监听端口
+            sim (bool): 使用模拟器代替真实的机械臂
+            trace (str|None): 把发给机械臂的每条指令记录到该 trace 文件
+            profile_jobs (bool): 用 cProfile/tracemalloc 分析任务，结果和会话数据保存在一起
+            profile_every (int): 每隔多少个任务分析一次
+            planners (int): 规划进程数
+        """
         self.host = host
         self.port = port
         self.clients = set()
-        self.mc = MyCobot("/dev/ttyAMA0", 1000000)
+        self.mc = SimMyCobot(MOTION_MODEL) if sim else MyCobot("/dev/ttyAMA0", 1000000)
+        self.trace = TraceWriter(trace, 'mycobot') if trace else None
+        if self.trace:
+            self.mc = TracedArm(self.mc, self.trace)
+        self.profiler = None
         self.mc.set_fresh_mode(0)
         print(f"fresh mode:{self.mc.get_fresh_mode()}")
         self.width = 800
         self.height = 600
+        self.workspace = Workspace(ARM_X_MIN, ARM_X_MAX, ARM_Y_MIN, ARM_Y_MAX,
+                                   ARM_REACH_MIN, ARM_REACH_MAX)
         
         # 添加位置记录列表
         self.position_records = []
@@ -38,10 +146,53 @@ class SketchServer:
         
         # 创建新的会话文件名
         self.session_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if profile_jobs:
+            self.profiler = JobProfiler(self.data_dir / f"profiles_{self.session_time}", profile_every)
+            self.mc = self.profiler.wrap(self.mc)
+
+        # 遥测数据库：所有会话的采样点和任务统计，用 telemetry_store.py 查询
+        self.telemetry = TelemetryStore(self.data_dir / "telemetry.db")
+        if imported := import_csv(self.telemetry.path, self.data_dir):
+            print(f"Imported {imported} legacy position files into {self.telemetry.path}")
+        self.telemetry.start_session(self.session_time, 'mycobot')
+        self.points_drawn = 0
+
+        # 加载之前拟合的位置误差补偿，用 CALIBRATE 消息或 calibration.py 重新拟合
+        self.calibration_file = self.data_dir / "calibration.json"
+        self.workspace.compensation = ErrorCompensation.load(self.calibration_file)
+        if self.workspace.compensation:
+            print_calibration(self.workspace.compensation)
         
         # 加载保存的 arm_z_up 值
         self.config_file = Path("robot_config.json")
         self.load_config()
+        # 纸面高度图：用 PROBE 消息探测，有高度图时落笔高度跟随纸面，抬笔只离纸面 PEN_LIFT
+        self.height_map_file = self.data_dir / "height_map.json"
+        self.apply_height_map(HeightMap.load(self.height_map_file))
+        # 正在进行的探测接收操作员输入的队列，没有探测时为None
+        self.probe = None
+        # 当前装在机械臂上的笔，None 表示未知；多笔任务换笔后更新
+        self.pen = None
+        # 正在绘制、可以并入新到达线条的实时任务 {'job_id', 'profile', 'owner', 'pending', 'requests'}，
+        # 见 merge_pending
+        self.live = None
+        # 当前会话默认使用的配置，以及正在执行的任务使用的配置
+        self.profile_name = DEFAULT_PROFILE
+        self.profile = self.profiles[DEFAULT_PROFILE]
+
+        # 绘图任务在后台按顺序执行，读取消息的循环可以随时处理 STOP/PAUSE/RESUME
+        self.control = JobControl()
+        self.arm_lock = asyncio.Lock()
+        self.tasks = set()
+        # 规划在独立的进程中进行：任务排队时就开始规划，绘图循环只执行规划好的线条；
+        # 用 spawn 启动，避免 fork 继承遥测/trace 线程持有的锁
+        self.planner = ProcessPoolExecutor(planners, mp_context=multiprocessing.get_context('spawn'))
+
+        # 任务日志：进程崩溃后可以用 RESUME 从断点继续
+        self.journal = JobJournal(self.data_dir / "job_journal.jsonl")
+        pending = self.journal.load_unfinished()
+        if pending:
+            print(f"Found unfinished job {pending['job_id']}, send RESUME to continue")
 
     def load_config(self):
         """从配置文件加载 arm_z_up 值"""
@@ -59,41 +210,21 @@ class SketchServer:
             self.save_config()
 
     def save_config(self):
-        """保存 arm_z_up 值到配置文件"""
+        """保存 arm_z_up 值到配置文件，保留文件中的其他配置"""
         try:
+            config = {}
+            if self.config_file.exists():
+                with open(self.config_file, 'r') as f:
+                    config = json.load(f)
+            config['arm_z_up'] = self.arm_z_up
             with open(self.config_file, 'w') as f:
-                json.dump({'arm_z_up': self.arm_z_up}, f)
+                json.dump(config, f, indent=2)
             print(f"Saved ARM_Z_UP to config: {self.arm_z_up}")
         except Exception as e:
             print(f"Error saving config: {e}")
 
-    def convert(self, x, y, w, h):
-        # 计算原始图片的纵横比
-        original_aspect_ratio = w / h
-        
-        # 计算机械臂工作范围的宽度和高度
-        arm_width = ARM_X_MAX - ARM_X_MIN
-        arm_height = ARM_Y_MAX - ARM_Y_MIN
-        arm_aspect_ratio = arm_width / arm_height
-        
-        # 计算缩放因子
-        if original_aspect_ratio > arm_aspect_ratio:
-            # 宽图，以宽度为基准进行缩放
-            scale = arm_width / w
-        else:
-            # 高图，以高度为基准进行缩放
-            scale = arm_height / h
-        
-        # 计算偏移量，使图像居中
-        offset_x = ARM_X_MIN + (arm_width - w * scale) / 2
-        offset_y = ARM_Y_MIN + (arm_height - h * scale) / 2
-
-        x = x * scale + offset_x
-        y = y * scale + offset_y
-        return x, -y
-
     def save_and_plot_positions(self):
-        """保存位置数据并生成对比图"""
+        """生成本次会话的位置对比图（位置数据在绘图时已写入遥测数据库）"""
         if not self.position_records:
             return
             
@@ -101,22 +232,6 @@ class SketchServer:
         target_positions = np.array([[r['target_x'], r['target_y']] for r in self.position_records])
         actual_positions = np.array([[r['actual_x'], r['actual_y']] for r in self.position_records])
         
-        # 保存CSV文件
-        csv_path = self.data_dir / f"positions_{self.session_time}.csv"
-        with open(csv_path, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['target_x', 'target_y', 'actual_x', 'actual_y', 'error_x', 'error_y', 'error_distance'])
-            for record in self.position_records:
-                writer.writerow([
-                    record['target_x'],
-                    record['target_y'],
-                    record['actual_x'],
-                    record['actual_y'],
-                    record['actual_x'] - record['target_x'],
-                    record['actual_y'] - record['target_y'],
-                    record['error_distance']
-                ])
-        
         # 创建图形
         plt.figure(figsize=(12, 8))
         
@@ -146,19 +261,550 @@ class SketchServer:
         print(f"Mean Error Distance: {np.mean(error_distances):.2f}")
         print(f"Max Error Distance: {np.max(error_distances):.2f}")
         print(f"Min Error Distance: {np.min(error_distances):.2f}")
-        print(f"Data saved to {csv_path}")
+        print(f"Plot saved to {self.data_dir / f'positions_plot_{self.session_time}.png'}")
+
+    def apply_height_map(self, height_map):
+        """启用或清除高度图，按新的抬笔高度重新生成各配置的运动时间模型，从下一个任务开始生效"""
+        self.height_map = height_map
+        if height_map:
+            print_height_map(height_map)
+        z_diff = PEN_LIFT if height_map else ARM_Z_DIFF
+        self.profiles = load_profiles(PROFILES, {**MOTION_MODEL, 'z_diff': z_diff}, self.config_file)
+
+    def surface_offsets(self, points):
+        """各点纸面相对参考落笔高度 arm_z_up - ARM_Z_DIFF 的偏差，没有高度图时为0"""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if self.height_map is None:
+            return np.zeros(len(points))
+        return self.height_map.offset(points)
+
+    def travel_height(self, start, end=None):
+        """
+        抬笔高度：有高度图时只离纸面 PEN_LIFT，从 start 移动到 end 时按路径上纸面的最高点计算；
+        没有高度图时为 arm_z_up
+        """
+        if self.height_map is None:
+            return self.arm_z_up
+        return float(self.arm_z_up - ARM_Z_DIFF + self.height_map.max_offset(start, end) + PEN_LIFT)
+
+    async def probe_surface(self, rows, cols, step):
+        """
+        探测纸面高度图
+
+        依次移动到网格上每个可达的节点，落笔到当前估计的纸面高度；操作员用 ADJUST_HEIGHT
+        每次微调 step 毫米，直到笔刚好接触纸面，再发送 PROBE {"action": "next"} 记录该点。
+        全部记录后拟合并保存高度图，PROBE {"action": "cancel"} 放弃本次探测。
+        """
+        points = probe_grid(self.workspace, rows, cols)
+        base = self.arm_z_up - ARM_Z_DIFF
+        model = self.profile.model
+        offsets = []
+        try:
+            for index, (x, y) in enumerate(points):
+                # 从已有的高度图或上一个节点的结果开始，相邻节点通常相差不大
+                offset = offsets[-1] if offsets else float(self.surface_offsets([(x, y)])[0])
+                await self.go_to([x, y, self.arm_z_up, -180, 0, -90], 50)
+                z = self.arm_z_up
+                while True:
+                    # send_coords 不等待运动完成，按运动时间模型等到笔停稳
+                    await self.go_to([x, y, base + offset, -180, 0, -90], 20,
+                                     float(model.move_time(abs(z - base - offset), 20)) + 0.5)
+                    z = base + offset
+                    await self.broadcast('PROBE_POINT', index=index, count=len(points), x=x, y=y, offset=offset)
+                    action = await self.probe.get()
+                    if action == 'next':
+                        break
+                    if action == 'cancel':
+                        print("Probing cancelled")
+                        await self.go_to([x, y, self.arm_z_up, -180, 0, -90], 50)
+                        await self.broadcast('HEIGHT_MAP', applied=False)
+                        return
+                    offset += step if action == 'up' else -step
+                offsets.append(offset)
+                print(f"  Probe {index + 1}/{len(points)}: ({x:.1f}, {y:.1f}) {offset:+.2f} mm")
+                await self.go_to([x, y, self.arm_z_up, -180, 0, -90], 50)
+        finally:
+            self.probe = None
+        if not offsets:
+            print("No reachable probe points")
+            await self.broadcast('HEIGHT_MAP', applied=False)
+            return
+        height_map = HeightMap.fit(points, offsets)
+        height_map.save(self.height_map_file)
+        self.apply_height_map(height_map)
+        await self.broadcast('HEIGHT_MAP', applied=True, **height_map.stats)
+
+    def get_profile(self, name):
+        """按名称取配置，名称未知时使用当前会话的配置"""
+        if name is None:
+            return self.profiles[self.profile_name]
+        if name not in self.profiles:
+            print(f"Unknown profile {name}, using {self.profile_name}")
+            return self.profiles[self.profile_name]
+        return self.profiles[name]
+
+    def plan_in_background(self, func, *args):
+        """在规划进程中执行 CPU 密集的规划函数，返回可以 await 的 Future；参数必须可以 pickle"""
+        return asyncio.get_running_loop().run_in_executor(self.planner, func, *args)
+
+    async def import_file(self, data, fmt, options, profile_name):
+        """
+        导入 SVG/G-code 文件：边解析边分批提交任务
+
+        解析在线程中逐批进行，每批在规划进程中准备好后排进机械臂队列。内存中只有
+        正在绘制的一批和下一批，第一批准备好就开始绘制；某一批被停止或出错时放弃
+        剩下的部分。
+
+        Args:
+            data (bytes): 文件内容
+            fmt (str): 'svg' 或 'gcode'
+            options (dict): tolerance、width/height（G-code 画布）、batch_points
+            profile_name (str|None): 速度/质量配置名称
+        """
+        try:
+            width, height, strokes = open_strokes(io.BytesIO(data), fmt, options.get('tolerance', 0.1),
+                                                  options.get('width'), options.get('height'))
+            profile = self.get_profile(profile_name)
+            pending = batches(strokes, options.get('batch_points', 5000))
+            drawing = None
+            count = 0
+            while (batch := await asyncio.to_thread(next, pending, None)) is not None:
+                # 前一批还在绘制时规划这一批
+                plan = self.plan_in_background(prepare_job, batch, width, height, self.workspace, profile)
+                if drawing is not None and not await drawing:
+                    print(f"Import stopped after {count} batches")
+                    return False
+                drawing = self.run_in_background(self.run_job(batch, width, height, profile.name, plan))
+                count += 1
+            print(f"Imported {fmt} file in {count} batches")
+            return drawing is None or await drawing
+        except Exception as e:
+            print(f"Failed to import {fmt} file: {e}")
+            await self.broadcast('ERROR', job_id=None, message=f"Import failed: {e}", arm_err=None, sys_err=None)
+            return False
+
+    async def run_job(self, lines, width, height, profile_name, plan=None, pen=None, owner=None, request_id=None):
+        """开始执行时才写入任务日志，排队中的任务不会覆盖正在绘制的任务的断点"""
+        job_id = self.journal.start_job(lines, width, height, profile_name, pen)
+        return await self.draw_lines(job_id, lines, width, height, profile_name, plan=plan, pen=pen, owner=owner,
+                                     request_id=request_id)
+
+    async def draw_lines(self, job_id, lines, width, height, profile_name, start_line=0, start_point=0,
+                         plan=None, pen=None, extensions=None, owner=None, request_id=None):
+        """
+        绘制线条，把进度写入任务日志并推送给客户端
+
+        Args:
+            job_id (str): 任务日志中的任务ID
+            lines (list): 线条数据（屏幕坐标）
+            width (float): 画布宽度
+            height (float): 画布高度
+            profile_name (str): 速度/质量配置名称
+            start_line (int): 从第几条裁剪后的线开始（断点续画）
+            start_point (int): 起始线条从第几个点开始
+            plan (Future|None): 排队时已经提交的 prepare_job，为None时现在提交
+            pen: 规划时装着的笔，决定多笔任务的换笔顺序
+            extensions (list|None): 任务日志中记录的绘制中并入的线条，续画时按顺序重放
+            owner (StreamWriter|None): 发送 live LINES 的客户端，绘制时它之后发送的 live LINES 并入这个任务
+            request_id: LINES 消息中的 id，在 JOB_ACCEPTED 和开始绘制前的结束事件中作为 'id' 回显，
+                        事件广播给所有客户端，发送方据此找到自己的任务
+
+        Returns:
+            bool: 任务是否完成
+        """
+        # 用 --profile-jobs 启动时按任务分析 CPU、内存和机械臂通讯时间
+        # 排队和规划期间收到的 STOP/PAUSE 对这个任务有效，任务结束时清除
+        with self.profiler.job(job_id) if self.profiler else contextlib.nullcontext(), self.control.job():
+            # 运动前先完成规划：坐标转换、工作空间裁剪和可达性检查。排队的任务在前一个任务
+            # 绘制时已经在规划进程中准备好，这里通常不用等待
+            self.profile = profile = self.get_profile(profile_name)
+            try:
+                if plan is None:
+                    plan = self.plan_in_background(prepare_job, lines, width, height, self.workspace, profile, pen)
+                plan = await plan
+                print_report(plan['report'])
+                # 续画时重放绘制中并入的线条，得到和中断前相同的顺序
+                for extension in extensions or []:
+                    await self.merge_lines(plan, extension['line'], extension['lines'], extension['width'],
+                                           extension['height'], profile)
+            except Exception as e:
+                # 无法规划的任务从日志中清除，否则每次 RESUME 都会重放同样的数据再次失败
+                print(f"Failed to plan job {job_id}: {e}")
+                self.journal.finish_job()
+                await self.broadcast('ERROR', job_id=job_id, message=f"Planning failed: {e}",
+                                     arm_err=None, sys_err=None, id=request_id)
+                return False
+            if self.control.stopped:
+                print(f"Job {job_id} stopped before drawing")
+                self.journal.finish_job()
+                await self.broadcast('JOB_STOPPED', job_id=job_id, id=request_id)
+                return False
+            eta = EtaTracker(plan['times'], start_line)
+            await self.broadcast('JOB_ACCEPTED', job_id=job_id, strokes=len(plan['strokes']), profile=profile.name,
+                                 start_stroke=start_line, eta=eta.eta(start_line), id=request_id)
+            self.telemetry.start_job(job_id, self.session_time, profile.name, len(plan['strokes']))
+            self.points_drawn = 0
+            # 实时单笔任务绘制时，同一客户端新发送的 live LINES 并入还没画的部分
+            self.live = None
+            if owner is not None and plan['pens'] is None:
+                self.live = {'job_id': job_id, 'profile': profile.name, 'owner': owner, 'pending': [], 'requests': []}
+
+            try:
+                await self._draw_strokes(job_id, profile, plan, start_line, start_point, eta)
+                # 之后到达的 LINES 作为新任务排队
+                live, self.live = self.live, None
+            except JobStopped:
+                live, self.live = self.live, None
+                print(f"Job {job_id} stopped by operator")
+                self.stop_motion()
+                self.journal.finish_job()
+                self.telemetry.finish_job(job_id, 'stopped', self.points_drawn, time.time() - eta.start_time)
+                await self.broadcast('JOB_STOPPED', job_id=job_id)
+                await self.reply_merged(live, 'JOB_STOPPED', job_id=job_id)
+                return False
+            except Exception as e:
+                live, self.live = self.live, None
+                # 任务保留在日志中，可以用 RESUME 继续
+                print(f"Error while drawing job {job_id}: {e}")
+                await self.broadcast('ERROR', job_id=job_id, message=str(e), arm_err=None, sys_err=None)
+                await self.reply_merged(live, 'ERROR', job_id=job_id, message=str(e), arm_err=None, sys_err=None)
+                self.telemetry.finish_job(job_id, 'aborted', self.points_drawn, time.time() - eta.start_time)
+                return False
+            finally:
+                # 任务以任何方式结束后，live LINES 都不能再并入它
+                self.live = None
+
+            self.journal.finish_job()
+            self.telemetry.finish_job(job_id, 'complete', self.points_drawn, time.time() - eta.start_time)
+            # 在完成所有线条后保存和绘制位置数据
+            self.save_and_plot_positions()
+            await self.broadcast('JOB_COMPLETE', job_id=job_id, strokes=len(plan['strokes']),
+                                 duration=time.time() - eta.start_time)
+            await self.reply_merged(live, 'JOB_COMPLETE', job_id=job_id, duration=time.time() - eta.start_time)
+            return True
+
+    async def _draw_strokes(self, job_id, profile, plan, start_line, start_point, eta):
+        """逐条绘制规划好的线条，每画完一条推送一次进度"""
+        # 第一条线从安全高度接近，之后按抬笔时算好的高度移动到下一条线
+        travel_z = self.arm_z_up
+        x = y = None
+        line_index = start_line
+        while True:
+            # 每画完一条线，把绘制中新到达的线条并入剩下的部分
+            if line_index > start_line and self.live and self.live['pending']:
+                travel_z = await self.merge_pending(job_id, profile, plan, line_index, eta, x, y, travel_z)
+            if line_index >= len(plan['strokes']):
+                break
+            strokes, speeds, pens = plan['strokes'], plan['speeds'], plan['pens']
+            line = strokes[line_index]
+            # 发送给机械臂的是补偿系统误差后的指令位置，记录的误差仍相对目标位置
+            commands = self.workspace.compensate(line)
+            surface = self.surface_offsets(commands)
+            first_point = start_point if line_index == start_line else 0
+            print(f"  Line {line_index + 1}:")
+            # 多笔任务：这条线的笔不是当前装着的笔时先换笔，换笔后从安全高度接近
+            if pens and pens[line_index] is not None and pens[line_index] != self.pen:
+                await self.change_pen(job_id, pens[line_index], line_index, x, y)
+                travel_z = self.arm_z_up
+            x, y = commands[first_point]
+            await self.control.checkpoint(functools.partial(self.on_pause, job_id, x, y, False),
+                                          functools.partial(self.on_resume, job_id, x, y, False))
+            self.mc.send_coords([x, y, travel_z, -180, 0, -90], profile['approach_speed'], 1)
+            await self.control.sleep(profile['approach_settle'])
+            if profile['stream_rate']:
+                x, y = await self._stream_stroke(job_id, profile, commands, speeds[line_index][0],
+                                                 travel_z, line_index, first_point)
+            else:
+                last = time.time()
+                for point_index in range(first_point, len(line)):
+                    # 第一个点之前笔还是抬起的，之后暂停需要先抬笔
+                    pen_down = point_index > first_point
+                    await self.control.checkpoint(functools.partial(self.on_pause, job_id, x, y, pen_down),
+                                                  functools.partial(self.on_resume, job_id, x, y, pen_down))
+                    x, y = commands[point_index]
+                    target_x, target_y = line[point_index]
+                    # 落笔高度跟随纸面；第一个点是竖直落笔，之后按规划的速度走每段线段
+                    z = self.arm_z_up - ARM_Z_DIFF + surface[point_index]
+                    if point_index == first_point:
+                        distance, velocity = travel_z - z, speeds[line_index][0]
+                    else:
+                        distance = np.hypot(*(line[point_index] - line[point_index - 1]))
+                        velocity = speeds[line_index][point_index]
+                    self.mc.send_coords([x, y, float(z), -180, 0, -90], int(velocity), 1)
+                    interval = max(profile['point_interval'], float(profile.model.move_time(distance, velocity)))
+                
+                    # 按配置的采样间隔获取实际位置并记录
+                    every = profile['telemetry_every']
+                    sample = every and (point_index - first_point) % every == 0
+                    actual_coords = None
+                    if sample:
+                        await asyncio.sleep(max(interval - POINT_QUERY_TIME, 0))
+                        actual_coords = self.mc.get_coords()
+                    if actual_coords and len(actual_coords) >= 2:
+                        actual_x, actual_y = actual_coords[0], actual_coords[1]
+                        error_distance = np.sqrt((actual_x - target_x)**2 + (actual_y - target_y)**2)
+                    
+                        self.position_records.append({
+                            'target_x': target_x,
+                            'target_y': target_y,
+                            'command_x': x,
+                            'command_y': y,
+                            'actual_x': actual_x,
+                            'actual_y': actual_y,
+                            'error_distance': error_distance
+                        })
+                        self.telemetry.record_point(job_id, line_index, point_index, (target_x, target_y),
+                                                    (x, y), (actual_x, actual_y), error_distance)
+                    
+                        print(f"    Point {point_index + 1}:")
+                        print(f"      Target: ({target_x:.2f}, {target_y:.2f})")
+                        print(f"      Actual: ({actual_x:.2f}, {actual_y:.2f})")
+                        print(f"      Error: {error_distance:.2f}")
+                
+                    now = time.time()
+                    print(f"    Point {point_index + 1}: ({x}, {y}), {now-last:.3f}")
+                    if now - last < interval:
+                        await asyncio.sleep(interval - (now - last))
+                    last = time.time()
+                    self.points_drawn += 1
+                    self.journal.checkpoint(job_id, line_index, point_index)
+            
+            # pen up（抬笔不响应暂停，保证笔不会停在纸上），直接抬到移动到下一条线需要的高度
+            following = None
+            if line_index + 1 < len(strokes):
+                following = self.workspace.compensate(strokes[line_index + 1][:1])[0]
+            travel_z = self.travel_height((x, y), following)
+            await asyncio.sleep(profile['lift_settle'])
+            self.mc.send_coords([x, y, travel_z, -180, 0, -90], profile['lift_speed'], 1)
+            await asyncio.sleep(profile['lift_settle'])
+            self.journal.checkpoint(job_id, line_index + 1, 0)
+            await self.broadcast('PROGRESS', job_id=job_id, stroke=line_index + 1,
+                                 strokes=len(strokes), eta=eta.eta(line_index + 1))
+            line_index += 1
+
+    async def merge_lines(self, plan, done, lines, width, height, profile):
+        """
+        在规划进程中把新线条并入 plan 第 done 条之后还没画的部分，从最后画完的线条的终点
+        重新按最近邻排序；原地修改 plan
+
+        Returns:
+            dict: 新线条的预检报告
+        """
+        remaining = {'strokes': plan['strokes'][done:], 'speeds': plan['speeds'][done:]}
+        start = plan['strokes'][done - 1][-1] if done else MOTION_MODEL['home']
+        extra = await self.plan_in_background(extend_plan, remaining, start, lines, width, height,
+                                              self.workspace, profile)
+        for key in ('strokes', 'speeds', 'times'):
+            plan[key] = list(plan[key][:done]) + extra[key]
+        return extra['report']
+
+    async def reply_merged(self, live, event_type, **data):
+        """
+        任务结束后向并入任务的每条 LINES 的发送方回复结束事件，
+        每条 LINES 都有自己的 JOB_ACCEPTED 和结束事件，等待任务结束的客户端不会卡住
+        """
+        if live is None:
+            return
+        for writer, strokes in live['requests']:
+            try:
+                await self.send_message(writer, {'type': event_type,
+                                                 'data': {**data, 'strokes': strokes, 'merged': True}})
+            except (ConnectionError, RuntimeError) as e:
+                print(f"Failed to send {event_type} to {writer.get_extra_info('peername')}: {e}")
+
+    async def merge_pending(self, job_id, profile, plan, done, eta, x, y, travel_z):
+        """
+        实时绘制：客户端只发送新增的线条，任务还在绘制时把它们并入还没画的部分，
+        从笔的当前位置重新排序，而不是排在整个任务之后。并入的线条写入任务日志
+
+        Returns:
+            float: 移动到新的下一条线需要的抬笔高度
+        """
+        pending = self.live['pending']
+        count = len(plan['strokes'])
+        while pending:
+            lines, width, height = pending.pop(0)
+            # 同一画布的多批线条一起规划
+            while pending and pending[0][1:] == (width, height):
+                lines = lines + pending.pop(0)[0]
+            self.journal.extend_job(job_id, lines, width, height, done)
+            print(f"Merging {len(lines)} lines into job {job_id} after line {done}")
+            print_report(await self.merge_lines(plan, done, lines, width, height, profile))
+        eta.update(plan['times'])
+        await self.broadcast('JOB_EXTENDED', job_id=job_id, strokes=len(plan['strokes']),
+                             added=len(plan['strokes']) - count, stroke=done, eta=eta.eta(done))
+
+        # 下一条线变了，抬笔高度不够越过途中的纸面时先升高
+        if done < len(plan['strokes']):
+            following = self.workspace.compensate(plan['strokes'][done][:1])[0]
+            z = self.travel_height((x, y), following)
+            if z > travel_z:
+                await self.go_to([x, y, z, -180, 0, -90], profile['lift_speed'], profile['lift_settle'])
+                return z
+        return travel_z
+
+    async def _stream_stroke(self, job_id, profile, commands, lower_velocity, travel_z, line_index, first_point):
+        """
+        流式绘制一条线：竖直落笔后，按 stream_rate 发送沿时间参数化轨迹插值的设定点，
+        机械臂在 fresh mode 下始终跟随最新的设定点，拐角不再停顿
+
+        Returns:
+            tuple: 抬笔前笔尖所在的指令位置
+        """
+        model = profile.model
+        z_down = self.arm_z_up - ARM_Z_DIFF
+        x, y = commands[first_point]
+        z = z_down + float(self.surface_offsets([(x, y)])[0])
+        self.mc.send_coords([x, y, z, -180, 0, -90], int(lower_velocity), 1)
+        await asyncio.sleep(max(profile['point_interval'], float(model.move_time(travel_z - z, lower_velocity))))
+        self.points_drawn += 1
+        self.journal.checkpoint(job_id, line_index, first_point)
+
+        loop = asyncio.get_running_loop()
+        max_speed = model.max_speed * profile['max_velocity'] / 100.0
+        # 当前轨迹的第 k 个点对应原始线条的第 base + k 个点，passed 是已经画过的点
+        base = passed = first_point
+        points = commands[first_point:]
+
+        def send(position, speed):
+            velocity = int(np.clip(speed / model.max_speed * 100, profile['min_velocity'], 100))
+            z = z_down + float(self.surface_offsets(position)[0])
+            self.mc.send_coords([float(position[0]), float(position[1]), z, -180, 0, -90], velocity, 1)
+
+        def on_point(index):
+            # 在计时线程中调用，断点和计数交回事件循环更新
+            nonlocal passed
+            loop.call_soon_threadsafe(self._stream_progress, job_id, line_index, base + index, base + index - passed)
+            passed = base + index
+
+        self.mc.set_fresh_mode(1)
+        try:
+            while True:
+                trajectory = Trajectory(points, max_speed, model.max_accel, profile['accuracy'])
+                result = await asyncio.to_thread(stream, trajectory, send, profile['stream_rate'],
+                                                 lambda: self.control.paused or self.control.stopped, on_point)
+                print(f"    Streamed {result['time']:.2f}/{trajectory.duration:.2f} s, overruns {result['overruns']}, "
+                      f"max late {result['max_late'] * 1000:.1f} ms")
+                x, y = (float(v) for v in result['position'])
+                if result['completed']:
+                    return x, y
+                # 暂停/停止：在当前位置抬笔，继续时从这里重新规划剩下的线条
+                await self.control.checkpoint(functools.partial(self.on_pause, job_id, x, y, True),
+                                              functools.partial(self.on_resume, job_id, x, y, True))
+                base = passed
+                points = np.vstack([[x, y], commands[base + 1:]])
+        finally:
+            self.mc.set_fresh_mode(0)
+
+    def _stream_progress(self, job_id, line_index, point_index, count):
+        """记录流式绘制经过的点"""
+        self.points_drawn += count
+        self.journal.checkpoint(job_id, line_index, point_index)
+
+    async def change_pen(self, job_id, pen, line_index, x=None, y=None):
+        """
+        换笔：从 (x, y) 竖直抬到安全高度，回到原位后暂停并推送 PEN_CHANGE；
+        操作员换好笔后发送 RESUME 继续，STOP 中止任务
+        """
+        if x is not None:
+            await self.go_to([x, y, self.arm_z_up, -180, 0, -90], self.profile['lift_speed'], self.profile['lift_settle'])
+        home = MOTION_MODEL['home']
+        await self.go_to([home[0], home[1], self.arm_z_up, -180, 0, -90], self.profile['approach_speed'])
+        print(f"Job {job_id} waiting for pen {pen}")
+        self.control.pause()
+        await self.control.checkpoint(functools.partial(self.broadcast, 'PEN_CHANGE', job_id=job_id, pen=pen,
+                                                        stroke=line_index))
+        self.pen = pen
+        print(f"Pen {pen} loaded, job {job_id} resumed")
+        await self.broadcast('JOB_RESUMED', job_id=job_id)
+
+    async def on_pause(self, job_id, x, y, pen_down):
+        """暂停：笔在纸上时先抬笔，避免洇墨"""
+        if pen_down:
+            self.mc.send_coords([x, y, self.travel_height((x, y)), -180, 0, -90], self.profile['lift_speed'], 1)
+            await asyncio.sleep(self.profile['lift_settle'])
+        print(f"Job {job_id} paused")
+        await self.broadcast('JOB_PAUSED', job_id=job_id)
+
+    async def on_resume(self, job_id, x, y, pen_down):
+        """继续：在暂停的位置重新落笔"""
+        print(f"Job {job_id} resumed")
+        await self.broadcast('JOB_RESUMED', job_id=job_id)
+        if pen_down:
+            z = self.arm_z_up - ARM_Z_DIFF + float(self.surface_offsets([(x, y)])[0])
+            self.mc.send_coords([x, y, z, -180, 0, -90], self.profile['lower_velocity'], 1)
+            await asyncio.sleep(self.profile['approach_settle'])
+
+    def stop_motion(self):
+        """停止运动并清空机械臂的指令队列，然后原地抬笔"""
+        self.mc.stop()
+        coords = self.mc.get_coords()
+        if coords:
+            self.mc.send_coords([coords[0], coords[1], self.arm_z_up, -180, 0, -90], 60, 1)
+
+    def run_in_background(self, coro):
+        """
+        在后台执行需要使用机械臂的协程
+
+        同一时间只有一个协程使用机械臂，按提交顺序执行；读取消息的循环不会被阻塞。
+        """
+        async def run():
+            async with self.arm_lock:
+                return await coro
+
+        task = asyncio.create_task(run())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def go_home(self):
+        """回到初始关节角度"""
+        self.mc.send_angles([0, 0, -90, 0, 0, 0], 50)
+        await asyncio.sleep(2)
+
+    async def go_to(self, coords, speed, settle=2):
+        """移动到指定位置并等待"""
+        self.mc.send_coords(coords, speed, 1)
+        await asyncio.sleep(settle)
+
+    async def send_message(self, writer, message):
+        """向客户端发送一条以换行结尾的 JSON 消息"""
+        writer.write((json.dumps(message) + "\n").encode())
+        await writer.drain()
+
+    async def broadcast(self, event_type, **data):
+        """向所有已连接的客户端推送事件"""
+        message = {'type': event_type, 'data': data}
+        for writer in list(self.clients):
+            try:
+                await self.send_message(writer, message)
+            except (ConnectionError, RuntimeError) as e:
+                print(f"Failed to send {event_type} to {writer.get_extra_info('peername')}: {e}")
 
     async def handle_client(self, reader, writer):
         addr = writer.get_extra_info('peername')
         print(f"New connection from {addr}")
         self.clients.add(writer)
         MAX_MESSAGE_SIZE = 10 * 1024 * 1024  # 10MB 限制
+        # 客户端连续发送时一次读到的数据可能包含多条消息，解析出一条后剩下的留给下一条
+        decoder = json.JSONDecoder()
+        pending = b''
         
         try:
             while True:
                 try:
-                    data = b''
+                    data = pending
                     while True:
+                        # 缓冲区里已经有一条完整的消息时直接处理；surrogateescape 保留被截断的多字节字符
+                        text = data.decode('utf-8', 'surrogateescape').lstrip()
+                        try:
+                            message, end = decoder.raw_decode(text)
+                            pending = text[end:].lstrip().encode('utf-8', 'surrogateescape')
+                            print(f"Received complete message from {addr}, total size: {len(data) - len(pending)} bytes")
+                            break
+                        except json.JSONDecodeError:
+                            pass
+
                         if len(data) > MAX_MESSAGE_SIZE:
                             print(f"Message too large from {addr}")
                             return
@@ -166,79 +812,184 @@ class SketchServer:
                         chunk = await reader.read(4096)
                         if not chunk:
                             print(f"Client {addr} disconnected")
-                            self.mc.send_angles([0, 0, -90, 0, 0, 0], 50)
-                            time.sleep(2)
+                            self.run_in_background(self.go_home())
                             return
                         
                         data += chunk
                         print(f"Received chunk, total size now: {len(data)} bytes")
-                        
-                        try:
-                            message = json.loads(data.decode())
-                            print(f"Received complete message from {addr}, total size: {len(data)} bytes")
-                            break
-                        except json.JSONDecodeError:
-                            continue
                     
                     # 处理消息
                     if message['type'] == "LINES":
                         lines = message['data']
                         print("Received lines:")
-                        for line_index, line in enumerate(lines):
-                            print(f"  Line {line_index + 1}:")
-                            x, y = self.convert(line[0]['x'], line[0]['y'], self.width, self.height)
-                            self.mc.send_coords([x, y, self.arm_z_up, -180, 0, -90], 100, 1)
-                            time.sleep(2)
-                            last = time.time()
-                            for point_index, point in enumerate(line):
-                                x, y = self.convert(point['x'], point['y'], self.width, self.height)
-                                self.mc.send_coords([x, y, self.arm_z_up - ARM_Z_DIFF, -180, 0, -90], 100, 1)
-                                time.sleep(0.27)
-                                
-                                # 获取实际位置并记录
-                                actual_coords = self.mc.get_coords()
-                                if actual_coords and len(actual_coords) >= 2:
-                                    actual_x, actual_y = actual_coords[0], actual_coords[1]
-                                    error_distance = np.sqrt((actual_x - x)**2 + (actual_y - y)**2)
-                                    
-                                    self.position_records.append({
-                                        'target_x': x,
-                                        'target_y': y,
-                                        'actual_x': actual_x,
-                                        'actual_y': actual_y,
-                                        'error_distance': error_distance
-                                    })
-                                    
-                                    print(f"    Point {point_index + 1}:")
-                                    print(f"      Target: ({x:.2f}, {y:.2f})")
-                                    print(f"      Actual: ({actual_x:.2f}, {actual_y:.2f})")
-                                    print(f"      Error: {error_distance:.2f}")
-                                
-                                now = time.time()
-                                print(f"    Point {point_index + 1}: ({x}, {y}), {now-last:.3f}")
-                                interval = 0.30
-                                if now - last < interval:
-                                    time.sleep(interval - (now - last))
-                                last = time.time()
-                            
-                            # pen up
-                            time.sleep(1)
-                            self.mc.send_coords([x, y, self.arm_z_up, -180, 0, -90], 60, 1)
-                            time.sleep(1)
-                        
-                        # 在完成所有线条后保存和绘制位置数据
-                        self.save_and_plot_positions()
+                        if 'max_duration' in message:
+                            # 预计超出可用时间段的任务直接拒绝
+                            result = await self.plan_in_background(estimate_job, lines, self.width, self.height,
+                                                                   self.workspace, self.get_profile(message.get('profile')),
+                                                                   message['max_duration'], self.pen)
+                            if not result['fits']:
+                                print(f"Job rejected: estimated {result['total_time']:.0f} s > {message['max_duration']} s")
+                                await self.send_message(writer, {'type': 'ESTIMATE', 'data': result,
+                                                                 'id': message.get('id')})
+                                continue
+                        profile = self.get_profile(message.get('profile'))
+                        live = message.get('live', False)
+                        if (live and self.live and self.live['owner'] is writer
+                                and self.live['profile'] == profile.name and split_pens(lines) is None):
+                            # 实时绘制：同一客户端的 live LINES 并入正在绘制的任务，
+                            # 在下一条线开始前从笔的位置重新排序
+                            self.live['pending'].append((lines, self.width, self.height))
+                            self.live['requests'].append((writer, len(lines)))
+                            await self.send_message(writer, {'type': 'JOB_ACCEPTED', 'data': {
+                                'job_id': self.live['job_id'], 'strokes': len(lines), 'profile': profile.name,
+                                'merged': True, 'id': message.get('id')}})
+                            continue
+                        # 立即开始规划，前面的任务还在绘制时这个任务就能准备好
+                        plan = self.plan_in_background(prepare_job, lines, self.width, self.height,
+                                                       self.workspace, profile, self.pen)
+                        self.run_in_background(self.run_job(lines, self.width, self.height, profile.name, plan, self.pen,
+                                                            writer if live else None, message.get('id')))
+
+                    elif message['type'] == "IMAGE":
+                        # 照片或线稿：在规划进程中矢量化，生成的线条按普通任务规划和绘制，
+                        # 坐标以图片像素为单位
+                        options = {k: v for k, v in (message.get('options') or {}).items() if k in VECTORIZE_OPTIONS}
+                        try:
+                            result = await asyncio.to_thread(vectorize, base64.b64decode(message['data']),
+                                                             executor=self.planner, **options)
+                        except Exception as e:
+                            print(f"Failed to vectorize image: {e}")
+                            await self.send_message(writer, {'type': 'ERROR', 'data': {
+                                'job_id': None, 'message': f"Invalid image: {e}", 'arm_err': None, 'sys_err': None}})
+                            continue
+                        print_vectorize(result)
+                        lines, width, height = result['lines'], result['width'], result['height']
+                        profile = self.get_profile(message.get('profile'))
+                        plan = self.plan_in_background(prepare_job, lines, width, height, self.workspace, profile)
+                        self.run_in_background(self.run_job(lines, width, height, profile.name, plan))
+
+                    elif message['type'] == "IMPORT":
+                        # SVG/G-code 文件内容，边解析边分批绘制
+                        data = message['data'].encode()
+                        fmt = message.get('format', 'svg')
+                        task = asyncio.create_task(self.import_file(data, fmt, message.get('options') or {},
+                                                                    message.get('profile')))
+                        self.tasks.add(task)
+                        task.add_done_callback(self.tasks.discard)
+
+                    elif message['type'] in ("PAUSE", "STOP") and not self.tasks:
+                        # 没有正在执行或排队的任务，避免之后提交的任务一开始就被暂停/停止
+                        print(f"No job running, {message['type']} ignored")
+
+                    elif message['type'] == "PAUSE":
+                        print("Pause requested")
+                        self.control.pause()
+
+                    elif message['type'] == "STOP":
+                        print("Stop requested")
+                        self.control.stop()
+
+                    elif message['type'] == "RESUME":
+                        if self.control.paused:
+                            # 继续暂停中的任务
+                            self.control.resume()
+                        elif (job := self.journal.load_unfinished()) is None:
+                            print("No unfinished job to resume")
+                        elif self.arm_lock.locked():
+                            print("A job is running, RESUME ignored")
+                        else:
+                            # 进程重启后从日志中的断点继续
+                            print(f"Resuming job {job['job_id']} from line {job['line'] + 1}, point {job['point'] + 1}")
+                            self.run_in_background(self.draw_lines(job['job_id'], job['lines'], job['width'], job['height'],
+                                                                   job['profile'], job['line'], job['point'],
+                                                                   pen=job.get('pen'), extensions=job.get('extensions')))
                         
+                    elif message['type'] == "ESTIMATE":
+                        # 只规划不运动，返回预计用时
+                        try:
+                            result = await self.plan_in_background(estimate_job, message['data'], self.width,
+                                                                   self.height, self.workspace,
+                                                                   self.get_profile(message.get('profile')),
+                                                                   message.get('max_duration'), self.pen)
+                        except Exception as e:
+                            print(f"Failed to estimate job: {e}")
+                            await self.send_message(writer, {'type': 'ERROR', 'id': message.get('id'), 'data': {
+                                'job_id': None, 'message': f"Estimate failed: {e}", 'arm_err': None, 'sys_err': None}})
+                            continue
+                        print_estimate(result)
+                        # 回显请求中的 id，客户端按 id 把回复和请求对应起来
+                        await self.send_message(writer, {'type': 'ESTIMATE', 'data': result, 'id': message.get('id')})
+
+                    elif message['type'] == "PREVIEW":
+                        # 只规划不运动，返回实际会画出的线条的 PNG 预览图
+                        try:
+                            result = await self.plan_in_background(preview_job, message['data'], self.width,
+                                                                   self.height, self.workspace,
+                                                                   self.get_profile(message.get('profile')),
+                                                                   message.get('size', 1024),
+                                                                   message.get('travel', False),
+                                                                   message.get('line_width', 1))
+                        except Exception as e:
+                            print(f"Failed to render preview: {e}")
+                            await self.send_message(writer, {'type': 'ERROR', 'data': {
+                                'job_id': None, 'message': f"Preview failed: {e}", 'arm_err': None, 'sys_err': None}})
+                            continue
+                        png = result.pop('png')
+                        print_preview(result)
+                        await self.send_message(writer, {'type': 'PREVIEW',
+                                                         'data': {**result, 'png': base64.b64encode(png).decode()}})
+
+                    elif message['type'] == "CALIBRATE":
+                        # 用所有会话的位置记录重新拟合误差补偿，从下一条线开始生效
+                        options = message.get('data') or {}
+                        await asyncio.to_thread(self.telemetry.flush)
+                        compensation = calibrate(self.telemetry.path, options.get('degree'),
+                                                 options.get('max_correction', 5.0))
+                        if compensation is None:
+                            print("Not enough position records to fit a correction")
+                            await self.send_message(writer, {'type': 'CALIBRATION', 'data': {'applied': False}})
+                            continue
+                        print_calibration(compensation)
+                        compensation.save(self.calibration_file)
+                        self.workspace.compensation = compensation
+                        await self.send_message(writer, {'type': 'CALIBRATION',
+                                                         'data': {'applied': True, **compensation.stats}})
+
+                    elif message['type'] == "PROBE":
+                        # 纸面高度图：start（默认）开始探测，next/cancel 由操作员在探测中发送，clear 清除高度图
+                        options = message.get('data') or {}
+                        action = options.get('action', 'start')
+                        if action in ('next', 'cancel'):
+                            if self.probe is not None:
+                                self.probe.put_nowait(action)
+                        elif action == 'clear':
+                            self.height_map_file.unlink(missing_ok=True)
+                            self.apply_height_map(None)
+                            print("Height map cleared")
+                            await self.send_message(writer, {'type': 'HEIGHT_MAP', 'data': {'applied': False}})
+                        elif self.probe is None:
+                            self.probe = asyncio.Queue()
+                            self.run_in_background(self.probe_surface(options.get('rows', 3), options.get('cols', 3),
+                                                                      options.get('step', 0.5)))
+
                     elif message['type'] == "RESET":
                         dimensions = message['data']
                         self.width, self.height = dimensions['width'], dimensions['height']
-                        print(f"Reset request received. Screen size: {self.width} x {self.height}")
-                        self.mc.send_coords([210, 0, self.arm_z_up, -180, 0, -90], 50, 1)
-                        time.sleep(2)
+                        if 'profile' in dimensions:
+                            self.profile_name = self.get_profile(dimensions['profile']).name
+                        if 'pen' in dimensions:
+                            # 操作员告知当前装着的笔，多笔任务先画这支笔
+                            self.pen = dimensions['pen']
+                        print(f"Reset request received. Screen size: {self.width} x {self.height}, profile: {self.profile_name}")
+                        self.run_in_background(self.go_to([210, 0, self.arm_z_up, -180, 0, -90], 50))
                         # 在新会话开始时清空位置记录
                         self.position_records = []
                     elif message['type'] == "ADJUST_HEIGHT":
                         increase = message['data']['increase']
+                        # 探测高度图时微调的是当前探测点的高度
+                        if self.probe is not None:
+                            self.probe.put_nowait('up' if increase else 'down')
+                            continue
                         if increase:
                             self.arm_z_up += 1
                         else:
@@ -248,15 +999,16 @@ class SketchServer:
                         # 保存新的高度值
                         self.save_config()
                         
-                        # 立即移动到新的高度以展示效果
-                        current_coords = self.mc.get_coords()
-                        if current_coords:
-                            self.mc.send_coords([
-                                current_coords[0],
-                                current_coords[1],
-                                self.arm_z_up,
-                                -180, 0, -90
-                            ], 50, 1)
+                        # 空闲时立即移动到新的高度以展示效果；绘图中新高度从下一个点开始生效
+                        if not self.arm_lock.locked():
+                            current_coords = self.mc.get_coords()
+                            if current_coords:
+                                self.mc.send_coords([
+                                    current_coords[0],
+                                    current_coords[1],
+                                    self.arm_z_up,
+                                    -180, 0, -90
+                                ], 50, 1)
                     else:
                         print(f"Unknown message type: {message['type']}")
                 except json.JSONDecodeError as e:
@@ -278,15 +1030,37 @@ class SketchServer:
 
         addr = server.sockets[0].getsockname()
         print(f'Serving on {addr}')
+        # 提前启动一个规划进程，第一个任务不用等进程启动
+        self.planner.submit(os.getpid)
+
+        # SIGTERM 和 Ctrl+C 一样走正常的退出流程，保证规划进程和遥测线程被关闭
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
 
-        async with server:
-            await server.serve_forever()
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            print("Server stopped")
+        finally:
+            # 退出时把还在队列里的遥测数据写完
+            self.telemetry.close()
+            self.journal.close()
+            if self.trace:
+                self.trace.close()
+            self.planner.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Start sketch server')
     parser.add_argument('--host', default='0.0.0.0', help='Host address')
     parser.add_argument('--port', type=int, default=6666, help='Port number')
+    parser.add_argument('--sim', action='store_true', help='Drive a simulated arm instead of the real one')
+    parser.add_argument('--trace', default=None, help='Record every arm command into this trace file')
+    parser.add_argument('--profile-jobs', action='store_true',
+                        help='Profile CPU, memory and arm I/O time of each job into position_records')
+    parser.add_argument('--profile-every', type=int, default=1, help='Only profile every Nth job')
+    parser.add_argument('--planners', type=int, default=2, help='Number of job planning processes')
     args = parser.parse_args()
     
-    sketch_server = SketchServer(args.host, args.port)
+    sketch_server = SketchServer(args.host, args.port, args.sim, args.trace,
+                                 args.profile_jobs, args.profile_every, args.planners)
     asyncio.run(sketch_server.start_server())
@@ -0,0 +1,169 @@
+import threading
+import time
+
+import numpy as np
+
+from estimator import trapezoid_time
+
+
+class _SimMotion:
+    """按运动时间模型推进的一段直线运动，位置按时间线性插值"""
+
+    def __init__(self, start, target, t0, duration):
+        self.start = np.asarray(start, dtype=float)
+        self.target = np.asarray(target, dtype=float)
+        self.t0 = t0
+        self.t1 = t0 + duration
+
+    def pose_at(self, now):
+        if now >= self.t1:
+            return self.target.copy()
+        if now <= self.t0:
+            return self.start.copy()
+        f = (now - self.t0) / (self.t1 - self.t0)
+        pose = self.start + (self.target - self.start) * f
+        # 姿态直接取目标值
+        pose[3:] = self.target[3:]
+        return pose
+
+
+class _SimArm:
+    """模拟机械臂的公共部分：按 MOTION_MODEL 的标定值计算每次运动的时间"""
+
+    def __init__(self, calibration, pose, latency):
+        """
+        Args:
+            calibration (dict): 服务器文件中的 MOTION_MODEL
+            pose (list): 初始位姿 [x, y, z, rx, ry, rz]
+            latency (float): 每次查询的通讯时间（秒）
+        """
+        self.max_speed = calibration['max_speed']
+        self.max_accel = calibration['max_accel']
+        self.command_overhead = calibration['command_overhead']
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._motions = [_SimMotion(pose, pose, time.time(), 0.0)]
+
+    def _pose(self, now=None):
+        now = time.time() if now is None else now
+        for motion in self._motions:
+            if now < motion.t1:
+                return motion.pose_at(now)
+        return self._motions[-1].target.copy()
+
+    def _move(self, pose, velocity, queued):
+        """
+        开始一段运动；queued 时排在已有运动之后，否则从当前位置立即开始
+
+        Returns:
+            float: 运动结束的时间
+        """
+        with self._lock:
+            now = time.time()
+            if queued and self._motions[-1].t1 > now:
+                start, t0 = self._motions[-1].target, self._motions[-1].t1
+            else:
+                start, t0 = self._pose(now), now
+                self._motions = []
+            target = np.asarray(pose, dtype=float)
+            distance = float(np.linalg.norm(target[:3] - start[:3]))
+            speed = self.max_speed * max(float(velocity), 1.0) / 100.0
+            duration = float(trapezoid_time(distance, speed, self.max_accel))
+            # 只保留还没走完的运动，避免列表无限增长
+            self._motions = [m for m in self._motions if m.t1 > now]
+            self._motions.append(_SimMotion(start, target, t0 + self.command_overhead, duration))
+            return t0 + self.command_overhead + duration
+
+    def _halt(self):
+        with self._lock:
+            pose = self._pose()
+            self._motions = [_SimMotion(pose, pose, time.time(), 0.0)]
+
+
+class SimMyCobot(_SimArm):
+    """
+    MyCobot 模拟器，接口与 pymycobot.MyCobot 中服务器用到的部分一致
+
+    send_coords 立即返回；fresh mode 为 0 时指令排队依次执行，为 1 时新指令
+    打断正在执行的运动。get_coords 返回按时间插值的当前位置。
+    """
+
+    def __init__(self, calibration, port=None, baudrate=None, latency=0.02):
+        super().__init__(calibration, [calibration['home'][0], calibration['home'][1], 150, -180, 0, -90], latency)
+        self.fresh_mode = 0
+
+    def set_fresh_mode(self, mode):
+        self.fresh_mode = mode
+
+    def get_fresh_mode(self):
+        time.sleep(self.latency)
+        return self.fresh_mode
+
+    def send_coords(self, coords, speed, mode=0):
+        time.sleep(self.command_overhead)
+        self._move(coords, speed, queued=self.fresh_mode == 0)
+
+    def send_angles(self, angles, speed):
+        # 模拟器没有运动学模型，关节运动只占用时间，不改变位置
+        time.sleep(self.command_overhead)
+
+    def get_coords(self):
+        time.sleep(self.latency)
+        return [round(float(v), 1) for v in self._pose()]
+
+    def stop(self):
+        self._halt()
+        return 1
+
+
+class SimRoboticArm(_SimArm):
+    """
+    RoboticArm 模拟器，接口与 rm_arm.RoboticArm 一致
+
+    moveL 阻塞到模拟的轨迹执行完成后返回，和真实控制器的 current_trajectory_state 一样
+    """
+
+    def __init__(self, calibration, latency=0.005):
+        super().__init__(calibration, [calibration['home'][0], calibration['home'][1], 150, -3.14, 0, -0.359],
+                         latency)
+        self.connected = False
+
+    def connect(self, ip_address, timeout=60):
+        self.connected = True
+        return True
+
+    def disconnect(self):
+        self.connected = False
+        return True
+
+    def is_connected(self):
+        return self.connected
+
+    def set_timeout(self, timeout):
+        pass
+
+    def moveL(self, pose, velocity=50, radius=0):
+        if not self.connected:
+            return False
+        end = self._move(pose, velocity, queued=False)
+        time.sleep(max(end - time.time(), 0.0))
+        return True
+
+    def moveJ_P(self, pose, velocity=50, radius=0):
+        return self.moveL(pose, velocity, radius)
+
+    def get_current_arm_state(self):
+        if not self.connected:
+            return None
+        time.sleep(self.latency)
+        pose = self._pose()
+        return {
+            'joint': [],
+            'pose': {'position': [float(v) for v in pose[:3]], 'orientation': [float(v) for v in pose[3:]]},
+            'arm_err': 0,
+            'sys_err': 0
+        }
+
+    def stop(self):
+        self._halt()
+        return True
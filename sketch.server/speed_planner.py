@@ -0,0 +1,97 @@
+import numpy as np
+
+
+def junction_speeds(directions, max_accel, accuracy):
+    """
+    拐角偏差模型：拐角处以半径 R 的圆弧过渡，圆弧与拐点的距离不超过 accuracy，
+    向心加速度不超过 max_accel
+
+    Args:
+        directions (ndarray): (S, 2) 各线段的单位方向向量
+        max_accel (float): 加速度（毫米/秒^2）
+        accuracy (float): 拐角处允许的轨迹偏差（毫米）
+
+    Returns:
+        ndarray: (S - 1,) 拐角速度（毫米/秒），直线处为 inf
+    """
+    cos_theta = -np.sum(directions[:-1] * directions[1:], axis=1)
+    sin_half = np.sqrt(np.clip(0.5 * (1.0 - cos_theta), 0.0, 1.0))
+    with np.errstate(divide='ignore'):
+        v2 = max_accel * accuracy * sin_half / (1.0 - sin_half)
+    return np.sqrt(v2)
+
+
+class SpeedPlanner:
+    """
+    按线段分配运动速度
+
+    每段线段的速度取以下几个上限中的最小值：
+      - 速度上限 max_velocity；
+      - 线段长度限制：在加速度限制下，长度为 L 的线段先加速再减速能达到的
+        最高速度 sqrt(a * L)，很短的线段用高速度没有意义；
+      - 转角限制：线段两端的拐角按“拐角偏差”模型计算，拐角越急速度越低，
+        保证拐角处的轨迹偏差不超过精度预算 accuracy。
+    结果以后端的速度百分比表示，并限制在 [min_velocity, max_velocity] 之间。
+    """
+
+    def __init__(self, max_speed, max_accel, accuracy, min_velocity, max_velocity, lower_velocity):
+        """
+        Args:
+            max_speed (float): 速度 100 时的直线速度（毫米/秒），取自运动时间模型
+            max_accel (float): 加速度（毫米/秒^2），取自运动时间模型
+            accuracy (float): 拐角处允许的轨迹偏差（毫米）
+            min_velocity (float): 最低速度百分比
+            max_velocity (float): 最高速度百分比
+            lower_velocity (float): 落笔（竖直下降到第一个点）的速度百分比
+        """
+        self.max_speed = max_speed
+        self.max_accel = max_accel
+        self.accuracy = accuracy
+        self.min_velocity = min_velocity
+        self.max_velocity = max_velocity
+        self.lower_velocity = lower_velocity
+
+    def junction_speeds(self, directions):
+        """
+        计算相邻两段线段之间拐角处的最高速度
+
+        Args:
+            directions (ndarray): (S, 2) 各线段的单位方向向量
+
+        Returns:
+            ndarray: (S - 1,) 拐角速度（毫米/秒），直线处为 inf
+        """
+        return junction_speeds(directions, self.max_accel, self.accuracy)
+
+    def plan(self, stroke):
+        """
+        为一条线条的每个点分配速度
+
+        Args:
+            stroke (ndarray): (N, 2) 机械臂坐标
+
+        Returns:
+            ndarray: (N,) 速度百分比；第 0 个是落笔速度，第 i 个是从第 i-1 点
+                     运动到第 i 点的速度
+        """
+        stroke = np.asarray(stroke, dtype=float)
+        velocities = np.empty(len(stroke))
+        velocities[0] = self.lower_velocity
+        if len(stroke) < 2:
+            return velocities
+
+        d = np.diff(stroke, axis=0)
+        lengths = np.hypot(d[:, 0], d[:, 1])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            directions = np.where(lengths[:, None] > 0, d / lengths[:, None], 0.0)
+
+        # 长度限制
+        speed = np.sqrt(self.max_accel * lengths)
+
+        # 转角限制：每段受起点和终点两个拐角约束，线条两端从静止开始/结束
+        junction = self.junction_speeds(directions)
+        speed[1:] = np.minimum(speed[1:], junction)
+        speed[:-1] = np.minimum(speed[:-1], junction)
+
+        velocities[1:] = np.clip(speed / self.max_speed * 100.0, self.min_velocity, self.max_velocity)
+        return np.round(velocities)
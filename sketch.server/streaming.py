@@ -0,0 +1,139 @@
+import time
+
+import numpy as np
+
+from speed_planner import junction_speeds
+
+
+class Trajectory:
+    """
+    折线的时间参数化
+
+    每段线段按梯形速度曲线运动：拐角速度由拐角偏差模型限制，再经过前向/后向两次
+    扫描保证相邻拐角之间的速度变化在加速度限制内。线条从静止开始、在终点停止。
+    """
+
+    def __init__(self, points, max_speed, max_accel, accuracy):
+        """
+        Args:
+            points (array): (N, 2) 机械臂坐标
+            max_speed (float): 最高速度（毫米/秒）
+            max_accel (float): 加速度（毫米/秒^2）
+            accuracy (float): 拐角处允许的轨迹偏差（毫米）
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        # 去掉重复点，index 记录保留的点在原始线条中的序号
+        keep = np.concatenate([[True], np.any(np.diff(points, axis=0) != 0, axis=1)])
+        self.index = np.flatnonzero(keep)
+        self.points = points[keep]
+        self.max_accel = max_accel
+
+        d = np.diff(self.points, axis=0)
+        self.lengths = np.hypot(d[:, 0], d[:, 1])
+        n = len(self.lengths)
+        v = np.zeros(n + 1)
+        if n:
+            v[1:-1] = np.minimum(junction_speeds(d / self.lengths[:, None], max_accel, accuracy), max_speed)
+        # 前向扫描：加速受限；后向扫描：减速受限
+        for i in range(n):
+            v[i + 1] = min(v[i + 1], np.sqrt(v[i] ** 2 + 2 * max_accel * self.lengths[i]))
+        for i in range(n - 1, -1, -1):
+            v[i] = min(v[i], np.sqrt(v[i + 1] ** 2 + 2 * max_accel * self.lengths[i]))
+
+        # 每段线段：入口速度 u、出口速度 w、最高速度 vp，加速/匀速/减速三段时间
+        a = max_accel
+        self.u, self.w = v[:-1], v[1:]
+        self.vp = np.minimum(max_speed, np.sqrt(a * self.lengths + (self.u ** 2 + self.w ** 2) / 2))
+        self.vp = np.maximum(self.vp, np.maximum(self.u, self.w))
+        self.d1 = (self.vp ** 2 - self.u ** 2) / (2 * a)
+        self.d3 = (self.vp ** 2 - self.w ** 2) / (2 * a)
+        self.d2 = np.maximum(self.lengths - self.d1 - self.d3, 0.0)
+        self.t1 = (self.vp - self.u) / a
+        self.t3 = (self.vp - self.w) / a
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.t2 = np.where(self.vp > 0, self.d2 / self.vp, 0.0)
+        self.knots = np.concatenate([[0.0], np.cumsum(self.t1 + self.t2 + self.t3)])
+
+    @property
+    def duration(self):
+        return float(self.knots[-1])
+
+    def sample(self, times):
+        """
+        计算给定时刻的位置和速度
+
+        Args:
+            times (array): (M,) 时刻（秒），超出范围的取端点
+
+        Returns:
+            tuple: ((M, 2) 位置, (M,) 速度（毫米/秒）, (M,) 所在线段对应的原始点序号)
+        """
+        times = np.clip(np.asarray(times, dtype=float), 0.0, self.duration)
+        if not len(self.lengths):
+            zeros = np.zeros(len(times), dtype=int)
+            return np.repeat(self.points[:1], len(times), axis=0), np.zeros(len(times)), self.index[zeros]
+
+        seg = np.clip(np.searchsorted(self.knots, times, side='right') - 1, 0, len(self.lengths) - 1)
+        tau = times - self.knots[seg]
+        u, vp, w = self.u[seg], self.vp[seg], self.w[seg]
+        t1, t2 = self.t1[seg], self.t2[seg]
+        a = self.max_accel
+
+        tc = np.clip(tau - t1, 0.0, t2)
+        tr = np.clip(tau - t1 - t2, 0.0, self.t3[seg])
+        ta = np.minimum(tau, t1)
+        s = u * ta + a * ta ** 2 / 2 + vp * tc + vp * tr - a * tr ** 2 / 2
+        speed = np.where(tau < t1, u + a * ta, np.where(tr > 0, vp - a * tr, vp))
+        speed = np.where(tau >= t1 + t2 + self.t3[seg], w, speed)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f = np.where(self.lengths[seg] > 0, np.clip(s / self.lengths[seg], 0.0, 1.0), 1.0)
+        d = self.points[seg + 1] - self.points[seg]
+        positions = self.points[seg] + d * f[:, None]
+        return positions, speed, self.index[seg]
+
+
+def stream(trajectory, send, rate, should_stop, on_point=None):
+    """
+    在当前线程中按固定频率发送插值点，用于 asyncio.to_thread
+
+    每个点的发送时刻按 t0 + k / rate 的绝对时间计算，某一次发送延迟不会累积到
+    后面的点；落后超过一个周期的点计入 overruns。
+
+    Args:
+        trajectory (Trajectory): 时间参数化后的线条
+        send (callable): send(position, speed) 发送一个设定点
+        rate (float): 控制频率（Hz）
+        should_stop (callable): 返回True时提前结束（暂停/停止）
+        on_point (callable): on_point(index) 经过原始线条的第 index 个点时调用
+
+    Returns:
+        dict: {'completed', 'time', 'position', 'point', 'overruns', 'max_late'}
+    """
+    dt = 1.0 / rate
+    times = np.append(np.arange(0.0, trajectory.duration, dt), trajectory.duration)
+    positions, speeds, points = trajectory.sample(times)
+
+    result = {'completed': True, 'time': 0.0, 'position': positions[0], 'point': int(trajectory.index[0]),
+              'overruns': 0, 'max_late': 0.0}
+    t0 = time.perf_counter()
+    for k in range(len(times)):
+        if should_stop():
+            result['completed'] = False
+            return result
+        delay = t0 + times[k] - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        elif -delay > dt:
+            result['overruns'] += 1
+        result['max_late'] = max(result['max_late'], -delay)
+        send(positions[k], speeds[k])
+        result['time'], result['position'] = times[k], positions[k]
+        if on_point and points[k] > result['point']:
+            # 已经走过的原始点（设定点到达下一段时，上一段的起点已画完）
+            on_point(int(points[k]))
+        result['point'] = int(points[k])
+    if on_point:
+        on_point(int(trajectory.index[-1]))
+    result['point'] = int(trajectory.index[-1])
+    return result
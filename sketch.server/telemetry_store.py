@@ -0,0 +1,309 @@
+import argparse
+import csv
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    backend TEXT,
+    started REAL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    session_id TEXT,
+    profile TEXT,
+    started REAL,
+    finished REAL,
+    status TEXT,
+    strokes INTEGER,
+    points INTEGER DEFAULT 0,
+    drawing_time REAL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS points (
+    job_id TEXT,
+    stroke INTEGER,
+    point INTEGER,
+    t REAL,
+    target_x REAL,
+    target_y REAL,
+    command_x REAL,
+    command_y REAL,
+    actual_x REAL,
+    actual_y REAL,
+    error REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_started ON jobs (started);
+CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session_id);
+CREATE INDEX IF NOT EXISTS points_job_stroke ON points (job_id, stroke);
+CREATE INDEX IF NOT EXISTS points_t ON points (t);
+"""
+
+INSERT_POINT = "INSERT INTO points VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+class TelemetryStore:
+    """
+    会话遥测数据库（SQLite）
+
+    所有写入先放进队列，由后台线程按批次用 executemany 写入并提交，绘图循环
+    只做一次 put，不会被磁盘 I/O 阻塞。查询使用单独的只读连接，见 query_* 函数。
+    """
+
+    def __init__(self, path, batch_size=200, flush_interval=1.0):
+        """
+        Args:
+            path (str|Path): 数据库文件路径
+            batch_size (int): 攒够多少条写入后提交一次
+            flush_interval (float): 距上次提交超过多少秒时提交
+        """
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        connect(self.path).close()
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def _writer(self):
+        """后台写入线程：队列为空、攒够一批或超时时提交"""
+        conn = sqlite3.connect(self.path)
+        batch = []
+        last_commit = time.time()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if isinstance(item, tuple):
+                batch.append(item)
+            if batch and (not isinstance(item, tuple) or len(batch) >= self.batch_size
+                          or time.time() - last_commit >= self.flush_interval):
+                self._commit(conn, batch)
+                batch = []
+                last_commit = time.time()
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item == 'close':
+                conn.close()
+                return
+
+    @staticmethod
+    def _commit(conn, batch):
+        """相同语句的连续写入合并成一次 executemany"""
+        try:
+            for sql, group in itertools.groupby(batch, key=lambda item: item[0]):
+                conn.executemany(sql, [params for _, params in group])
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing telemetry: {e}")
+
+    def _put(self, sql, params):
+        self._queue.put((sql, params))
+
+    def start_session(self, session_id, backend):
+        self._put("INSERT OR IGNORE INTO sessions VALUES (?, ?, ?)", (session_id, backend, time.time()))
+
+    def start_job(self, job_id, session_id, profile, strokes):
+        """记录任务开始；续画的任务保留原来的开始时间和已画的点数"""
+        self._put("INSERT INTO jobs (job_id, session_id, profile, started, status, strokes) "
+                  "VALUES (?, ?, ?, ?, 'running', ?) "
+                  "ON CONFLICT (job_id) DO UPDATE SET status = 'running'",
+                  (job_id, session_id, profile, time.time(), strokes))
+
+    def record_point(self, job_id, stroke, point, target, command, actual, error):
+        """
+        记录一个采样点的目标、指令和实际位置
+
+        Args:
+            job_id (str): 任务ID
+            stroke (int): 规划后的线条序号
+            point (int): 线条中的点序号
+            target, command, actual (tuple): (x, y) 目标/指令/实际位置
+            error (float): 实际位置与目标位置的距离
+        """
+        self._put(INSERT_POINT, (job_id, stroke, point, time.time(),
+                                 float(target[0]), float(target[1]),
+                                 float(command[0]), float(command[1]),
+                                 float(actual[0]), float(actual[1]), float(error)))
+
+    def finish_job(self, job_id, status, points, drawing_time):
+        """
+        记录任务结束
+
+        Args:
+            status (str): complete / stopped / aborted
+            points (int): 本次运行画完的点数，续画时累加
+            drawing_time (float): 本次运行的绘图时间（秒），续画时累加
+        """
+        self._put("UPDATE jobs SET finished = ?, status = ?, points = points + ?, "
+                  "drawing_time = drawing_time + ? WHERE job_id = ?",
+                  (time.time(), status, points, drawing_time, job_id))
+
+    def flush(self, timeout=10.0):
+        """等待队列中的数据全部写入"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        self._queue.put('close')
+        self._thread.join(timeout=10.0)
+
+
+def connect(path):
+    """打开数据库，不存在时创建表和索引"""
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _since(days):
+    return time.time() - days * 86400 if days else 0
+
+
+def query_positions(path, since_days=None):
+    """
+    读取所有采样点的指令位置和实际位置（用于拟合误差补偿）
+
+    Returns:
+        list: [(command_x, command_y, actual_x, actual_y), ...]
+    """
+    with closing(connect(path)) as conn:
+        return conn.execute("SELECT command_x, command_y, actual_x, actual_y FROM points WHERE t >= ?",
+                            (_since(since_days),)).fetchall()
+
+
+def query_jobs(path, since_days=None, limit=50):
+    """
+    最近的任务及其吞吐量和误差统计
+
+    Returns:
+        list: 每个任务一个字典
+    """
+    with closing(connect(path)) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("""
+            SELECT j.job_id, j.profile, j.started, j.status, j.strokes, j.points, j.drawing_time,
+                   (SELECT AVG(error) FROM points p WHERE p.job_id = j.job_id) AS mean_error,
+                   (SELECT MAX(error) FROM points p WHERE p.job_id = j.job_id) AS max_error
+            FROM jobs j WHERE j.started >= ? ORDER BY j.started DESC LIMIT ?
+        """, (_since(since_days), limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def query_trend(path, since_days=30, by='day'):
+    """
+    按天或按周汇总的吞吐量和误差趋势
+
+    Returns:
+        list: [{'period', 'jobs', 'points', 'points_per_minute', 'samples', 'mean_error', 'max_error'}, ...]
+    """
+    fmt = '%Y-%m-%d' if by == 'day' else '%Y-W%W'
+    since = _since(since_days)
+    with closing(connect(path)) as conn:
+        conn.row_factory = sqlite3.Row
+        jobs = {row['period']: row for row in conn.execute("""
+            SELECT strftime(?, started, 'unixepoch', 'localtime') AS period,
+                   COUNT(*) AS jobs, SUM(points) AS points, SUM(drawing_time) AS drawing_time
+            FROM jobs WHERE started >= ? GROUP BY period
+        """, (fmt, since))}
+        errors = {row['period']: row for row in conn.execute("""
+            SELECT strftime(?, t, 'unixepoch', 'localtime') AS period,
+                   COUNT(*) AS samples, AVG(error) AS mean_error, MAX(error) AS max_error
+            FROM points WHERE t >= ? GROUP BY period
+        """, (fmt, since))}
+
+    trend = []
+    for period in sorted(set(jobs) | set(errors)):
+        j, e = jobs.get(period), errors.get(period)
+        drawing_time = j['drawing_time'] if j else 0
+        trend.append({
+            'period': period,
+            'jobs': j['jobs'] if j else 0,
+            'points': j['points'] if j else 0,
+            'points_per_minute': j['points'] / drawing_time * 60 if j and drawing_time else None,
+            'samples': e['samples'] if e else 0,
+            'mean_error': e['mean_error'] if e else None,
+            'max_error': e['max_error'] if e else None
+        })
+    return trend
+
+
+def import_csv(path, data_dir):
+    """把旧的 positions_<时间>.csv 导入数据库，每个文件作为一个会话和一个任务"""
+    imported = 0
+    with closing(connect(path)) as conn:
+        for csv_path in sorted(Path(data_dir).glob("positions_*.csv")):
+            session_id = csv_path.stem[len("positions_"):]
+            try:
+                started = datetime.strptime(session_id, "%Y%m%d_%H%M%S").timestamp()
+            except ValueError:
+                started = csv_path.stat().st_mtime
+            job_id = f"csv-{session_id}"
+            if conn.execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)).fetchone():
+                continue
+            rows = []
+            with open(csv_path, 'r', newline='') as f:
+                for i, row in enumerate(csv.DictReader(f)):
+                    try:
+                        rows.append((job_id, None, i, started,
+                                     float(row['target_x']), float(row['target_y']),
+                                     float(row.get('command_x') or row['target_x']),
+                                     float(row.get('command_y') or row['target_y']),
+                                     float(row['actual_x']), float(row['actual_y']),
+                                     float(row['error_distance'])))
+                    except (KeyError, ValueError):
+                        continue
+            conn.execute("INSERT OR IGNORE INTO sessions VALUES (?, ?, ?)", (session_id, None, started))
+            conn.execute("INSERT INTO jobs (job_id, session_id, started, finished, status) VALUES (?, ?, ?, ?, 'imported')",
+                         (job_id, session_id, started, started))
+            conn.executemany(INSERT_POINT, rows)
+            conn.commit()
+            imported += 1
+    return imported
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query throughput and error statistics across sessions')
+    parser.add_argument('--db', default='position_records/telemetry.db', help='Telemetry database')
+    sub = parser.add_subparsers(dest='command', required=True)
+    jobs = sub.add_parser('jobs', help='List recent jobs')
+    jobs.add_argument('--since', type=float, default=None, help='Only jobs from the last N days')
+    jobs.add_argument('--limit', type=int, default=50)
+    trend = sub.add_parser('trend', help='Throughput and error per day or week')
+    trend.add_argument('--since', type=float, default=30, help='Last N days (default: 30)')
+    trend.add_argument('--by', choices=['day', 'week'], default='day')
+    imp = sub.add_parser('import', help='Import legacy positions_*.csv files')
+    imp.add_argument('data_dir', nargs='?', default='position_records')
+    args = parser.parse_args()
+
+    if args.command == 'jobs':
+        print(f"{'job':<14}{'profile':<10}{'started':<18}{'status':<10}{'points':>8}{'pts/min':>9}{'mean err':>10}{'max err':>9}")
+        for job in query_jobs(args.db, args.since, args.limit):
+            rate = job['points'] / job['drawing_time'] * 60 if job['drawing_time'] else None
+            started = datetime.fromtimestamp(job['started']).strftime('%Y-%m-%d %H:%M')
+            print(f"{job['job_id']:<14}{job['profile'] or '-':<10}{started:<18}{job['status'] or '-':<10}"
+                  f"{job['points'] or 0:>8}{_fmt(rate, '.1f'):>9}{_fmt(job['mean_error'], '.2f'):>10}"
+                  f"{_fmt(job['max_error'], '.2f'):>9}")
+    elif args.command == 'trend':
+        print(f"{'period':<12}{'jobs':>6}{'points':>9}{'pts/min':>9}{'samples':>9}{'mean err':>10}{'max err':>9}")
+        for row in query_trend(args.db, args.since, args.by):
+            print(f"{row['period']:<12}{row['jobs']:>6}{row['points'] or 0:>9}{_fmt(row['points_per_minute'], '.1f'):>9}"
+                  f"{row['samples']:>9}{_fmt(row['mean_error'], '.2f'):>10}{_fmt(row['max_error'], '.2f'):>9}")
+    elif args.command == 'import':
+        print(f"Imported {import_csv(args.db, args.data_dir)} session files")
+
+
+if __name__ == "__main__":
+    main()
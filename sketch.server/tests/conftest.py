@@ -0,0 +1,151 @@
+import importlib
+import json
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVER_DIR))
+
+# 后端名称 -> 服务器脚本
+SERVERS = {
+    'mycobot': 'server.py',
+    'rm': 'rm_server.py'
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class SimServer:
+    """在临时目录中运行的模拟器服务器，任务日志、配置等文件都写在这个目录里"""
+
+    def __init__(self, backend, workdir):
+        self.backend = backend
+        self.workdir = workdir
+        self.port = free_port()
+        self.log = open(workdir / 'server.log', 'w')
+        self.process = None
+
+    def start(self, timeout=30.0):
+        self.process = subprocess.Popen(
+            [sys.executable, '-u', str(SERVER_DIR / SERVERS[self.backend]), '--sim',
+             '--host', '127.0.0.1', '--port', str(self.port), '--planners', '1'],
+            cwd=self.workdir, stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited:\n{self.output()}")
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=0.5).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"Server did not start:\n{self.output()}")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
+
+    def kill(self):
+        """模拟进程崩溃"""
+        self.process.kill()
+        self.process.wait()
+
+    def output(self):
+        self.log.flush()
+        return (self.workdir / 'server.log').read_text()
+
+    def connect(self):
+        return Client(self.port)
+
+
+class Client:
+    """按行读取服务器推送的事件"""
+
+    def __init__(self, port, timeout=60.0):
+        self.sock = socket.create_connection(('127.0.0.1', port), timeout=timeout)
+        self.file = self.sock.makefile('r')
+
+    def send(self, message_type, data=None, **fields):
+        self.send_many([{'type': message_type, 'data': data, **fields}])
+
+    def send_many(self, messages):
+        """一次写入多条消息，服务器一次读到的数据里包含多条消息"""
+        self.sock.sendall("".join(json.dumps(message) + "\n" for message in messages).encode())
+
+    def next_event(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection")
+        return json.loads(line)
+
+    def wait_for(self, *types):
+        """读到指定类型的事件为止，返回途中收到的全部事件"""
+        events = []
+        while True:
+            events.append(self.next_event())
+            if events[-1]['type'] in types:
+                return events
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+@pytest.fixture(params=sorted(SERVERS))
+def sim_server(request, tmp_path):
+    server = SimServer(request.param, tmp_path).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(params=sorted(SERVERS))
+def backend(request):
+    """服务器模块：工作空间、运动模型标定值和内置配置定义在这里"""
+    return importlib.import_module(SERVERS[request.param][:-3])
+
+
+@pytest.fixture
+def workspace(backend):
+    from workspace import Workspace
+    return Workspace(backend.ARM_X_MIN, backend.ARM_X_MAX, backend.ARM_Y_MIN, backend.ARM_Y_MAX,
+                     backend.ARM_REACH_MIN, backend.ARM_REACH_MAX)
+
+
+@pytest.fixture
+def profiles(backend, tmp_path):
+    from profiles import load_profiles
+    return load_profiles(backend.PROFILES, backend.MOTION_MODEL, tmp_path / 'robot_config.json')
+
+
+@pytest.fixture
+def local_server(backend, tmp_path, monkeypatch):
+    """
+    在当前进程中创建的模拟器服务器（不监听端口），用来直接调用 draw_lines 等方法；
+    broadcast 的事件记录在 server.events 中
+    """
+    monkeypatch.chdir(tmp_path)
+    server = backend.SketchServer('127.0.0.1', 0, sim=True, planners=1)
+    server.events = []
+
+    async def broadcast(event_type, **data):
+        server.events.append({'type': event_type, 'data': data})
+    server.broadcast = broadcast
+    yield server
+    server.telemetry.close()
+    server.journal.close()
+    server.planner.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,109 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from arm_link import ArmLink
+from rm_arm import RoboticArm
+
+CALIBRATION = {'max_speed': 1e6, 'max_accel': 1e9, 'command_overhead': 0.0}
+
+
+class FakeController:
+    """
+    按 rm_arm 的协议应答的控制器：movel 的 trajectory_state 为 x > 0，
+    slow 中的 x 延迟 delay 秒后才应答
+    """
+
+    def __init__(self, slow=(), delay=0.5):
+        self.slow = set(slow)
+        self.delay = delay
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen()
+        self.port = self.server.getsockname()[1]
+        self.connections = 0
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        buffer = b""
+        with conn:
+            while True:
+                try:
+                    chunk = conn.recv(1024)
+                except OSError:
+                    return
+                if not chunk:
+                    return
+                buffer += chunk
+                while b"\r\n" in buffer:
+                    raw, buffer = buffer.split(b"\r\n", 1)
+                    try:
+                        conn.sendall((json.dumps(self._reply(json.loads(raw))) + "\r\n").encode())
+                    except OSError:
+                        return
+
+    def _reply(self, command):
+        if command['command'] == 'movel':
+            x = command['pose'][0] // 1000
+            if x in self.slow:
+                self.slow.discard(x)
+                time.sleep(self.delay)
+            return {'state': 'current_trajectory_state', 'trajectory_state': x > 0}
+        return {'state': 'current_arm_state',
+                'arm_state': {'joint': [0] * 6, 'pose': [0] * 6, 'arm_err': 0, 'sys_err': 0}}
+
+    def close(self):
+        self.server.close()
+
+
+@pytest.fixture
+def controller():
+    controller = FakeController(slow={1})
+    yield controller
+    controller.close()
+
+
+def make_link(port):
+    arm = RoboticArm()
+    arm.default_port = port
+    link = ArmLink(arm, '127.0.0.1', CALIBRATION, call_timeout=0.2, backoff=(0.05, 0.1), max_outage=2.0)
+    assert link.connect()
+    return link
+
+
+def test_deadline_miss_drops_link(controller):
+    link = make_link(controller.port)
+    assert link.moveL([1, 0, 0, 0, 0, 0]) is False
+    assert not link.is_connected()
+    assert link.heartbeat() is None
+
+
+def test_late_reply_is_not_read_as_next_answer(controller):
+    link = make_link(controller.port)
+    assert link.moveL([1, 0, 0, 0, 0, 0]) is False
+    # 迟到的 True 回复留在旧连接里，不能被当成 x < 0 的回复
+    time.sleep(controller.delay)
+    assert link.moveL([-1, 0, 0, 0, 0, 0]) is False
+    assert link.reconnect() is not None
+    assert controller.connections == 2
+    assert link.moveL([2, 0, 0, 0, 0, 0]) is True
+    assert link.moveL([-2, 0, 0, 0, 0, 0]) is False
+
+
+def test_fast_failure_keeps_link(controller):
+    link = make_link(controller.port)
+    assert link.moveL([-1, 0, 0, 0, 0, 0]) is False
+    assert link.is_connected()
+    assert link.heartbeat() is not None
@@ -0,0 +1,143 @@
+import time
+
+import numpy as np
+import pytest
+
+from arm_trace import (RECORD, TracedArm, TraceWriter, _unflatten, first_divergence, read_trace, replay,
+                       summarize)
+from server import MOTION_MODEL
+from sim_arm import SimMyCobot, SimRoboticArm
+
+
+def write_sample(path):
+    writer = TraceWriter(path, 'rm')
+    t0 = writer.start
+    writer.write('connect', t0, 0.01, ('192.168.1.18', 8080), True)
+    writer.write('moveL', t0 + 0.1, 0.2, ([1, 2, 3, -3.14, 0, 0.5], 20, 0), True)
+    writer.write('get_current_arm_state', t0 + 0.4, 0.005, (),
+                 {'pose': {'position': [1, 2, 3], 'orientation': [-3.14, 0, 0.5]}, 'arm_err': 0, 'sys_err': 7})
+    writer.write('moveL', t0 + 2.0, 0.3, ([4, 5, 6, -3.14, 0, 0.5], 20, 0), False)
+    writer.write('stop', t0 + 2.5, 0.01, (), None)
+    writer.close()
+
+
+def test_write_read_round_trip(tmp_path):
+    path = tmp_path / 'trace.bin'
+    write_sample(path)
+    backend, records = read_trace(path)
+    assert backend == 'rm'
+    assert [r['op'] for r in records] == ['connect', 'moveL', 'get_current_arm_state', 'moveL', 'stop']
+    # IP 地址不记录，只剩端口
+    assert records[0]['args'].tolist() == [8080] and records[0]['response'].tolist() == [1]
+    assert records[1]['t'] == pytest.approx(0.1) and records[1]['duration'] == pytest.approx(0.2)
+    assert records[1]['args'] == pytest.approx([1, 2, 3, -3.14, 0, 0.5, 20, 0], abs=1e-6)
+    assert records[2]['args'].tolist() == []
+    assert records[2]['response'] == pytest.approx([1, 2, 3, -3.14, 0, 0.5, 0, 7], abs=1e-6)
+    # 返回 None 和返回空值区分开
+    assert records[4]['response'] is None
+
+
+def test_truncated_record_is_dropped(tmp_path):
+    path = tmp_path / 'trace.bin'
+    write_sample(path)
+    data = path.read_bytes()
+    _, records = read_trace(path)
+    # 最后一条 stop 只有记录头：留下半个记录头时丢掉 stop
+    path.write_bytes(data[:-5])
+    assert [r['op'] for r in read_trace(path)[1]] == [r['op'] for r in records[:-1]]
+    # 前一条 moveL 的响应不完整时，它和之后的记录都丢掉，前面的记录不受影响
+    path.write_bytes(data[:-RECORD.size - 2])
+    truncated = read_trace(path)[1]
+    assert [r['op'] for r in truncated] == [r['op'] for r in records[:3]]
+    assert truncated[2]['response'] == pytest.approx(records[2]['response'])
+    path.write_bytes(b'XXXX' + data[4:])
+    with pytest.raises(ValueError):
+        read_trace(path)
+
+
+def test_unflatten_restores_arguments_and_defaults():
+    assert _unflatten('moveL', np.array([1, 2, 3, 4, 5, 6.5, 20, 0])) == [[1, 2, 3, 4, 5, 6.5], 20, 0]
+    # 调用时省略的默认参数不补上，由被调用的方法使用自己的默认值
+    assert _unflatten('moveL', np.array([1, 2, 3, 4, 5, 6, 20])) == [[1, 2, 3, 4, 5, 6], 20]
+    assert _unflatten('send_angles', np.array([0, 0, 0, 0, 0, 0, 50])) == [[0, 0, 0, 0, 0, 0], 50]
+    assert _unflatten('set_fresh_mode', np.array([1.0])) == [1]
+    assert isinstance(_unflatten('send_coords', np.array([0, 0, 0, 0, 0, 0, 2.5, 1]))[1], float)
+    # 没有参数结构的操作（查询、stop）不带参数
+    assert _unflatten('get_coords', np.array([])) == []
+    assert _unflatten('stop', np.array([1.0, 2.0])) == []
+
+
+def motion(op, args, t=0.0, duration=0.1, response=None):
+    return {'op': op, 't': t, 'duration': duration, 'args': np.array(args, dtype=float),
+            'response': None if response is None else np.array(response, dtype=float)}
+
+
+def test_first_divergence():
+    a = [motion('send_coords', [0, 0, 0, 0, 0, 0, 50, 1]), motion('get_coords', []),
+         motion('send_coords', [10, 0, 0, 0, 0, 0, 50, 1])]
+    # 查询指令不参与比较，误差在容差内视为相同
+    b = [motion('send_coords', [0, 0, 0.005, 0, 0, 0, 50, 1]), motion('send_coords', [10, 0, 0, 0, 0, 0, 50, 1])]
+    assert first_divergence(a, b) is None
+    assert first_divergence(a, [b[0], motion('send_coords', [11, 0, 0, 0, 0, 0, 50, 1])]) == 1
+    assert first_divergence(a, [b[0], motion('send_angles', [10, 0, 0, 0, 0, 0, 50])]) == 1
+    assert first_divergence(a, b[:1]) == 1
+    assert first_divergence(a + [b[1]], b) == 2
+
+
+def test_summarize():
+    records = [
+        motion('moveL', [0] * 8, t=0.0, duration=0.5, response=[1]),
+        motion('get_current_arm_state', [], t=0.6, duration=0.1, response=[0] * 8),
+        motion('moveL', [1] * 8, t=2.0, duration=0.5, response=[0]),
+        motion('stop', [], t=2.6, duration=0.1)
+    ]
+    summary = summarize(records, gap_threshold=0.5)
+    assert summary['commands'] == 4 and summary['motion_commands'] == 2 and summary['failed'] == 1
+    assert summary['total_time'] == pytest.approx(2.7)
+    assert summary['busy_time'] == pytest.approx(1.2)
+    # 只有 0.7 -> 2.0 的间隔超过阈值
+    assert summary['idle_gaps'] == 1 and summary['idle_time'] == pytest.approx(1.3)
+    assert summary['max_gap'] == pytest.approx(1.3)
+    assert summary['mean_motion_interval'] == pytest.approx(2.0)
+    assert summary['ops'] == {'moveL': 2, 'get_current_arm_state': 1, 'stop': 1}
+    assert summarize([])['commands'] == 0
+
+
+def test_traced_sim_arm_replays_to_same_commands(tmp_path):
+    arm = SimMyCobot(MOTION_MODEL, latency=0.0)
+    arm.command_overhead = 0.0
+    writer = TraceWriter(tmp_path / 'original.bin', 'mycobot')
+    traced = TracedArm(arm, writer)
+    traced.set_fresh_mode(1)
+    home = MOTION_MODEL['home']
+    for i in range(5):
+        traced.send_coords([home[0] + 10 * i, home[1], 120.0, -180, 0, -90], 80, 1)
+        traced.get_coords()
+        time.sleep(0.02)
+    # 不在 OPS 中的属性直接转发，不记录
+    assert traced.fresh_mode == 1
+    writer.close()
+    _, original = read_trace(tmp_path / 'original.bin')
+    assert [r['op'] for r in original] == ['set_fresh_mode'] + ['send_coords', 'get_coords'] * 5
+    assert original[2]['response'] is not None and len(original[2]['response']) == 6
+
+    sim = SimMyCobot(MOTION_MODEL, latency=0.0)
+    writer = TraceWriter(tmp_path / 'replayed.bin', 'mycobot')
+    start = time.time()
+    replay(original, TracedArm(sim, writer), timing='original', speedup=2.0)
+    elapsed = time.time() - start
+    writer.close()
+    _, replayed = read_trace(tmp_path / 'replayed.bin')
+    assert first_divergence(original, replayed) is None
+    assert sim.fresh_mode == 1
+    # 按原来的时间间隔（加速 2 倍）发送
+    assert elapsed >= original[-1]['t'] / 2.0 - 0.01
+
+
+def test_replay_skips_connection_ops():
+    arm = SimRoboticArm(MOTION_MODEL, latency=0.0)
+    arm.connect(None)
+    records = [motion('disconnect', []), motion('moveL', [MOTION_MODEL['home'][0], MOTION_MODEL['home'][1], 150,
+                                                          -3.14, 0, -0.359, 100])]
+    replay(records, arm, timing='asap')
+    assert arm.is_connected()
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from calibration import ErrorCompensation
+
+
+def arm_error(q):
+    """模拟的系统误差：平移加上轻微的缩放和扭曲"""
+    x, y = q[:, 0], q[:, 1]
+    return np.stack([0.8 + 0.004 * x + 0.00002 * x * y, -0.5 + 0.003 * y - 0.00001 * x * x], axis=1)
+
+
+def records(n, noise=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    commands = rng.uniform([-250, 50], [-50, 250], (n, 2))
+    return commands, commands + arm_error(commands) + rng.normal(0, noise, (n, 2))
+
+
+def test_fit_picks_degree_and_compensates():
+    commands, actuals = records(400, noise=0.02)
+    compensation = ErrorCompensation.fit(commands, actuals)
+    assert compensation.degree == 2
+    assert compensation.stats['rms_after'] < 0.05 < compensation.stats['rms_before']
+
+    # 按补偿后的指令运动，笔应落在目标点上
+    targets = np.random.default_rng(1).uniform([-240, 60], [-60, 240], (50, 2))
+    sent = compensation.compensate(targets)
+    landed = sent + arm_error(sent)
+    assert np.max(np.hypot(*(landed - targets).T)) < 0.05
+
+
+def test_fit_needs_enough_records():
+    commands, actuals = records(14)
+    assert ErrorCompensation.fit(commands, actuals) is None
+    assert ErrorCompensation.fit(*records(20), degree=3) is None
+    assert ErrorCompensation.fit(*records(20)).degree == 1
+
+
+def test_correction_is_limited_and_clamped_outside_bounds():
+    commands, actuals = records(200)
+    compensation = ErrorCompensation.fit(commands, actuals + 30.0, degree=1, max_correction=2.0)
+    shift = compensation.compensate([[-150, 150]]) - [[-150, 150]]
+    assert np.hypot(*shift[0]) == pytest.approx(2.0)
+    # 记录范围外按边界值外推
+    assert compensation.error([[-1000, 150]]) == pytest.approx(compensation.error([[commands[:, 0].min(), 150]]))
+
+
+def test_round_trip(tmp_path):
+    compensation = ErrorCompensation.fit(*records(200))
+    compensation.save(tmp_path / 'calibration.json')
+    loaded = ErrorCompensation.load(tmp_path / 'calibration.json')
+    points = np.array([[-200, 100], [-100, 200]])
+    assert loaded.compensate(points) == pytest.approx(compensation.compensate(points))
+    assert ErrorCompensation.load(tmp_path / 'missing.json') is None
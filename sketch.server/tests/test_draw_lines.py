@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+
+def stroke(x, y):
+    return [{'x': x, 'y': y}, {'x': x + 30, 'y': y + 10}, {'x': x + 40, 'y': y + 30}]
+
+
+class Owner:
+    """记录 send_message 发给它的消息的假客户端"""
+
+    def __init__(self):
+        self.messages = []
+
+
+def record_messages(server):
+    async def send_message(writer, message):
+        writer.messages.append(message)
+    server.send_message = send_message
+
+
+def test_drawing_error_clears_live_job(local_server):
+    server = local_server
+    record_messages(server)
+    owner = Owner()
+
+    async def fail(job_id, profile, plan, *args):
+        # 绘制中并入一条 live LINES 后出错
+        server.live['requests'].append((owner, 1))
+        raise ValueError("compensation failed")
+    server._draw_strokes = fail
+
+    async def main():
+        lines = [stroke(100, 100)]
+        job_id = server.journal.start_job(lines, 800, 600, 'draft')
+        return await server.draw_lines(job_id, lines, 800, 600, 'draft', owner=owner)
+    assert asyncio.run(main()) is False
+    assert server.live is None
+    assert [e['type'] for e in server.events] == ['JOB_ACCEPTED', 'ERROR']
+    assert server.events[-1]['data']['message'] == "compensation failed"
+    assert [m['type'] for m in owner.messages] == ['ERROR']
+    assert owner.messages[0]['data']['merged'] is True
+    # 出错的任务留在日志中，可以用 RESUME 继续
+    assert server.journal.load_unfinished() is not None
+
+
+def test_unplannable_job_is_reported_and_dropped_from_journal(local_server):
+    server = local_server
+    # 缺少 x 的点在规划进程中出错
+    lines = [stroke(100, 100), [{'y': 5}, {'x': 1, 'y': 2}]]
+
+    async def main():
+        job_id = server.journal.start_job(lines, 800, 600, 'draft')
+        return await server.draw_lines(job_id, lines, 800, 600, 'draft')
+    assert asyncio.run(main()) is False
+    assert [e['type'] for e in server.events] == ['ERROR']
+    assert server.events[0]['data']['message'].startswith("Planning failed")
+    assert server.journal.load_unfinished() is None
+    # 之后的任务不受影响
+    assert not server.control.stopped
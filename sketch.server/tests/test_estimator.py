@@ -0,0 +1,69 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from estimator import EtaTracker, estimate_job, trapezoid_time
+
+
+def segment(x, y):
+    return [{'x': x, 'y': y}, {'x': x + 40, 'y': y + 20}, {'x': x + 60, 'y': y + 60}]
+
+
+def test_trapezoid_time_short_and_long_moves():
+    speed, accel = 100.0, 500.0
+    # 距离不足以加速到最高速度时是三角形速度曲线
+    assert trapezoid_time(5.0, speed, accel) == pytest.approx(2 * np.sqrt(5.0 / accel))
+    assert trapezoid_time(300.0, speed, accel) == pytest.approx(300.0 / speed + speed / accel)
+    # 两种曲线在 v^2/a 处连续
+    edge = speed * speed / accel
+    assert trapezoid_time(edge - 1e-9, speed, accel) == pytest.approx(trapezoid_time(edge, speed, accel))
+    assert np.all(np.diff(trapezoid_time(np.linspace(0, 500, 200), speed, accel)) >= 0)
+
+
+def test_estimate_matches_stroke_times(workspace, profiles):
+    profile = profiles['standard']
+    lines = [segment(100 + i * 120, 150) for i in range(4)]
+    result = estimate_job(lines, 800, 600, workspace, profile)
+    assert result['strokes'] == 4 and result['pen_changes'] == 0
+    assert result['total_time'] == pytest.approx(result['pen_down_time'] + result['pen_up_time'])
+
+
+def test_estimate_counts_pen_changes(workspace, profiles):
+    profile = profiles['standard']
+    lines = [{'pen': 'black', 'points': segment(100, 100)}, {'pen': 'red', 'points': segment(300, 100)},
+             {'pen': 'black', 'points': segment(500, 300)}]
+    unknown = estimate_job(lines, 800, 600, workspace, profile)
+    loaded = estimate_job(lines, 800, 600, workspace, profile, pen='black')
+    # 每支笔只画一次：不知道装着什么笔时换两次，装着黑笔时只换一次红笔
+    assert (unknown['pen_changes'], loaded['pen_changes']) == (2, 1)
+    change = profile.model.pen_change_time
+    assert change > 0
+    assert loaded['pen_change_time'] == pytest.approx(change)
+    assert loaded['total_time'] == pytest.approx(loaded['pen_down_time'] + loaded['pen_up_time'] + change)
+    assert not estimate_job(lines, 800, 600, workspace, profile, loaded['total_time'] - change / 2, 'black')['fits']
+
+
+def test_eta_scales_remaining_by_observed_pace():
+    times = [{'pen_down': 1.0, 'pen_up': 1.0}] * 4
+    eta = EtaTracker(times)
+    assert eta.eta(0) == pytest.approx(8.0)
+    # 实际用时是估算的两倍，剩下的部分按同样比例放大
+    eta.start_time -= 4.0
+    assert eta.eta(1) == pytest.approx(12.0, rel=0.01)
+    eta.update(times + [{'pen_down': 2.0, 'pen_up': 0.0}])
+    assert eta.eta(1) == pytest.approx(16.0, rel=0.01)
+
+
+def test_cli_pen_matches_integer_pen_ids(tmp_path):
+    payload = tmp_path / 'job.json'
+    payload.write_text(json.dumps([{'pen': 1, 'points': segment(100, 100)},
+                                   {'pen': 2, 'points': segment(300, 200)}]))
+    script = Path(__file__).resolve().parent.parent / 'estimator.py'
+    output = subprocess.run([sys.executable, str(script), str(payload), '--pen', '1'], cwd=tmp_path,
+                            capture_output=True, text=True, check=True).stdout
+    # 开始时装着笔 1，只需要换一次笔
+    assert "Pen changes: 1 " in output
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from height_map import HeightMap, probe_grid
+from workspace import Workspace
+
+
+def plane(points):
+    return 0.02 * points[:, 0] - 0.01 * points[:, 1] + 0.5
+
+
+def test_fit_reproduces_planar_paper():
+    xs, ys = np.linspace(0, 200, 5), np.linspace(-100, 100, 4)
+    points = np.array([(x, y) for y in ys for x in xs])
+    height_map = HeightMap.fit(points[::-1], plane(points[::-1]))
+    assert height_map.offsets.shape == (4, 5)
+    assert height_map.stats['probes'] == 20
+    # 双线性插值对平面是精确的；网格外按边界值外推
+    rng = np.random.default_rng(5)
+    inside = rng.uniform([0, -100], [200, 100], (100, 2))
+    # 网格坐标按 0.001 毫米取整
+    assert height_map.offset(inside) == pytest.approx(plane(inside), abs=1e-4)
+    assert height_map.offset([[300, 200]])[0] == pytest.approx(plane(np.array([[200, 100]]))[0])
+
+
+def test_fit_fills_missing_nodes_from_nearest_probe():
+    points = np.array([[0, 0], [10, 0], [0, 10]], dtype=float)
+    height_map = HeightMap.fit(points, [1.0, 2.0, 3.0])
+    # (10, 10) 不可达没有探测，取最近的探测值（等距时取第一个）
+    assert height_map.offsets.tolist() == [[1.0, 2.0], [3.0, 2.0]]
+
+
+def test_single_row_and_max_offset():
+    height_map = HeightMap.fit([[0, 5], [100, 5]], [0.0, 1.0])
+    assert height_map.offset([[50, -40], [25, 90]]) == pytest.approx([0.5, 0.25])
+    assert height_map.max_offset([0, 5], [100, 5]) == pytest.approx(1.0)
+    assert height_map.max_offset([20, 5]) == pytest.approx(0.2)
+
+
+def test_round_trip(tmp_path):
+    height_map = HeightMap.fit([[0, 0], [10, 0], [0, 10], [10, 10]], [0.1, 0.2, 0.3, 0.4])
+    height_map.save(tmp_path / 'height_map.json')
+    loaded = HeightMap.load(tmp_path / 'height_map.json')
+    assert loaded.offsets.tolist() == height_map.offsets.tolist()
+    assert loaded.stats == height_map.stats
+    assert HeightMap.load(tmp_path / 'missing.json') is None
+
+
+def test_probe_grid_skips_unreachable_nodes():
+    workspace = Workspace(-100, 100, 0, 200, reach_min=60, reach_max=180)
+    points = probe_grid(workspace, 5, 5)
+    assert 0 < len(points) < 25
+    assert np.all(workspace.in_reach(points))
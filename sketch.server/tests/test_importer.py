@@ -0,0 +1,136 @@
+import asyncio
+import io
+import json
+
+import numpy as np
+import pytest
+
+from importer import batches, parse_path, parse_transform, read_gcode, read_svg, send_file
+
+
+def svg_strokes(body, view_box='0 0 100 100'):
+    text = f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{view_box}">{body}</svg>'
+    width, height, strokes = read_svg(io.BytesIO(text.encode()))
+    return width, height, list(strokes)
+
+
+def gcode_strokes(text, **kwargs):
+    width, height, strokes = read_gcode(io.StringIO(text), **kwargs)
+    return width, height, list(strokes)
+
+
+def test_svg_polyline_and_view_box():
+    width, height, strokes = svg_strokes('<polyline points="15,20 25,20 25,30"/>', '10 10 50 40')
+    assert (width, height) == (50, 40)
+    np.testing.assert_allclose(strokes[0], [[5, 10], [15, 10], [15, 20]])
+
+
+def test_svg_nested_transforms():
+    _, _, strokes = svg_strokes('<g transform="translate(10, 5)"><line x1="0" y1="0" x2="10" y2="0" '
+                                'transform="scale(2)"/></g>')
+    np.testing.assert_allclose(strokes[0], [[10, 5], [30, 5]])
+
+
+def test_svg_hidden_elements_and_descendants_are_skipped():
+    _, _, strokes = svg_strokes(
+        '<defs><line x1="0" y1="0" x2="1" y2="1"/></defs>'
+        '<g display="none"><line x1="0" y1="0" x2="2" y2="2"/><g><line x1="0" y1="0" x2="3" y2="3"/></g></g>'
+        '<line x1="0" y1="0" x2="4" y2="4" display="none"/>'
+        '<line x1="0" y1="0" x2="5" y2="5"/>')
+    assert len(strokes) == 1
+    np.testing.assert_allclose(strokes[0][-1], [5, 5])
+
+
+def test_parse_path_relative_and_close():
+    strokes = list(parse_path('m 10 10 h 20 v 20 z', 0.1, np.eye(3)))
+    np.testing.assert_allclose(strokes[0], [[10, 10], [30, 10], [30, 30], [10, 10]])
+
+
+def test_parse_path_curve_stays_within_tolerance():
+    tolerance = 0.05
+    points = list(parse_path('M 0 0 C 0 50 100 50 100 0', tolerance, np.eye(3)))[0]
+    t = np.linspace(0, 1, 20001)
+    curve = np.stack([300 * t ** 2 - 200 * t ** 3, 150 * t - 150 * t ** 2], axis=1)
+    # 折线各段的中点离曲线不超过容差
+    midpoints = (points[1:] + points[:-1]) / 2
+    distance = np.min(np.hypot(*(midpoints[:, None, :] - curve[None, :, :]).transpose(2, 0, 1)), axis=1)
+    assert distance.max() <= tolerance
+    np.testing.assert_allclose(points[[0, -1]], [[0, 0], [100, 0]])
+
+
+def test_parse_transform_rotate_about_point():
+    m = parse_transform('rotate(90, 10, 10)')
+    np.testing.assert_allclose(m @ [20, 10, 1], [10, 20, 1], atol=1e-9)
+
+
+def test_gcode_pen_by_z_and_screen_coordinates():
+    _, height, strokes = gcode_strokes('G21 G90\nG0 Z5\nG0 X10 Y10\nG1 Z-1\nG1 X20 Y10\nG1 X20 Y20\nG0 Z5\n'
+                                       'G0 X50 Y50\n', width=100, height=100)
+    assert len(strokes) == 1
+    np.testing.assert_allclose(strokes[0], [[10, 90], [20, 90], [20, 80]])
+
+
+def test_gcode_relative_inches_and_arc():
+    _, _, strokes = gcode_strokes('G20 G91\nG0 X1 Y1\nG1 X1\nG90\nG3 X2 Y2 I0 J0.5\n', width=200, height=200)
+    stroke = strokes[0]
+    np.testing.assert_allclose(stroke[:2], [[25.4, 174.6], [50.8, 174.6]])
+    np.testing.assert_allclose(stroke[-1], [50.8, 149.2])
+    # 逆时针的半圆弧在圆心右侧，点到圆心的距离都是半径
+    assert np.all(stroke[1:, 0] >= 50.8 - 1e-9)
+    radius = np.hypot(*(stroke[1:] - [50.8, 161.9]).T)
+    np.testing.assert_allclose(radius, 12.7, atol=0.2)
+
+
+def test_batches_split_long_strokes_end_to_end():
+    stroke = np.stack([np.arange(10.0), np.zeros(10)], axis=1)
+    result = list(batches([stroke, stroke[:3]], max_points=4))
+    assert all(sum(len(line) for line in batch) <= 4 for batch in result)
+    pieces = [line for batch in result for line in batch]
+    # 长折线拆成的各段首尾相接
+    xs = [[p['x'] for p in line] for line in pieces[:3]]
+    assert xs == [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]]
+    assert len(pieces) == 4
+
+
+def test_batches_require_two_points():
+    with pytest.raises(ValueError):
+        list(batches([np.zeros((3, 2))], max_points=1))
+
+
+def test_send_file_counts_only_its_own_jobs(tmp_path, capsys):
+    path = tmp_path / 'lines.svg'
+    path.write_text('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">'
+                    + ''.join(f'<line x1="{i}" y1="0" x2="{i}" y2="50"/>' for i in range(6)) + '</svg>')
+    batches_seen = []
+
+    async def handle(reader, writer):
+        def send(event_type, **data):
+            writer.write((json.dumps({'type': event_type, 'data': data}) + "\n").encode())
+        completed = 0
+        while line := await reader.readline():
+            message = json.loads(line)
+            if message['type'] != 'LINES':
+                continue
+            batches_seen.append(completed)
+            # 其他客户端的任务和不属于任何任务的错误也会广播过来
+            send('JOB_COMPLETE', job_id='other', strokes=1, duration=0)
+            send('ERROR', job_id=None, message="Arm link lost, reconnecting", arm_err=None, sys_err=None)
+            send('ERROR', job_id='other', message="moveL failed", arm_err=1, sys_err=0, fatal=False)
+            await writer.drain()
+            await asyncio.sleep(0.05)
+            job_id = f"job{completed}"
+            send('JOB_ACCEPTED', job_id=job_id, strokes=2, id=message['id'])
+            send('JOB_COMPLETE', job_id=job_id, strokes=2, duration=0)
+            completed += 1
+            await writer.drain()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            await asyncio.wait_for(send_file('127.0.0.1', port, str(path), 'svg', 0.1, None, None, None, 4, 1), 10)
+    asyncio.run(main())
+    # window 为 1：每一批都等上一批自己的任务完成后才发送
+    assert batches_seen == [0, 1, 2]
+    assert capsys.readouterr().out.count('JOB_COMPLETE job') == 3
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from job_control import JobControl, JobStopped
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_stop_raises_at_checkpoint_and_sleep():
+    async def main():
+        control = JobControl()
+        control.stop()
+        with pytest.raises(JobStopped):
+            await control.checkpoint()
+        start = time.perf_counter()
+        with pytest.raises(JobStopped):
+            await control.sleep(5)
+        assert time.perf_counter() - start < 1
+    run(main())
+
+
+def test_pause_waits_for_resume_and_calls_hooks():
+    async def main():
+        control = JobControl()
+        calls = []
+
+        async def on_pause():
+            calls.append('pause')
+
+        async def on_resume():
+            calls.append('resume')
+
+        control.pause()
+        waiter = asyncio.create_task(control.checkpoint(on_pause, on_resume))
+        await asyncio.sleep(0.05)
+        assert not waiter.done() and calls == ['pause']
+        control.resume()
+        await waiter
+        assert calls == ['pause', 'resume']
+    run(main())
+
+
+def test_stop_while_paused():
+    async def main():
+        control = JobControl()
+        control.pause()
+        waiter = asyncio.create_task(control.checkpoint())
+        await asyncio.sleep(0.05)
+        control.stop()
+        with pytest.raises(JobStopped):
+            await waiter
+    run(main())
+
+
+def test_job_scope_keeps_earlier_stop_and_clears_it_afterwards():
+    async def main():
+        control = JobControl()
+        control.stop()
+        with control.job():
+            # 排队时收到的 STOP 对任务有效
+            assert control.stopped
+        assert not control.stopped and not control.paused
+        await control.checkpoint()
+    run(main())
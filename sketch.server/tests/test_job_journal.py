@@ -0,0 +1,74 @@
+from job_journal import JobJournal
+
+LINES = [[{'x': 0, 'y': 0}, {'x': 10, 'y': 5}]]
+
+
+def test_resume_point_and_extensions(tmp_path):
+    journal = JobJournal(tmp_path / 'journal.jsonl')
+    job_id = journal.start_job(LINES, 800, 600, 'draft', pen='black')
+    journal.checkpoint(job_id, 0, 1)
+    journal.extend_job(job_id, LINES, 400, 300, 1)
+    journal.checkpoint(job_id, 2, 3)
+    journal.close()
+
+    # 进程重启后读到最后的断点和并入的线条
+    journal = JobJournal(tmp_path / 'journal.jsonl')
+    job = journal.load_unfinished()
+    assert job['job_id'] == job_id
+    assert (job['line'], job['point'], job['profile'], job['pen']) == (2, 3, 'draft', 'black')
+    assert job['extensions'] == [{'lines': LINES, 'width': 400, 'height': 300, 'line': 1}]
+    journal.close()
+
+
+def test_finish_clears_journal(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = JobJournal(path)
+    for _ in range(3):
+        job_id = journal.start_job(LINES, 800, 600)
+        for i in range(100):
+            journal.checkpoint(job_id, i, 0)
+        journal.finish_job()
+        assert path.stat().st_size == 0
+        assert journal.load_unfinished() is None
+    journal.close()
+
+
+def test_long_job_is_compacted(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = JobJournal(path, compact_every=50)
+    job_id = journal.start_job(LINES, 800, 600)
+    journal.extend_job(job_id, LINES, 800, 600, 0)
+    for i in range(1000):
+        journal.checkpoint(job_id, i, 1)
+    assert len(path.read_text().splitlines()) <= 52
+    job = journal.load_unfinished()
+    assert (job['line'], job['point']) == (999, 1)
+    assert len(job['extensions']) == 1
+    journal.close()
+
+
+def test_resumed_job_is_compacted(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = JobJournal(path, compact_every=50)
+    job_id = journal.start_job(LINES, 800, 600)
+    journal.close()
+
+    journal = JobJournal(path, compact_every=50)
+    assert journal.load_unfinished()['job_id'] == job_id
+    for i in range(500):
+        journal.checkpoint(job_id, i, 0)
+    assert len(path.read_text().splitlines()) <= 51
+    assert journal.load_unfinished()['line'] == 499
+    journal.close()
+
+
+def test_partial_last_line_is_ignored(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = JobJournal(path)
+    job_id = journal.start_job(LINES, 800, 600)
+    journal.checkpoint(job_id, 4, 2)
+    journal.close()
+    with open(path, 'a') as f:
+        f.write('{"op": "checkpoint", "job_id": "')
+    job = JobJournal(path).load_unfinished()
+    assert (job['line'], job['point']) == (4, 2)
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from job_profiler import SCOPE_NOTE, JobProfiler
+from server import MOTION_MODEL
+from sim_arm import SimMyCobot
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_job_writes_reports_and_counts_arm_io(tmp_path, capsys):
+    profiler = JobProfiler(tmp_path / 'profiles', every=2)
+    arm = profiler.wrap(SimMyCobot(MOTION_MODEL, latency=0.01))
+    # 任务之外的调用不计入
+    arm.get_coords()
+    with profiler.job('job1'):
+        busy(20000)
+        data = [bytearray(1000) for _ in range(100)]
+        for _ in range(3):
+            arm.get_coords()
+        arm.send_coords([0, 0, 100, -180, 0, -90], 50, 1)
+        del data
+    # every=2：第二个任务不分析
+    with profiler.job('job2'):
+        arm.get_coords()
+
+    out = tmp_path / 'profiles'
+    assert sorted(p.name for p in out.iterdir()) == ['job1.prof', 'job1.txt', 'summary.jsonl']
+    [summary] = [json.loads(line) for line in (out / 'summary.jsonl').read_text().splitlines()]
+    assert summary['job_id'] == 'job1'
+    assert summary['arm_io']['get_coords']['calls'] == 3 and summary['arm_io']['send_coords']['calls'] == 1
+    assert summary['arm_io_time'] >= 0.03
+    assert summary['wall_time'] >= summary['arm_io_time'] and summary['cpu_time'] > 0
+    assert summary['peak_memory'] >= 100 * 1000
+    report = (out / 'job1.txt').read_text()
+    assert report.startswith(SCOPE_NOTE) and 'busy' in report and 'Top allocations' in report
+    assert 'Job job1 profile' in capsys.readouterr().out
+
+
+def test_job_reports_even_when_the_job_fails(tmp_path):
+    profiler = JobProfiler(tmp_path, memory_frames=0)
+    with pytest.raises(RuntimeError):
+        with profiler.job('failed'):
+            raise RuntimeError('arm lost')
+    assert (tmp_path / 'failed.prof').exists()
+    assert json.loads((tmp_path / 'summary.jsonl').read_text())['peak_memory'] == 0
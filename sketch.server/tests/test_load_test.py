@@ -0,0 +1,43 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import numpy as np
+
+from load_test import SimClient, Stats
+
+
+def reply(request_id):
+    return (json.dumps({'type': 'ESTIMATE', 'data': {}, 'id': request_id}) + "\n").encode()
+
+
+class Writer:
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        pass
+
+
+def test_estimate_rtt_paired_by_id():
+    async def main():
+        stats = Stats()
+        client = SimClient(0, SimpleNamespace(timeout=10, coalesce=0), stats, np.random.default_rng(0))
+        client.writer = Writer()
+        for _ in range(3):
+            await client.send('ESTIMATE', [])
+        # 第 1 个请求超时丢失，之后到达的回复仍然和各自的请求配对
+        client.estimate_sent[1] -= 60
+        client.expire_estimates()
+        client.estimate_sent[2] -= 5
+        reader = asyncio.StreamReader()
+        reader.feed_data(reply(3) + reply(1) + reply(2))
+        reader.feed_eof()
+        await client.listen(reader, False)
+        return stats
+    stats = asyncio.run(main())
+    assert stats.estimates_dropped == 1
+    assert stats.estimates_pending == 0
+    assert len(stats.estimate_rtt) == 2
+    # 第 3 个回复先到，但它的延迟不会被算到发得更早的第 2 个请求上
+    assert stats.estimate_rtt[0] < 1 < stats.estimate_rtt[1]
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from planner import extend_plan, nearest_order, order_strokes, plan_job, prepare_job, simplify_stroke
+
+
+def deviation(points, simplified):
+    """被去掉的点到覆盖它的那一段简化线段所在直线的距离（Douglas-Peucker 的容差定义）"""
+    kept = [int(np.flatnonzero((points == p).all(axis=1))[0]) for p in simplified]
+    dist = np.zeros(len(points))
+    for a, b in zip(kept[:-1], kept[1:]):
+        seg = points[b] - points[a]
+        rel = points[a + 1:b] - points[a]
+        dist[a + 1:b] = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / np.hypot(*seg)
+    return dist
+
+
+def test_simplify_stroke_removes_collinear_points():
+    points = np.array([[0, 0], [1, 0], [2, 0], [3, 0], [3, 1], [3, 2]], dtype=float)
+    assert simplify_stroke(points, 0.01).tolist() == [[0, 0], [3, 0], [3, 2]]
+    assert simplify_stroke(points, 0) is points
+    assert len(simplify_stroke(points[:2], 1.0)) == 2
+
+
+def test_simplify_stroke_stays_within_tolerance():
+    rng = np.random.default_rng(3)
+    points = np.cumsum(rng.normal(0, 1, (500, 2)), axis=0)
+    for tolerance in (0.1, 0.5, 2.0):
+        simplified = simplify_stroke(points, tolerance)
+        assert len(simplified) < len(points)
+        assert np.array_equal(simplified[0], points[0]) and np.array_equal(simplified[-1], points[-1])
+        assert deviation(points, simplified).max() <= tolerance + 1e-9
+
+
+def brute_force_order(strokes, start):
+    """逐条比较所有端点的贪心最近邻，作为网格查找的参照"""
+    used = set()
+    order = []
+    pos = np.asarray(start, dtype=float)
+    for _ in strokes:
+        best = min(((np.sum((s[end] - pos) ** 2), k, end) for k, s in enumerate(strokes) if k not in used
+                    for end in (0, -1)), key=lambda c: c[0])
+        _, k, end = best
+        used.add(k)
+        order.append((k, end == -1))
+        pos = strokes[k][0] if end == -1 else strokes[k][-1]
+    return order
+
+
+@pytest.mark.parametrize('cell', [1.0, 16.0, 500.0])
+def test_nearest_order_matches_brute_force(cell):
+    rng = np.random.default_rng(7)
+    strokes = [np.cumsum(rng.uniform(-20, 20, (rng.integers(2, 6), 2)), axis=0) + rng.uniform(0, 300, 2)
+               for _ in range(60)]
+    assert nearest_order(strokes, cell, (10.0, 10.0)) == brute_force_order(strokes, (10.0, 10.0))
+
+
+def test_order_strokes_reverses_and_keeps_every_stroke():
+    a = np.array([[10.0, 0.0], [0.0, 0.0]])
+    b = np.array([[11.0, 0.0], [20.0, 0.0]])
+    ordered = order_strokes([b, a], cell=4)
+    assert [s.tolist() for s in ordered] == [[[0.0, 0.0], [10.0, 0.0]], [[11.0, 0.0], [20.0, 0.0]]]
+    assert order_strokes([], cell=4) == []
+
+
+def screen_stroke(x, y):
+    return [{'x': x, 'y': y}, {'x': x + 30, 'y': y + 10}, {'x': x + 40, 'y': y + 30}]
+
+
+def test_extend_plan_is_deterministic(workspace, profiles):
+    # 续画时按日志重放 extend，必须得到和绘制时相同的顺序和速度
+    profile = profiles['standard']
+    plan = prepare_job([screen_stroke(100 + 60 * i, 100 + 40 * i) for i in range(6)],
+                       800, 600, workspace, profile)
+    remaining = {'strokes': plan['strokes'][2:], 'speeds': plan['speeds'][2:]}
+    start = plan['strokes'][1][-1]
+    lines = [screen_stroke(500, 100), screen_stroke(120, 400)]
+    first = extend_plan(remaining, start, lines, 800, 600, workspace, profile)
+    second = extend_plan(remaining, start, lines, 800, 600, workspace, profile)
+    assert len(first['strokes']) == len(remaining['strokes']) + 2
+    for key in ('strokes', 'speeds'):
+        assert len(first[key]) == len(second[key])
+        assert all(np.array_equal(x, y) for x, y in zip(first[key], second[key]))
+    assert first['times'] == pytest.approx(second['times'])
+    # 反向绘制的线条第一个点是落笔速度
+    assert all(s[0] == profile.speed_planner.lower_velocity for s in first['speeds'])
+
+
+def travel(strokes, start):
+    ends = np.array([start] + [s[-1] for s in strokes[:-1]])
+    starts = np.array([s[0] for s in strokes])
+    return float(np.sum(np.hypot(*(starts - ends).T)))
+
+
+@pytest.mark.parametrize('pens', [False, True])
+def test_plan_orders_strokes_from_home(workspace, profiles, pens):
+    profile = profiles['standard']
+    home = np.asarray(profile.model.home, dtype=float)
+    rng = np.random.default_rng(4)
+    lines = [screen_stroke(*rng.uniform([50, 50], [700, 500])) for _ in range(20)]
+    client_order, _ = workspace.validate(lines, 800, 600)
+    if pens:
+        lines = [{'pen': 1, 'points': line} for line in lines]
+    strokes = plan_job(lines, 800, 600, workspace, profile, verbose=False, pen=1)['strokes']
+    # 单笔和多笔任务都从离 home 最近的端点开始按最近邻排序
+    ends = np.concatenate([[s[0], s[-1]] for s in strokes])
+    assert np.hypot(*(strokes[0][0] - home)) == pytest.approx(np.min(np.hypot(*(ends - home).T)))
+    assert travel(strokes, home) < travel(client_order, home)
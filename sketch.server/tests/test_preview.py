@@ -0,0 +1,117 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from preview import (BACKGROUND, OUTLINE_COLOR, PEN_COLOR, TRAVEL_COLOR, encode_png, rasterize, render,
+                     stroke_segments)
+from workspace import Workspace
+
+
+def pixels(mask):
+    return {(int(x), int(y)) for y, x in zip(*np.nonzero(mask))}
+
+
+def test_rasterize_lines_and_points():
+    mask = rasterize([[1, 2], [3, 0], [6, 6], [2, 5]], [[8, 2], [3, 4], [6, 6], [5, 8]], (10, 10))
+    horizontal = {(x, 2) for x in range(1, 9)}
+    vertical = {(3, y) for y in range(0, 5)}
+    # 对角线每一步行列各走一格
+    diagonal = {(2 + i, 5 + i) for i in range(4)}
+    # 长度为 0 的线段画一个点
+    assert pixels(mask) == horizontal | vertical | diagonal | {(6, 6)}
+    assert not rasterize(np.empty((0, 2)), np.empty((0, 2)), (10, 10)).any()
+
+
+def test_rasterize_steep_line_is_connected_and_clipped():
+    mask = rasterize([[2, -5]], [[5, 14]], (10, 8))
+    # 每行一个像素，图像外的部分被丢掉
+    assert np.all(mask.sum(axis=1) == 1)
+    cols = np.argmax(mask, axis=1)
+    assert np.all(np.abs(np.diff(cols)) <= 1)
+    assert mask[0, 3] and mask[9, 4]
+
+
+@pytest.mark.parametrize('width', [2, 3, 4])
+def test_line_width_dilates_around_the_line(width):
+    shape = (12, 12)
+    thin = rasterize([[6, 6]], [[6, 6]], shape)
+    thick = rasterize([[6, 6]], [[6, 6]], shape, line_width=width)
+    # 一个点加粗成 width x width 的方块，偶数线宽偏向左上
+    low = 6 - width // 2
+    assert pixels(thick) == {(x, y) for x in range(low, low + width) for y in range(low, low + width)}
+    assert np.all(thick >= thin)
+
+
+def test_line_width_at_image_border():
+    shape = (6, 6)
+    mask = rasterize([[0, 0], [5, 5]], [[0, 0], [5, 5]], shape, line_width=3)
+    # 平移时越过边界的部分被切掉，不会绕到对侧
+    assert pixels(mask) == {(0, 0), (1, 0), (0, 1), (1, 1), (4, 4), (5, 4), (4, 5), (5, 5)}
+
+
+def test_stroke_segments():
+    starts, ends, travel_starts, travel_ends = stroke_segments([[[0, 0], [1, 0], [1, 1]], [], [[5, 5]], [[2, 2], [3, 3]]])
+    assert starts.tolist() == [[0, 0], [1, 0], [2, 2]] and ends.tolist() == [[1, 0], [1, 1], [3, 3]]
+    assert travel_starts.tolist() == [[1, 1], [5, 5]] and travel_ends.tolist() == [[5, 5], [2, 2]]
+    assert all(len(part) == 0 for part in stroke_segments([]))
+
+
+@pytest.fixture
+def workspace():
+    # size=101 时 1 毫米对应 1 像素，图像为 51 行 x 101 列
+    return Workspace(0, 100, 0, 50)
+
+
+def colors(image):
+    return {tuple(int(c) for c in pixel) for pixel in image.reshape(-1, 3)}
+
+
+def test_render_maps_workspace_to_image(workspace):
+    strokes = [np.array([[10, 40], [30, 40]]), np.array([[60, 10], [60, 20]])]
+    image, stats = render(strokes, workspace, size=101)
+    assert image.shape == (51, 101, 3) and image.dtype == np.uint8
+    assert (stats['width'], stats['height']) == (101, 51)
+    assert stats['strokes'] == 2 and stats['segments'] == 2
+    assert stats['draw_length'] == pytest.approx(30)
+    assert stats['travel_length'] == pytest.approx(np.hypot(30, 30))
+    # 机械臂 y 向上，图像行向下
+    pen = np.all(image == PEN_COLOR, axis=2)
+    assert pixels(pen) == {(x, 10) for x in range(10, 31)} | {(60, y) for y in range(30, 41)}
+    # 边框和背景，不画抬笔移动
+    assert tuple(image[0, 50]) == OUTLINE_COLOR and tuple(image[25, -1]) == OUTLINE_COLOR
+    assert tuple(image[25, 50]) == BACKGROUND
+    assert colors(image) == {BACKGROUND, OUTLINE_COLOR, PEN_COLOR}
+
+
+def test_render_travel_overlay_under_pen(workspace):
+    strokes = [np.array([[10, 25], [20, 25]]), np.array([[40, 25], [50, 25], [50, 35]]),
+               np.array([[20, 30], [25, 30]])]
+    image, stats = render(strokes, workspace, size=101, travel=True)
+    travel = np.all(image == TRAVEL_COLOR, axis=2)
+    pen = np.all(image == PEN_COLOR, axis=2)
+    # (20,25)->(40,25)：端点被落笔线条覆盖，只剩中间
+    assert {(x, 25) for x in range(21, 40)} <= pixels(travel)
+    assert not travel[25, 20] and pen[25, 20] and not travel[25, 40] and pen[25, 40]
+    # (50,35)->(20,30) 斜着回去
+    assert travel[16:20, 35].sum() == 1 and travel[18, 32] and travel[19, 26]
+    assert stats['travel_length'] == pytest.approx(20 + np.hypot(30, 5))
+    plain, _ = render(strokes, workspace, size=101)
+    assert not np.all(plain == TRAVEL_COLOR, axis=2).any()
+    assert np.array_equal(np.all(plain == PEN_COLOR, axis=2), pen)
+
+
+def test_render_scale_and_line_width(workspace):
+    strokes = [np.array([[0, 25], [100, 25]])]
+    image, _ = render(strokes, workspace, size=201, line_width=3)
+    # 长边 201 像素：2 像素每毫米
+    assert image.shape[:2] == (101, 201)
+    pen = np.all(image == PEN_COLOR, axis=2)
+    assert np.all(pen[49:52, :]) and not pen[48].any() and not pen[52].any()
+
+
+def test_encode_png_round_trip(workspace):
+    image, _ = render([np.array([[10, 10], [90, 40]])], workspace, size=101)
+    decoded = np.asarray(Image.open(io.BytesIO(encode_png(image))))
+    assert np.array_equal(decoded, image)
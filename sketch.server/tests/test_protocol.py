@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+import importer
+
+SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="200" height="150" viewBox="0 0 200 150">
+<path d="M10 10 L60 10 L60 40 L90 40 L90 70 L120 70"/>
+<path d="M20 100 L40 120 L60 100 L80 120 L100 100"/>
+<polyline points="150,20 170,40 150,60 170,80"/>
+</svg>
+"""
+
+
+def stroke(x, y):
+    return [{'x': x, 'y': y}, {'x': x + 30, 'y': y + 10}, {'x': x + 40, 'y': y + 30}]
+
+
+def test_lines_job_completes(sim_server):
+    client = sim_server.connect()
+    client.send('RESET', {'width': 800, 'height': 600, 'profile': 'draft'})
+    client.send('LINES', [stroke(100, 100), stroke(300, 200)], profile='draft')
+    events = client.wait_for('JOB_COMPLETE', 'ERROR')
+    assert events[-1]['type'] == 'JOB_COMPLETE'
+    assert [e['type'] for e in events].count('JOB_ACCEPTED') == 1
+    assert events[-1]['data']['strokes'] == 2
+    client.close()
+
+
+@pytest.mark.parametrize('window', [1, 2])
+def test_multi_batch_import(sim_server, tmp_path, capsys, window):
+    # 每批 8 个点：文件被拆成 3 批，连续发送的消息不能粘在一起丢失
+    path = tmp_path / 't.svg'
+    path.write_text(SVG)
+    asyncio.run(asyncio.wait_for(importer.send_file('127.0.0.1', sim_server.port, str(path), 'svg', 0.1,
+                                                    None, None, 'draft', 8, window), 120))
+    output = capsys.readouterr().out
+    assert output.count('Sent batch') == 3
+    assert output.count('JOB_COMPLETE') == 3
+
+
+def test_live_lines_merge_into_owners_job(sim_server):
+    client = sim_server.connect()
+    other = sim_server.connect()
+    client.send('RESET', {'width': 800, 'height': 600})
+    client.send('LINES', [stroke(100 + i * 100, 100) for i in range(4)], profile='draft', live=True)
+    client.wait_for('PROGRESS')
+    # 同一客户端的 live LINES 并入正在绘制的任务，其他客户端的作为新任务排队
+    client.send('LINES', [stroke(150, 300), stroke(350, 300)], profile='draft', live=True)
+    other.send('LINES', [stroke(500, 400)], profile='draft', live=True)
+
+    events = []
+    while [e['type'] for e in events].count('JOB_COMPLETE') < 3:
+        events.append(client.next_event())
+    merged = [e for e in events if e['data'].get('merged')]
+    assert [e['type'] for e in merged] == ['JOB_ACCEPTED', 'JOB_COMPLETE']
+    assert merged[0]['data']['strokes'] == 2
+    extended = [e for e in events if e['type'] == 'JOB_EXTENDED']
+    assert len(extended) == 1 and extended[0]['data']['strokes'] == 6
+    complete = [e for e in events if e['type'] == 'JOB_COMPLETE' and not e['data'].get('merged')]
+    assert [e['data']['strokes'] for e in complete] == [6, 1]
+    assert merged[0]['data']['job_id'] == complete[0]['data']['job_id']
+    client.close()
+    other.close()
+
+
+def test_stop_while_planning_cancels_job(sim_server):
+    client = sim_server.connect()
+    client.send('STOP')
+    client.send_many([
+        {'type': 'RESET', 'data': {'width': 800, 'height': 600}},
+        {'type': 'LINES', 'data': [stroke(100, 100), stroke(300, 200)], 'profile': 'draft'},
+        {'type': 'STOP', 'data': None},
+        {'type': 'LINES', 'data': [stroke(200, 300)], 'profile': 'draft'}
+    ])
+    # 第一个任务在规划时就被停止，没有空闲时的 STOP 影响，下一个任务正常完成
+    events = client.wait_for('JOB_COMPLETE', 'ERROR')
+    types = [e['type'] for e in events]
+    assert types[0] == 'JOB_STOPPED'
+    assert types.count('JOB_ACCEPTED') == 1
+    assert events[-1]['type'] == 'JOB_COMPLETE' and events[-1]['data']['strokes'] == 1
+    client.close()
+
+
+def test_pause_while_queued_holds_job(sim_server):
+    client = sim_server.connect()
+    client.send_many([
+        {'type': 'RESET', 'data': {'width': 800, 'height': 600}},
+        {'type': 'LINES', 'data': [stroke(100, 100)], 'profile': 'draft'},
+        {'type': 'PAUSE', 'data': None}
+    ])
+    events = client.wait_for('JOB_PAUSED')
+    assert 'PROGRESS' not in [e['type'] for e in events]
+    client.send('RESUME')
+    assert client.wait_for('JOB_COMPLETE', 'ERROR')[-1]['type'] == 'JOB_COMPLETE'
+    client.close()
+
+
+def test_estimate_replies_echo_request_id(sim_server):
+    client = sim_server.connect()
+    client.send('RESET', {'width': 800, 'height': 600})
+    client.send_many([{'type': 'ESTIMATE', 'data': [stroke(100, 100)], 'id': 7},
+                      {'type': 'ESTIMATE', 'data': [stroke(300, 200)], 'id': 8}])
+    replies = [client.wait_for('ESTIMATE')[-1] for _ in range(2)]
+    assert [r['id'] for r in replies] == [7, 8]
+    client.close()
+
+
+def test_preview_size_is_clamped_and_bad_requests_get_error(sim_server):
+    client = sim_server.connect()
+    client.send('RESET', {'width': 800, 'height': 600})
+    client.send('PREVIEW', [stroke(100, 100)], size=100000, line_width=10000)
+    preview = client.wait_for('PREVIEW')[-1]['data']
+    assert max(preview['width'], preview['height']) == 4096
+    # 格式错误的请求只回复 ERROR，连接仍然可用
+    client.send('ESTIMATE', [[{'y': 1}]], id=3)
+    error = client.wait_for('ERROR', 'ESTIMATE')[-1]
+    assert error['type'] == 'ERROR' and error['id'] == 3
+    client.send('PREVIEW', [stroke(100, 100)], size='big')
+    assert client.wait_for('ERROR', 'PREVIEW')[-1]['type'] == 'ERROR'
+    client.send('ESTIMATE', [stroke(100, 100)], id=4)
+    assert client.wait_for('ESTIMATE')[-1]['id'] == 4
+    client.close()
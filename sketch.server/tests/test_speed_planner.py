@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from speed_planner import SpeedPlanner, junction_speeds
+
+
+def test_junction_speeds_by_corner_angle():
+    a, accuracy = 800.0, 0.1
+    directions = np.array([[1, 0], [1, 0], [0, 1], [0, -1]], dtype=float)
+    straight, right_angle, reversal = junction_speeds(directions, a, accuracy)
+    assert straight == np.inf
+    sin_half = np.sqrt(0.5)
+    assert right_angle == pytest.approx(np.sqrt(a * accuracy * sin_half / (1 - sin_half)))
+    assert reversal == 0
+
+    # 拐角越急速度越低
+    angles = np.linspace(0, np.pi * 0.99, 50)
+    turns = np.stack([np.ones_like(angles), np.zeros_like(angles),
+                      np.cos(angles), np.sin(angles)], axis=1).reshape(-1, 2, 2)
+    speeds = [junction_speeds(t, a, accuracy)[0] for t in turns]
+    assert np.all(np.diff(speeds[1:]) < 0)
+
+
+def planner(**overrides):
+    options = dict(max_speed=200.0, max_accel=800.0, accuracy=0.1,
+                   min_velocity=10, max_velocity=80, lower_velocity=20)
+    options.update(overrides)
+    return SpeedPlanner(**options)
+
+
+def test_plan_limits_short_segments_and_corners():
+    p = planner()
+    # 长直线段达到速度上限，拐角两侧的线段被限速
+    stroke = np.array([[0, 0], [100, 0], [200, 0], [200, 100], [200, 200]], dtype=float)
+    v = p.plan(stroke)
+    assert v[0] == 20
+    assert v[1] == 80
+    assert v[2] < 80 and v[3] < 80
+    assert v[2] == v[3]
+
+    # 很短的线段受长度限制，但不低于 min_velocity
+    short = np.array([[0, 0], [0.01, 0], [0.02, 0]], dtype=float)
+    assert np.all(p.plan(short)[1:] == 10)
+
+
+def test_plan_single_point_and_repeated_points():
+    p = planner()
+    assert list(p.plan([[5, 5]])) == [20]
+    v = p.plan([[0, 0], [0, 0], [50, 0]])
+    assert len(v) == 3 and np.all(np.isfinite(v))
+    assert np.all((v[1:] >= 10) & (v[1:] <= 80))
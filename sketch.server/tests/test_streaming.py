@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from server import MOTION_MODEL
+from sim_arm import SimMyCobot
+from streaming import Trajectory, stream
+
+SPEED, ACCEL = 100.0, 500.0
+POINTS = np.array([[0, 0], [40, 0], [40, 0], [40, 30], [10, 50]], dtype=float)
+
+
+def test_trajectory_respects_limits_and_ends_at_rest():
+    trajectory = Trajectory(POINTS, SPEED, ACCEL, 0.5)
+    # 重复点被去掉，index 指向原始点
+    assert trajectory.index.tolist() == [0, 1, 3, 4]
+    times = np.linspace(0, trajectory.duration, 2000)
+    positions, speeds, points = trajectory.sample(times)
+    assert np.allclose(positions[0], POINTS[0]) and np.allclose(positions[-1], POINTS[-1])
+    assert speeds[0] == 0 and speeds[-1] == pytest.approx(0, abs=1e-9)
+    assert np.all(speeds <= SPEED + 1e-9)
+    assert np.all(np.diff(speeds) <= ACCEL * np.diff(times) + 1e-6)
+    assert np.all(np.diff(points) >= 0)
+    # 相邻采样点的距离不超过这段时间内以采样速度能走的距离
+    steps = np.hypot(*np.diff(positions, axis=0).T)
+    assert np.all(steps <= SPEED * np.diff(times) + 1e-6)
+    length = np.sum(np.hypot(*np.diff(POINTS, axis=0).T))
+    assert np.sum(steps) == pytest.approx(length, rel=1e-3)
+    assert trajectory.duration > length / SPEED
+
+
+def test_single_point_trajectory():
+    trajectory = Trajectory([[5, 5], [5, 5]], SPEED, ACCEL, 0.5)
+    assert trajectory.duration == 0
+    positions, speeds, points = trajectory.sample([0.0, 1.0])
+    assert positions.tolist() == [[5, 5], [5, 5]] and speeds.tolist() == [0, 0] and points.tolist() == [0, 0]
+
+
+def run_stream(rate, should_stop=lambda: False):
+    trajectory = Trajectory(POINTS, SPEED, ACCEL, 0.5)
+    sent, passed = [], []
+    result = stream(trajectory, lambda p, v: sent.append((time.perf_counter(), p.copy(), v)), rate,
+                    should_stop, passed.append)
+    return trajectory, sent, passed, result
+
+
+def test_stream_spacing_rate_and_endpoint():
+    rate = 50
+    trajectory, sent, passed, result = run_stream(rate)
+    assert result['completed']
+    # 每个周期一个设定点，最后一个是终点
+    assert len(sent) == int(np.ceil(trajectory.duration * rate)) + 1
+    assert np.allclose(sent[-1][1], POINTS[-1]) and np.allclose(result['position'], POINTS[-1])
+    stamps = np.array([s[0] for s in sent])
+    assert stamps[-1] - stamps[0] == pytest.approx(trajectory.duration, abs=0.05)
+    assert np.median(np.diff(stamps[:-1])) == pytest.approx(1 / rate, abs=0.005)
+    # 设定点间距不超过最高速度一个周期走过的距离
+    positions = np.array([s[1] for s in sent])
+    assert np.all(np.hypot(*np.diff(positions, axis=0).T) <= SPEED / rate + 1e-6)
+    # 经过的原始点按顺序报告，最后是终点
+    assert passed == sorted(passed) and passed[-1] == len(POINTS) - 1
+    assert result['point'] == len(POINTS) - 1
+
+
+def test_stream_stops_when_asked():
+    calls = []
+
+    def should_stop():
+        calls.append(None)
+        return len(calls) > 10
+    trajectory, sent, passed, result = run_stream(50, should_stop)
+    assert not result['completed']
+    assert len(sent) == 10
+    # 返回停下时最后发送的位置，用来抬笔和之后续画
+    assert np.allclose(result['position'], sent[-1][1])
+    assert result['time'] < trajectory.duration
+    assert result['point'] < len(POINTS) - 1
+
+
+def test_sim_arm_follows_streamed_setpoints():
+    arm = SimMyCobot(MOTION_MODEL, latency=0.0)
+    arm.set_fresh_mode(1)
+    trajectory = Trajectory(POINTS + MOTION_MODEL['home'], SPEED, ACCEL, 0.5)
+
+    def send(position, speed):
+        velocity = int(np.clip(speed / MOTION_MODEL['max_speed'] * 100, 5, 100))
+        arm.send_coords([float(position[0]), float(position[1]), 100.0, -180, 0, -90], velocity, 1)
+
+    result = stream(trajectory, send, 20, lambda: False)
+    assert result['completed'] and result['overruns'] == 0
+    # 最后一个设定点速度接近 0，按最低速度走完剩下的一小段
+    deadline = time.time() + 10
+    while time.time() < deadline and not np.allclose(arm.get_coords()[:2], POINTS[-1] + MOTION_MODEL['home'],
+                                                      atol=0.1):
+        time.sleep(0.05)
+    assert np.allclose(arm.get_coords()[:2], POINTS[-1] + MOTION_MODEL['home'], atol=0.1)
+
+
+def long_stroke():
+    return [{'x': 100 + 5 * i, 'y': 300 + (i % 2) * 40} for i in range(50)]
+
+
+@pytest.mark.parametrize('backend', ['mycobot'], indirect=True)
+def test_streamed_job_pauses_and_resumes(local_server):
+    server = local_server
+    lines = [long_stroke()]
+
+    async def main():
+        job_id = server.journal.start_job(lines, 800, 600, 'draft')
+        job = asyncio.create_task(server.draw_lines(job_id, lines, 800, 600, 'draft'))
+        while 'JOB_ACCEPTED' not in [e['type'] for e in server.events]:
+            await asyncio.sleep(0.05)
+        # 接近和落笔之后再流式绘制一段
+        await asyncio.sleep(3.0)
+        server.control.pause()
+        while 'JOB_PAUSED' not in [e['type'] for e in server.events]:
+            await asyncio.sleep(0.05)
+        # 抬笔之后，暂停期间不再发送设定点
+        sent = []
+        send_coords = server.mc.send_coords
+        server.mc.send_coords = lambda *args: sent.append(args)
+        await asyncio.sleep(1.0)
+        server.mc.send_coords = send_coords
+        assert sent == []
+        checkpoint = server.journal.load_unfinished()
+        server.control.resume()
+        return await asyncio.wait_for(job, 60), checkpoint
+    completed, checkpoint = asyncio.run(main())
+    assert completed
+    types = [e['type'] for e in server.events]
+    assert types.index('JOB_PAUSED') < types.index('JOB_RESUMED') < types.index('JOB_COMPLETE')
+    # 暂停时断点停在线条中间，之后从那里继续画完
+    assert 0 < checkpoint['point'] < len(lines[0]) - 1
+    assert server.journal.load_unfinished() is None
+
+
+@pytest.mark.parametrize('backend', ['mycobot'], indirect=True)
+def test_streamed_job_stops(local_server):
+    server = local_server
+    lines = [long_stroke()]
+
+    async def main():
+        job_id = server.journal.start_job(lines, 800, 600, 'draft')
+        job = asyncio.create_task(server.draw_lines(job_id, lines, 800, 600, 'draft'))
+        while 'JOB_ACCEPTED' not in [e['type'] for e in server.events]:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(1.5)
+        start = time.perf_counter()
+        server.control.stop()
+        return await asyncio.wait_for(job, 10), time.perf_counter() - start
+    completed, latency = asyncio.run(main())
+    assert not completed and latency < 1.0
+    assert server.events[-1]['type'] == 'JOB_STOPPED'
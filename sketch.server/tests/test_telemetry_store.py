@@ -0,0 +1,92 @@
+import sqlite3
+import time
+from contextlib import closing
+
+import pytest
+
+from telemetry_store import TelemetryStore, connect, query_jobs, query_positions, query_trend
+
+
+@pytest.fixture
+def db(tmp_path):
+    return tmp_path / 'telemetry.db'
+
+
+def test_schema_is_created(db):
+    TelemetryStore(db).close()
+    with closing(sqlite3.connect(db)) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(points)")]
+    assert tables == {'sessions', 'jobs', 'points'}
+    assert {'jobs_started', 'jobs_session', 'points_job_stroke', 'points_t'} <= indexes
+    assert columns == ['job_id', 'stroke', 'point', 't', 'target_x', 'target_y',
+                       'command_x', 'command_y', 'actual_x', 'actual_y', 'error']
+    # 重复打开不会出错
+    connect(db).close()
+
+
+def test_job_round_trip_and_resume(db):
+    store = TelemetryStore(db)
+    store.start_session('s1', 'mycobot')
+    store.start_job('job1', 's1', 'draft', 3)
+    store.record_point('job1', 0, 0, (1, 2), (1.5, 2.5), (1.1, 2.0), 0.1)
+    store.record_point('job1', 0, 1, (3, 4), (3.5, 4.5), (3.0, 4.3), 0.3)
+    store.finish_job('job1', 'stopped', 2, 1.5)
+    assert store.flush()
+    # 续画：保留开始时间，点数和绘图时间累加
+    started = query_jobs(db)[0]['started']
+    store.start_job('job1', 's1', 'draft', 3)
+    store.finish_job('job1', 'complete', 4, 0.5)
+    store.close()
+
+    [job] = query_jobs(db)
+    assert job['job_id'] == 'job1' and job['profile'] == 'draft' and job['strokes'] == 3
+    assert job['status'] == 'complete' and job['started'] == started
+    assert job['points'] == 6 and job['drawing_time'] == pytest.approx(2.0)
+    assert job['mean_error'] == pytest.approx(0.2) and job['max_error'] == pytest.approx(0.3)
+    assert query_positions(db) == [(1.5, 2.5, 1.1, 2.0), (3.5, 4.5, 3.0, 4.3)]
+    with closing(sqlite3.connect(db)) as conn:
+        assert conn.execute("SELECT session_id, backend FROM sessions").fetchall() == [('s1', 'mycobot')]
+
+
+def test_close_flushes_pending_writes(db):
+    # 批次和超时都很大：数据只会在 close 时写入
+    store = TelemetryStore(db, batch_size=10000, flush_interval=60)
+    store.start_job('job1', 's1', 'fine', 1)
+    for i in range(500):
+        store.record_point('job1', 0, i, (i, 0), (i, 0), (i, 0.5), 0.5)
+    assert query_positions(db) == []
+    store.close()
+    assert not store._thread.is_alive()
+    assert len(query_positions(db)) == 500
+    assert query_jobs(db)[0]['status'] == 'running'
+
+
+def test_query_filters_and_trend(db):
+    store = TelemetryStore(db)
+    store.start_job('new', 's1', 'draft', 1)
+    store.record_point('new', 0, 0, (0, 0), (0, 0), (0, 1), 1.0)
+    store.finish_job('new', 'complete', 120, 60.0)
+    store.close()
+    # 一个 10 天前的旧任务
+    old = time.time() - 10 * 86400
+    with closing(connect(db)) as conn:
+        conn.execute("INSERT INTO jobs (job_id, started, status, points, drawing_time) VALUES ('old', ?, 'complete', 10, 10)",
+                     (old,))
+        conn.execute("INSERT INTO points (job_id, t, command_x, command_y, actual_x, actual_y, error) "
+                     "VALUES ('old', ?, 5, 5, 5, 8, 3.0)", (old,))
+        conn.commit()
+
+    assert [job['job_id'] for job in query_jobs(db)] == ['new', 'old']
+    assert [job['job_id'] for job in query_jobs(db, since_days=1)] == ['new']
+    assert query_jobs(db, limit=1)[0]['job_id'] == 'new'
+    assert query_positions(db, since_days=1) == [(0, 0, 0, 1)]
+    assert len(query_positions(db)) == 2
+
+    [today] = query_trend(db, since_days=1)
+    assert today['jobs'] == 1 and today['points'] == 120 and today['points_per_minute'] == pytest.approx(120)
+    assert today['samples'] == 1 and today['mean_error'] == pytest.approx(1.0)
+    trend = query_trend(db, since_days=30)
+    assert len(trend) == 2 and [row['period'] for row in trend] == sorted(row['period'] for row in trend)
+    assert trend[0]['max_error'] == pytest.approx(3.0)
@@ -0,0 +1,66 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from vectorize import otsu_threshold, thin, trace, vectorize
+
+
+def test_otsu_separates_two_modes():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.normal(0.2, 0.05, 3000), rng.normal(0.75, 0.05, 1000)])
+    assert 0.3 < otsu_threshold(values) < 0.6
+
+
+def test_thin_reduces_bar_to_single_pixel_line():
+    mask = np.zeros((30, 60), dtype=bool)
+    mask[10:17, 5:55] = True
+    skeleton = thin(mask)
+    assert skeleton.any() and np.all(skeleton <= mask)
+    columns = skeleton[:, 10:50]
+    # 骨架每一列只有一个像素，并且在笔画中间
+    assert np.all(columns.sum(axis=0) == 1)
+    assert np.all(np.abs(np.argmax(columns, axis=0) - 13) <= 1)
+    assert np.array_equal(thin(skeleton), skeleton)
+
+
+def test_trace_splits_skeleton_at_junctions():
+    skeleton = np.zeros((20, 20), dtype=bool)
+    skeleton[10, 2:18] = True
+    skeleton[2:10, 10] = True
+    paths = trace(skeleton)
+    # T 形：分叉点连出三条折线，覆盖所有像素
+    assert len(paths) == 3
+    pixels = {(int(x), int(y)) for path in paths for x, y in path}
+    assert pixels == {(int(x), int(y)) for y, x in zip(*np.nonzero(skeleton))}
+
+
+def png(draw):
+    image = Image.new('L', (200, 120), 255)
+    draw(ImageDraw.Draw(image))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_rectangle_outline_becomes_one_closed_stroke():
+    data = png(lambda d: d.rectangle([30, 20, 170, 100], outline=0, width=4))
+    result = vectorize(data, mode='lines')
+    assert result['mode'] == 'lines' and (result['width'], result['height']) == (200, 120)
+    assert result['strokes'] == 1
+    stroke = np.array([[p['x'], p['y']] for p in result['lines'][0]])
+    assert np.hypot(*(stroke[0] - stroke[-1])) <= 2
+    assert np.allclose(stroke.min(axis=0), [32, 22], atol=2) and np.allclose(stroke.max(axis=0), [168, 98], atol=2)
+
+
+@pytest.mark.parametrize('tile', [32, 50])
+def test_tiles_are_stitched_back_together(tile):
+    data = png(lambda d: (d.line([10, 60, 190, 60], fill=0, width=3), d.ellipse([60, 10, 140, 110], outline=0, width=3)))
+    whole = vectorize(data, mode='lines', tile=256)
+    tiled = vectorize(data, mode='lines', tile=tile)
+    assert tiled['strokes'] == whole['strokes']
+
+    def length(result):
+        return sum(np.sum(np.hypot(*np.diff([[p['x'], p['y']] for p in line], axis=0).T)) for line in result['lines'])
+    assert length(tiled) == pytest.approx(length(whole), rel=0.05)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from workspace import Workspace
+
+
+def length(strokes):
+    return sum(np.hypot(*np.diff(s, axis=0).T).sum() for s in strokes if len(s) > 1)
+
+
+@pytest.fixture
+def box():
+    return Workspace(0, 100, 0, 100)
+
+
+def test_inside_stroke_is_unchanged(box):
+    stroke = np.array([[10, 10], [50, 20], [90, 90]], dtype=float)
+    kept, removed = box.clip_strokes([stroke])
+    assert len(kept) == 1 and not removed
+    assert np.allclose(kept[0], stroke)
+
+
+def test_crossing_stroke_is_split_at_boundary(box):
+    # 从框内穿出再回到框内：切成两段，框外的部分被去掉
+    stroke = np.array([[50, 50], [150, 50], [150, 80], [50, 80]], dtype=float)
+    kept, removed = box.clip_strokes([stroke])
+    assert [k.tolist() for k in kept] == [[[50, 50], [100, 50]], [[100, 80], [50, 80]]]
+    assert len(removed) == 1
+    assert length(kept) + length(removed) == pytest.approx(length([stroke]))
+
+
+def test_outside_stroke_and_taps(box):
+    kept, removed = box.clip_strokes([np.array([[200, 200], [300, 200]]), [[5, 5]], [[-5, 5]], []])
+    assert [k.tolist() for k in kept] == [[[5, 5]]]
+    assert len(removed) == 2
+    assert box.clip_strokes([]) == ([], [])
+
+
+def test_repeated_points_keep_stroke_connected(box):
+    stroke = np.array([[10, 10], [10, 10], [20, 10], [20, 10], [30, 10]], dtype=float)
+    kept, removed = box.clip_strokes([stroke])
+    assert len(kept) == 1 and not removed
+    assert kept[0][0].tolist() == [10, 10] and kept[0][-1].tolist() == [30, 10]
+
+
+def test_clip_to_reach_ring():
+    ring = Workspace(-200, 200, -200, 200, reach_min=50, reach_max=150)
+    stroke = np.array([[-180, 0], [180, 0]], dtype=float)
+    kept, removed = ring.clip_strokes([stroke])
+    # 穿过内圈和外圈：只保留两侧的环形部分
+    assert len(kept) == 2
+    assert np.allclose(kept[0], [[-150, 0], [-50, 0]]) and np.allclose(kept[1], [[50, 0], [150, 0]])
+    assert length(kept) + length(removed) == pytest.approx(360)
+    assert np.all(ring.contains(np.concatenate(kept)))
+
+
+def test_random_strokes_stay_inside_and_keep_length():
+    ring = Workspace(-100, 100, 20, 180, reach_min=40, reach_max=160)
+    rng = np.random.default_rng(11)
+    strokes = [np.cumsum(rng.normal(0, 15, (30, 2)), axis=0) + [0, 100] for _ in range(40)]
+    kept, removed = ring.clip_strokes(strokes)
+    assert np.all(ring.contains(np.concatenate(kept)))
+    assert length(kept) + length(removed) == pytest.approx(length(strokes))
@@ -0,0 +1,427 @@
+import argparse
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from planner import order_strokes, simplify_stroke
+
+# IMAGE 消息中允许客户端设置的参数
+OPTIONS = ('mode', 'max_size', 'threshold', 'edge_percentile', 'blur', 'min_length', 'tolerance', 'tile')
+
+# 8 邻域偏移 (dy, dx)，前 4 个是上下左右
+OFFSETS = [(-1, 0), (0, 1), (1, 0), (0, -1), (-1, 1), (1, 1), (1, -1), (-1, -1)]
+
+# 分块细化的重叠边距（像素），笔画宽度不超过它的两倍时结果与整图细化一致
+TILE_MARGIN = 16
+
+
+def load_image(data, max_size):
+    """
+    解码图片并转为灰度，长边超过 max_size 时等比缩小
+
+    Args:
+        data (bytes): PNG/JPEG 等图片文件内容
+        max_size (int): 长边的最大像素数
+
+    Returns:
+        ndarray: (H, W) float32 灰度，0 为黑、1 为白
+    """
+    image = Image.open(io.BytesIO(data))
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # 透明区域按白纸处理
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    image = image.convert('L')
+    scale = max_size / max(image.size)
+    if scale < 1:
+        image = image.resize((max(int(image.width * scale), 1), max(int(image.height * scale), 1)),
+                             Image.LANCZOS)
+    return np.asarray(image, dtype=np.float32) / 255.0
+
+
+def otsu_threshold(values, bins=256):
+    """Otsu 法求使类间方差最大的阈值"""
+    hist, edges = np.histogram(values, bins=bins)
+    hist = hist.astype(float)
+    centers = (edges[:-1] + edges[1:]) / 2
+    w0 = np.cumsum(hist)
+    w1 = w0[-1] - w0
+    m0 = np.cumsum(hist * centers)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu0 = m0 / w0
+        mu1 = (m0[-1] - m0) / w1
+        between = w0 * w1 * (mu0 - mu1) ** 2
+    return float(centers[np.nanargmax(between)])
+
+
+def gaussian_blur(gray, sigma):
+    """可分离的高斯模糊，边缘按镜像延拓"""
+    if sigma <= 0:
+        return gray
+    radius = max(int(3 * sigma), 1)
+    kernel = np.exp(-np.arange(-radius, radius + 1) ** 2 / (2 * sigma ** 2))
+    kernel /= kernel.sum()
+    padded = np.pad(gray, radius, mode='reflect')
+    rows = sum(k * padded[:, i:i + gray.shape[1]] for i, k in enumerate(kernel))
+    return sum(k * rows[i:i + gray.shape[0], :] for i, k in enumerate(kernel))
+
+
+def is_line_art(gray):
+    """灰度集中在接近黑和接近白两端时认为是线稿，否则按照片处理"""
+    return float(np.mean((gray < 0.2) | (gray > 0.8))) > 0.9
+
+
+def binarize(gray, mode='auto', threshold=None, edge_percentile=90, blur=1.0):
+    """
+    把灰度图转成需要画出来的像素
+
+    lines 模式（线稿）：比阈值暗的像素；edges 模式（照片）：梯度幅值最大的那部分像素。
+
+    Args:
+        gray (ndarray): (H, W) 灰度
+        mode (str): 'lines'、'edges' 或 'auto'
+        threshold (float|None): lines 模式的灰度阈值，为None时用 Otsu 法
+        edge_percentile (float): edges 模式保留梯度幅值高于该百分位的像素
+        blur (float): 高斯模糊的 sigma（像素），抑制噪点
+
+    Returns:
+        tuple: ((H, W) bool, 实际使用的模式)
+    """
+    if mode == 'auto':
+        mode = 'lines' if is_line_art(gray) else 'edges'
+    if mode == 'lines':
+        smooth = gaussian_blur(gray, blur / 2)
+        level = otsu_threshold(smooth) if threshold is None else threshold
+        return smooth < level, mode
+
+    smooth = gaussian_blur(gray, blur)
+    # Sobel 梯度
+    p = np.pad(smooth, 1, mode='edge')
+    gx = (p[:-2, 2:] + 2 * p[1:-1, 2:] + p[2:, 2:]) - (p[:-2, :-2] + 2 * p[1:-1, :-2] + p[2:, :-2])
+    gy = (p[2:, :-2] + 2 * p[2:, 1:-1] + p[2:, 2:]) - (p[:-2, :-2] + 2 * p[:-2, 1:-1] + p[:-2, 2:])
+    magnitude = np.hypot(gx, gy)
+    level = np.percentile(magnitude, edge_percentile)
+    return magnitude > max(level, 1e-3), mode
+
+
+def thin(mask):
+    """
+    Zhang-Suen 细化，把笔画缩成单像素宽的骨架
+
+    每一轮对所有像素同时判断，删除条件全部用数组运算计算。
+
+    Args:
+        mask (ndarray): (H, W) bool
+
+    Returns:
+        ndarray: (H, W) bool 骨架
+    """
+    img = np.pad(mask, 1).astype(np.uint8)
+    while True:
+        changed = False
+        for step in (0, 1):
+            c = img[1:-1, 1:-1]
+            # 从正上方开始顺时针的 8 个邻居
+            p2, p3, p4, p5 = img[:-2, 1:-1], img[:-2, 2:], img[1:-1, 2:], img[2:, 2:]
+            p6, p7, p8, p9 = img[2:, 1:-1], img[2:, :-2], img[1:-1, :-2], img[:-2, :-2]
+            ring = [p2, p3, p4, p5, p6, p7, p8, p9, p2]
+            neighbours = sum(p.astype(np.int8) for p in ring[:-1])
+            transitions = sum(((a == 0) & (b == 1)).astype(np.int8) for a, b in zip(ring[:-1], ring[1:]))
+            if step == 0:
+                side = (p2 & p4 & p6) == 0
+                side &= (p4 & p6 & p8) == 0
+            else:
+                side = (p2 & p4 & p8) == 0
+                side &= (p2 & p6 & p8) == 0
+            remove = (c == 1) & (neighbours >= 2) & (neighbours <= 6) & (transitions == 1) & side
+            if remove.any():
+                c[remove] = 0
+                changed = True
+        if not changed:
+            return img[1:-1, 1:-1].astype(bool)
+
+
+def split_tiles(mask, tile, margin):
+    """
+    把图片分成带重叠边距的方块
+
+    Returns:
+        list: [(块内容, (y0, x0, y1, x1) 核心区域, (top, left) 核心区域在块内的起点)]
+    """
+    h, w = mask.shape
+    tiles = []
+    for y0 in range(0, h, tile):
+        for x0 in range(0, w, tile):
+            y1, x1 = min(y0 + tile, h), min(x0 + tile, w)
+            top, left = min(margin, y0), min(margin, x0)
+            block = mask[y0 - top:min(y1 + margin, h), x0 - left:min(x1 + margin, w)]
+            tiles.append((block, (y0, x0, y1, x1), (top, left)))
+    return tiles
+
+
+def _adjacency(skeleton):
+    """
+    骨架像素的 8 邻接表
+
+    一个斜向邻居同时和某个上下左右邻居相邻时，斜向连接是多余的（会形成三角形，
+    把拐角误认为分叉点），去掉。
+
+    Returns:
+        tuple: ((N, 2) 像素坐标 (y, x), (N, 8) 邻居序号，-1 表示没有)
+    """
+    h, w = skeleton.shape
+    ys, xs = np.nonzero(skeleton)
+    ids = np.full((h + 2, w + 2), -1, dtype=np.int64)
+    ids[ys + 1, xs + 1] = np.arange(len(ys))
+    neighbours = np.empty((len(ys), 8), dtype=np.int64)
+    for k, (dy, dx) in enumerate(OFFSETS):
+        neighbours[:, k] = ids[ys + 1 + dy, xs + 1 + dx]
+    for k, (dy, dx) in enumerate(OFFSETS[4:], 4):
+        redundant = (ids[ys + 1 + dy, xs + 1] >= 0) | (ids[ys + 1, xs + 1 + dx] >= 0)
+        neighbours[redundant, k] = -1
+    return np.stack([ys, xs], axis=1), neighbours
+
+
+def trace(skeleton):
+    """
+    把骨架拆成折线
+
+    从端点和分叉点出发沿度数为 2 的像素走到下一个端点/分叉点，剩下的是闭合环。
+
+    Returns:
+        list: 每条折线是 (M, 2) 像素坐标 (x, y)
+    """
+    coords, neighbours = _adjacency(skeleton)
+    adjacency = [row[row >= 0].tolist() for row in neighbours]
+    degree = (neighbours >= 0).sum(axis=1)
+    visited = set()
+    paths = []
+
+    def walk(start, nxt):
+        path = [start]
+        prev, cur = start, nxt
+        visited.add((min(prev, cur), max(prev, cur)))
+        while True:
+            path.append(cur)
+            if degree[cur] != 2:
+                break
+            options = [n for n in adjacency[cur] if n != prev and (min(cur, n), max(cur, n)) not in visited]
+            if not options:
+                break
+            prev, cur = cur, options[0]
+            visited.add((min(prev, cur), max(prev, cur)))
+        return path
+
+    # 先从端点和分叉点出发，剩下的是只由度数为 2 的像素组成的闭合环
+    for nodes in (np.flatnonzero(degree != 2), np.flatnonzero(degree == 2)):
+        for node in nodes.tolist():
+            for n in adjacency[node]:
+                if (min(node, n), max(node, n)) not in visited:
+                    paths.append(walk(node, n))
+    return [coords[path][:, ::-1] for path in paths]
+
+
+def _vectorize_tile(tile):
+    """细化并追踪一个方块，返回核心区域内的折线（整图像素坐标）"""
+    block, (y0, x0, y1, x1), (top, left) = tile
+    skeleton = thin(block)[top:top + y1 - y0, left:left + x1 - x0]
+    return [path + (x0, y0) for path in trace(skeleton)]
+
+
+def stitch(tiles, paths, shape):
+    """
+    把被方块边界截断的折线重新连起来
+
+    端点落在方块内部边界上、并且和相邻方块中另一条折线的端点 8 邻接时，把两条
+    折线首尾相接。
+
+    Args:
+        tiles (list): split_tiles 的结果
+        paths (list): 每个方块的折线列表
+        shape (tuple): 图片尺寸 (H, W)
+
+    Returns:
+        list: 连接后的折线
+    """
+    h, w = shape
+    flat = [path for tile_paths in paths for path in tile_paths]
+    owner = [i for i, tile_paths in enumerate(paths) for _ in tile_paths]
+    # 落在内部边界上的端点：(x, y) -> [(折线序号, 0 表示起点 / 1 表示终点)]
+    border = {}
+    for k, path in enumerate(flat):
+        y0, x0, y1, x1 = tiles[owner[k]][1]
+        for end, (x, y) in ((0, path[0]), (1, path[-1])):
+            if (x == x0 and x0 > 0) or (x == x1 - 1 and x1 < w) or (y == y0 and y0 > 0) or (y == y1 - 1 and y1 < h):
+                border.setdefault((int(x), int(y)), []).append((k, end))
+
+    # links[(k, end)] = 与之相接的另一条折线的端点
+    links = {}
+    for (x, y), ends in border.items():
+        for k, end in ends:
+            if (k, end) in links:
+                continue
+            for dy, dx in OFFSETS:
+                match = next((other for other in border.get((x + dx, y + dy), ())
+                              if owner[other[0]] != owner[k] and other not in links and other[0] != k), None)
+                if match:
+                    links[(k, end)] = match
+                    links[match] = (k, end)
+                    break
+
+    used = np.zeros(len(flat), dtype=bool)
+    stitched = []
+
+    def chain(k, end):
+        """从折线 k 的 end 端出发（end 端作为起点），沿连接一直走下去"""
+        parts = []
+        while not used[k]:
+            used[k] = True
+            parts.append(flat[k] if end == 0 else flat[k][::-1])
+            nxt = links.get((k, 1 - end))
+            if nxt is None:
+                break
+            k, end = nxt
+        return np.concatenate(parts)
+
+    # 先从有自由端的折线开始，剩下的是跨方块的闭合环
+    for k in range(len(flat)):
+        for end in (0, 1):
+            if not used[k] and (k, end) not in links:
+                stitched.append(chain(k, end))
+    for k in range(len(flat)):
+        if not used[k]:
+            stitched.append(chain(k, 0))
+    return stitched
+
+
+def vectorize(data, mode='auto', max_size=800, threshold=None, edge_percentile=90, blur=1.0,
+              min_length=5, tolerance=0.7, tile=256, executor=None):
+    """
+    把图片转换为 LINES 格式的线条：灰度化、二值化、分块细化和骨架追踪、拼接成折线
+
+    细化和追踪按方块独立进行，给出 executor 时各方块在进程池中并行处理。
+
+    Args:
+        data (bytes): 图片文件内容
+        mode (str): 'lines'（线稿）、'edges'（照片）或 'auto'
+        max_size (int): 图片长边缩放到的最大像素数
+        threshold, edge_percentile, blur: 见 binarize
+        min_length (float): 短于该长度（像素）的折线丢弃
+        tolerance (float): 折线简化容差（像素）
+        tile (int): 方块大小（像素）
+        executor (Executor|None): 进程池，为None时在当前进程中执行
+
+    Returns:
+        dict: {'lines': 屏幕坐标线条, 'width', 'height', 'mode', 'strokes', 'points',
+               'timings': 各阶段用时（秒）}
+    """
+    timings = {}
+    t0 = time.perf_counter()
+    gray = load_image(data, max_size)
+    mask, mode = binarize(gray, mode, threshold, edge_percentile, blur)
+    timings['binarize'] = time.perf_counter() - t0
+
+    # 方块带 TILE_MARGIN 像素的重叠边距一起细化，只保留核心区域
+    t0 = time.perf_counter()
+    tiles = split_tiles(mask, tile, TILE_MARGIN)
+    paths = list((executor.map if executor else map)(_vectorize_tile, tiles))
+    timings['tiles'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    strokes = []
+    for path in stitch(tiles, paths, mask.shape):
+        path = path.astype(float)
+        if len(path) > 1 and np.sum(np.hypot(*np.diff(path, axis=0).T)) >= min_length:
+            strokes.append(simplify_stroke(path, tolerance))
+    strokes = order_strokes(strokes)
+    timings['stitch'] = time.perf_counter() - t0
+
+    height, width = gray.shape
+    return {
+        'lines': [[{'x': float(x), 'y': float(y)} for x, y in stroke] for stroke in strokes],
+        'width': width,
+        'height': height,
+        'mode': mode,
+        'strokes': len(strokes),
+        'points': sum(len(stroke) for stroke in strokes),
+        'timings': timings
+    }
+
+
+def print_vectorize(result):
+    """打印矢量化结果"""
+    timings = result['timings']
+    print(f"Vectorized {result['width']} x {result['height']} image ({result['mode']} mode): "
+          f"{result['strokes']} strokes, {result['points']} points")
+    print("  " + ", ".join(f"{stage} {seconds:.2f} s" for stage, seconds in timings.items()))
+
+
+def benchmark(data, sizes, workers, repeat=1):
+    """
+    测量不同分辨率和进程数下的矢量化用时
+
+    Returns:
+        list: 每个 (分辨率, 进程数) 组合的结果
+    """
+    results = []
+    for processes in workers:
+        executor = ProcessPoolExecutor(processes) if processes > 1 else None
+        try:
+            if executor:
+                # 预先启动进程，不计入用时
+                for future in [executor.submit(os.getpid) for _ in range(processes)]:
+                    future.result()
+            for size in sizes:
+                best = None
+                for _ in range(repeat):
+                    result = vectorize(data, max_size=size, executor=executor)
+                    total = sum(result['timings'].values())
+                    if best is None or total < best[0]:
+                        best = (total, result)
+                total, result = best
+                row = {'max_size': size, 'workers': processes, 'width': result['width'],
+                       'height': result['height'], 'strokes': result['strokes'], 'points': result['points'],
+                       'total': total, **result['timings']}
+                results.append(row)
+                print(f"{row['width']:>5} x {row['height']:<5} workers {processes:>2}: "
+                      f"binarize {row['binarize']:6.2f} s, tiles {row['tiles']:6.2f} s, stitch {row['stitch']:6.2f} s, "
+                      f"total {total:6.2f} s, {row['strokes']} strokes")
+        finally:
+            if executor:
+                executor.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert an image into LINES strokes')
+    parser.add_argument('image', help='PNG/JPEG file')
+    parser.add_argument('--mode', choices=['auto', 'lines', 'edges'], default='auto')
+    parser.add_argument('--max-size', type=int, default=800, help='Longest image side in pixels')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processes for tiled thinning and tracing')
+    parser.add_argument('--output', default=None, help='Write a LINES message to this JSON file')
+    parser.add_argument('--benchmark', type=int, nargs='*', default=None, metavar='SIZE',
+                        help='Time vectorisation at these resolutions (default 256 512 1024 2048)')
+    parser.add_argument('--repeat', type=int, default=3, help='Benchmark runs per size, the best is reported')
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        data = f.read()
+
+    if args.benchmark is not None:
+        sizes = args.benchmark or [256, 512, 1024, 2048]
+        benchmark(data, sizes, sorted({1, args.workers}), args.repeat)
+    else:
+        with ProcessPoolExecutor(args.workers) as executor:
+            result = vectorize(data, args.mode, args.max_size, executor=executor)
+        print_vectorize(result)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'type': 'LINES', 'data': result['lines'],
+                           'width': result['width'], 'height': result['height']}, f)
+            print(f"Lines saved to {args.output}")
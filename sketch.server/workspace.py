@@ -0,0 +1,237 @@
+import numpy as np
+
+# 长度小于该值（毫米）的线段片段视为退化，直接丢弃
+EPS = 1e-6
+
+
+class Workspace:
+    """
+    机械臂绘图工作空间
+
+    工作空间是矩形区域 [x_min, x_max] x [y_min, y_max] 与以 base 为圆心、
+    半径在 [reach_min, reach_max] 之间的环形可达区域的交集。所有计算都用
+    NumPy 一次处理整批点/线段，在开始运动之前完成裁剪和可达性检查。
+    """
+
+    def __init__(self, x_min, x_max, y_min, y_max, reach_min=0.0, reach_max=np.inf, base=(0.0, 0.0)):
+        """
+        Args:
+            x_min, x_max, y_min, y_max (float): 矩形绘图区域（毫米）
+            reach_min (float): 距底座的最小可达半径（毫米）
+            reach_max (float): 距底座的最大可达半径（毫米）
+            base (tuple): 底座在机械臂坐标系中的位置 (x, y)
+        """
+        self.x_min = x_min
+        self.x_max = x_max
+        self.y_min = y_min
+        self.y_max = y_max
+        self.reach_min = reach_min
+        self.reach_max = reach_max
+        self.base = np.asarray(base, dtype=float)
+        # 从遥测记录学习的位置误差补偿（ErrorCompensation），为None时不补偿
+        self.compensation = None
+
+    def convert(self, points, w, h):
+        """
+        把屏幕坐标批量映射到机械臂坐标，保持纵横比并居中
+
+        Args:
+            points (array): (N, 2) 屏幕坐标
+            w (float): 画布宽度
+            h (float): 画布高度
+
+        Returns:
+            ndarray: (N, 2) 机械臂坐标（毫米）
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+
+        # 计算原始图片和机械臂工作范围的纵横比
+        original_aspect_ratio = w / h
+        arm_width = self.x_max - self.x_min
+        arm_height = self.y_max - self.y_min
+        arm_aspect_ratio = arm_width / arm_height
+
+        # 宽图以宽度为基准缩放，高图以高度为基准缩放
+        if original_aspect_ratio > arm_aspect_ratio:
+            scale = arm_width / w
+        else:
+            scale = arm_height / h
+
+        # 计算偏移量，使图像居中
+        offset_x = self.x_min + (arm_width - w * scale) / 2
+        offset_y = self.y_min + (arm_height - h * scale) / 2
+
+        result = np.empty_like(points)
+        result[:, 0] = points[:, 0] * scale + offset_x
+        result[:, 1] = -(points[:, 1] * scale + offset_y)
+        return result
+
+    def compensate(self, points):
+        """
+        把规划好的目标位置转换成发送给机械臂的指令位置
+
+        裁剪和速度规划都在目标位置上进行，只在发送指令前补偿系统误差
+
+        Args:
+            points (array): (N, 2) 目标位置（毫米）
+
+        Returns:
+            ndarray: (N, 2) 指令位置
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if self.compensation is None:
+            return points
+        return self.compensation.compensate(points)
+
+    def in_box(self, points):
+        """返回每个点是否在矩形区域内的布尔数组"""
+        return ((points[:, 0] >= self.x_min - EPS) & (points[:, 0] <= self.x_max + EPS)
+                & (points[:, 1] >= self.y_min - EPS) & (points[:, 1] <= self.y_max + EPS))
+
+    def in_reach(self, points):
+        """返回每个点是否在可达环形区域内的布尔数组"""
+        r = np.hypot(points[:, 0] - self.base[0], points[:, 1] - self.base[1])
+        return (r >= self.reach_min - EPS) & (r <= self.reach_max + EPS)
+
+    def contains(self, points):
+        """返回每个点是否在工作空间（矩形与可达区域的交集）内的布尔数组"""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return self.in_box(points) & self.in_reach(points)
+
+    def _boundary_params(self, p0, d):
+        """
+        计算每条线段与所有边界的交点参数 t（线段为 p0 + t * d，t ∈ [0, 1]）
+
+        Returns:
+            ndarray: (S, 8) 交点参数，无效交点为 NaN
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tx0 = (self.x_min - p0[:, 0]) / d[:, 0]
+            tx1 = (self.x_max - p0[:, 0]) / d[:, 0]
+            ty0 = (self.y_min - p0[:, 1]) / d[:, 1]
+            ty1 = (self.y_max - p0[:, 1]) / d[:, 1]
+
+            # 与圆 |p0 + t d - base| = r 的交点：a t^2 + b t + c = 0
+            q = p0 - self.base
+            a = np.sum(d * d, axis=1)
+            b = 2 * np.sum(q * d, axis=1)
+            qq = np.sum(q * q, axis=1)
+            roots = []
+            for radius in (self.reach_min, self.reach_max):
+                if not np.isfinite(radius) or radius <= 0:
+                    roots.extend([np.full(len(p0), np.nan)] * 2)
+                    continue
+                disc = b * b - 4 * a * (qq - radius * radius)
+                sqrt_disc = np.sqrt(np.where(disc >= 0, disc, np.nan))
+                roots.append((-b - sqrt_disc) / (2 * a))
+                roots.append((-b + sqrt_disc) / (2 * a))
+
+        t = np.column_stack([tx0, tx1, ty0, ty1] + roots)
+        t[~np.isfinite(t) | (t <= 0) | (t >= 1)] = np.nan
+        return t
+
+    def clip_strokes(self, strokes):
+        """
+        把线条裁剪到工作空间内
+
+        线段与边界相交时在交点处切开，工作空间外的部分被去掉，线条被分成
+        多段而不是整条丢弃。
+
+        Args:
+            strokes (list): 每条线条为 (N, 2) 机械臂坐标数组
+
+        Returns:
+            tuple: (裁剪后的线条列表, 被去掉的片段列表)
+        """
+        strokes = [np.asarray(s, dtype=float).reshape(-1, 2) for s in strokes]
+        strokes = [s for s in strokes if len(s)]
+        kept_strokes = []
+        removed = []
+        if not strokes:
+            return kept_strokes, removed
+
+        # 单点线条（轻点）当作一条零长度线段处理
+        single = np.array([len(s) == 1 for s in strokes])
+        multi = [np.vstack([s, s]) if len(s) == 1 else s for s in strokes]
+
+        # 把所有线段拼成一个批次
+        p0 = np.concatenate([s[:-1] for s in multi])
+        p1 = np.concatenate([s[1:] for s in multi])
+        stroke_id = np.concatenate([np.full(len(s) - 1, i) for i, s in enumerate(multi)])
+        d = p1 - p0
+
+        # 每条线段按边界交点切成若干片段，参数排序后相邻两个构成一个片段
+        t = np.column_stack([np.zeros(len(p0)), self._boundary_params(p0, d), np.ones(len(p0))])
+        t = np.sort(np.where(np.isnan(t), 1.0, t), axis=1)
+        t_start = t[:, :-1].ravel()
+        t_end = t[:, 1:].ravel()
+        seg = np.repeat(np.arange(len(p0)), t.shape[1] - 1)
+
+        seg_len = np.hypot(d[:, 0], d[:, 1])
+        nonempty = (t_end - t_start) * seg_len[seg] > EPS
+        # 零长度线段（重复点）保留一个片段，保证线条连续
+        zero_seg = seg_len <= EPS
+        nonempty |= zero_seg[seg] & (np.arange(len(seg)) % (t.shape[1] - 1) == 0)
+        t_start, t_end, seg = t_start[nonempty], t_end[nonempty], seg[nonempty]
+
+        starts = p0[seg] + t_start[:, None] * d[seg]
+        ends = p0[seg] + t_end[:, None] * d[seg]
+        inside = self.contains((starts + ends) / 2)
+
+        # 连续的保留片段属于同一条输出线条；遇到被去掉的片段或换了原始线条就断开
+        sid = stroke_id[seg]
+        boundary = np.ones(len(seg), dtype=bool)
+        boundary[1:] = (inside[1:] != inside[:-1]) | (sid[1:] != sid[:-1])
+        run_starts = np.flatnonzero(boundary)
+        run_ends = np.append(run_starts[1:], len(seg))
+
+        for a, b in zip(run_starts, run_ends):
+            piece = starts[a:a + 1] if single[sid[a]] else np.vstack([starts[a:a + 1], ends[a:b]])
+            (kept_strokes if inside[a] else removed).append(piece)
+        return kept_strokes, removed
+
+    def validate(self, lines, w, h):
+        """
+        运动前的预检：坐标转换、裁剪并统计不可达区域
+
+        Args:
+            lines (list): LINES 消息中的线条（屏幕坐标点字典列表）
+            w (float): 画布宽度
+            h (float): 画布高度
+
+        Returns:
+            tuple: (裁剪后的线条列表, 预检报告字典)
+        """
+        strokes = [self.convert([[p['x'], p['y']] for p in line], w, h) for line in lines if line]
+        all_points = np.concatenate(strokes) if strokes else np.empty((0, 2))
+
+        clipped, removed = self.clip_strokes(strokes)
+
+        report = {
+            'input_strokes': len(strokes),
+            'output_strokes': len(clipped),
+            'points': len(all_points),
+            'points_outside_box': int(np.count_nonzero(~self.in_box(all_points))),
+            'points_out_of_reach': int(np.count_nonzero(~self.in_reach(all_points))),
+            'removed_length': float(sum(np.sum(np.hypot(*np.diff(r, axis=0).T)) for r in removed if len(r) > 1)),
+            'unreachable_regions': [
+                [float(r[:, 0].min()), float(r[:, 1].min()), float(r[:, 0].max()), float(r[:, 1].max())]
+                for r in removed
+            ]
+        }
+        return clipped, report
+
+
+def print_report(report):
+    """打印预检报告"""
+    print("Pre-flight validation:")
+    print(f"  Strokes: {report['input_strokes']} -> {report['output_strokes']}")
+    print(f"  Points outside box: {report['points_outside_box']} / {report['points']}")
+    print(f"  Points out of reach: {report['points_out_of_reach']} / {report['points']}")
+    if 'pen_changes' in report:
+        print(f"  Pen changes: {report['pen_changes']}")
+    if report['unreachable_regions']:
+        print(f"  Removed {len(report['unreachable_regions'])} unreachable pieces, "
+              f"{report['removed_length']:.1f} mm in total")
+        for x0, y0, x1, y1 in report['unreachable_regions']:
+            print(f"    ({x0:.1f}, {y0:.1f}) - ({x1:.1f}, {y1:.1f})")